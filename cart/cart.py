@@ -1,28 +1,61 @@
 """
-Session-based shopping cart implementation.
+Shopping cart implementation.
 """
 from decimal import Decimal
 from django.conf import settings
-from catalog.models import Product
+from django.db.models import Prefetch
+from catalog.models import Product, ProductImage
+from .stores import get_store, get_summary
 
 
-CART_SESSION_ID = 'cart'
+CART_VERSION = 2
+
+# What the cart, checkout and place_order() read of a product
+PRODUCT_FIELDS = ['id', 'slug', 'name', 'price', 'stock', 'category__name']
 
 
 class Cart:
     """
-    A session-based shopping cart class.
+    A shopping cart kept in the request's cart store (see ``cart.stores``).
+
+    The store holds ``{'v': CART_VERSION, 'items': {product_id: quantity},
+    'prices': {product_id: price}}``, the prices being the snapshot taken when
+    each product was first added. Nothing is written to the store until the
+    cart is first changed, so visitors who never add anything get no session.
+
+    The line items and totals are worked out once and kept until the cart
+    next changes.
     """
     
     def __init__(self, request):
         """
-        Initialize the cart from the session.
+        Initialize the cart from the cart store.
         """
-        self.session = request.session
-        cart = self.session.get(CART_SESSION_ID)
-        if not cart:
-            cart = self.session[CART_SESSION_ID] = {}
-        self.cart = cart
+        self.store = get_store(request)
+        self.quantities, self.prices = self.load(self.store.load())
+        self._lines = None
+        self._subtotal = None
+
+        # The summary cookie outlives carts lost with their session (logout,
+        # expiry, eviction from the cache): bring it back in line
+        summary = get_summary(request)
+        if summary['count'] != len(self) or summary['subtotal'] != self.get_subtotal():
+            self.store.set_summary(len(self), self.get_subtotal())
+
+    @staticmethod
+    def load(stored):
+        """
+        Return ``(quantities, prices)`` for a stored cart, reading the
+        ``{product_id: {'quantity', 'price'}}`` carts saved before version 2.
+        """
+        if not stored:
+            return {}, {}
+        if stored.get('v') == CART_VERSION:
+            return stored['items'], stored['prices']
+        return (
+            {product_id: item['quantity'] for product_id, item in stored.items()},
+            {product_id: item['price'] for product_id, item in stored.items()},
+        )
     
     def add(self, product, quantity=1, override_quantity=False):
         """
@@ -33,92 +66,135 @@ class Cart:
             quantity: Number of items to add
             override_quantity: If True, set quantity instead of incrementing
         """
+        self._put(product, quantity, override_quantity)
+        self.save()
+
+    def _put(self, product, quantity, override_quantity):
         product_id = str(product.id)
         
-        if product_id not in self.cart:
-            self.cart[product_id] = {
-                'quantity': 0,
-                'price': str(product.price)
-            }
-        
-        if override_quantity:
-            self.cart[product_id]['quantity'] = quantity
-        else:
-            self.cart[product_id]['quantity'] += quantity
+        if not override_quantity:
+            quantity += self.quantities.get(product_id, 0)
         
         # Ensure quantity doesn't exceed stock
-        if self.cart[product_id]['quantity'] > product.stock:
-            self.cart[product_id]['quantity'] = product.stock
-        
-        self.save()
+        self.quantities[product_id] = min(quantity, product.stock)
+        self.prices.setdefault(product_id, str(product.price))
     
     def remove(self, product_id):
         """
         Remove a product from the cart.
         """
-        product_id = str(product_id)
-        if product_id in self.cart:
-            del self.cart[product_id]
+        if self._drop(product_id):
             self.save()
+
+    def _drop(self, product_id):
+        product_id = str(product_id)
+        self.prices.pop(product_id, None)
+        return self.quantities.pop(product_id, None) is not None
     
     def update(self, product_id, quantity):
         """
         Update the quantity of a product in the cart.
         """
-        product_id = str(product_id)
-        if product_id in self.cart and quantity > 0:
-            product = Product.objects.get(id=int(product_id))
-            # Ensure quantity doesn't exceed stock
-            quantity = min(quantity, product.stock)
-            self.cart[product_id]['quantity'] = quantity
+        if str(product_id) in self.quantities or quantity <= 0:
+            self.apply([('set', int(product_id), quantity)])
+
+    def apply(self, operations):
+        """
+        Apply ``(op, product_id, quantity)`` operations in order with one
+        product query and one save. ``op`` is ``'add'``, ``'set'`` (a
+        quantity of 0 or less removes the line) or ``'remove'``.
+
+        Returns ``(products, rejected)``: ``{product_id: Product}`` for the
+        lines in the cart afterwards, and the ids of the products that could
+        not be added or set because they are gone, inactive or out of stock.
+        """
+        ids = {int(product_id) for product_id in self.quantities}
+        ids.update(product_id for _, product_id, _ in operations)
+        products = Product.objects.only('id', 'slug', 'name', 'price', 'stock', 'is_active').order_by().in_bulk(ids)
+
+        before = dict(self.quantities)
+        rejected = []
+        for op, product_id, quantity in operations:
+            product = products.get(product_id)
+            if op == 'remove' or (op == 'set' and quantity <= 0):
+                self._drop(product_id)
+            elif product is None or not product.is_active or product.stock <= 0:
+                if op == 'set':
+                    self._drop(product_id)
+                rejected.append(product_id)
+            else:
+                self._put(product, quantity, override_quantity=op == 'set')
+        if self.quantities != before:
             self.save()
-        elif quantity <= 0:
-            self.remove(product_id)
+        lines = {int(product_id): products.get(int(product_id)) for product_id in self.quantities}
+        return {pk: product for pk, product in lines.items() if product is not None}, rejected
     
     def save(self):
         """
-        Mark the session as modified to ensure it gets saved.
+        Store the cart, or drop it from the store once empty, and update the
+        summary the header badge reads (see ``cart.stores.get_summary``).
         """
-        self.session.modified = True
+        self._lines = self._subtotal = None
+        if self.quantities:
+            self.store.save({'v': CART_VERSION, 'items': self.quantities, 'prices': self.prices})
+        else:
+            self.store.delete()
+        self.store.set_summary(len(self), self.get_subtotal())
     
     def clear(self):
         """
-        Remove the cart from the session.
+        Remove the cart from the store.
         """
-        del self.session[CART_SESSION_ID]
+        self.quantities, self.prices = {}, {}
         self.save()
     
+    def lines(self):
+        """
+        The line items, with their products fetched in one query (plus one
+        for their first images) the first time they are asked for.
+        """
+        if self._lines is None:
+            products = Product.objects.select_related('category').only(*PRODUCT_FIELDS).prefetch_related(
+                Prefetch('images', queryset=ProductImage.objects.all()[:1], to_attr='cart_images')
+            ).order_by().in_bulk([int(product_id) for product_id in self.quantities])
+
+            # Fresh dicts, so the products and Decimals never land in the store
+            self._lines = []
+            for product_id, quantity in self.quantities.items():
+                product = products.get(int(product_id))
+                if product is not None:
+                    price = Decimal(self.prices[product_id])
+                    self._lines.append({
+                        'product': product,
+                        'image': product.cart_images[0] if product.cart_images else None,
+                        'quantity': quantity,
+                        'price': price,
+                        'total_price': price * quantity,
+                    })
+        return self._lines
+
     def __iter__(self):
         """
-        Iterate over the items in the cart and fetch products from the database.
+        Iterate over the items in the cart.
         """
-        product_ids = self.cart.keys()
-        products = Product.objects.filter(id__in=product_ids)
-        
-        cart = self.cart.copy()
-        for product in products:
-            cart[str(product.id)]['product'] = product
-        
-        for item in cart.values():
-            if 'product' in item:
-                item['price'] = Decimal(item['price'])
-                item['total_price'] = item['price'] * item['quantity']
-                yield item
+        return iter(self.lines())
     
     def __len__(self):
         """
         Return the total number of items in the cart.
         """
-        return sum(item['quantity'] for item in self.cart.values())
+        return sum(self.quantities.values())
     
     def get_subtotal(self):
         """
         Return the subtotal of all items in the cart.
         """
-        return sum(
-            Decimal(item['price']) * item['quantity']
-            for item in self.cart.values()
-        )
+        if self._subtotal is None:
+            self._subtotal = sum(
+                (Decimal(self.prices[product_id]) * quantity for product_id, quantity in self.quantities.items()),
+                Decimal('0.00')
+            )
+        return self._subtotal
     
     def get_shipping(self):
         """
@@ -139,4 +215,4 @@ class Cart:
         """
         Check if the cart is empty.
         """
-        return len(self.cart) == 0
+        return not self.quantities
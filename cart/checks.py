@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.checks import Error, register
+from django.utils.module_loading import import_string
+from .stores import DEFAULT_STORE, CacheCartStore
+
+
+# Cache backends whose entries live in the memory of a single process
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def check_cart_cache(app_configs, **kwargs):
+    """
+    ``CacheCartStore`` loses carts when each worker process has its own
+    cache, so outside ``DEBUG`` it needs a shared backend.
+    """
+    store = import_string(getattr(settings, 'CART_STORE', DEFAULT_STORE))
+    if settings.DEBUG or not issubclass(store, CacheCartStore):
+        return []
+    alias = getattr(settings, 'CART_CACHE_ALIAS', 'default')
+    backend = settings.CACHES.get(alias, {}).get('BACKEND', PROCESS_LOCAL_CACHES[0])
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Error(
+        f'CART_STORE keeps carts in the "{alias}" cache, which is local to each process.',
+        hint='Configure a cache shared by all worker processes (database, Redis or Memcached) '
+             'or choose another CART_STORE.',
+        id='cart.E001',
+    )]
@@ -0,0 +1,20 @@
+"""
+Cart context processors.
+"""
+from django.conf import settings
+from .stores import get_summary
+
+
+def cart_summary(request):
+    """
+    The cart's item count and subtotal for the header badge, from the summary
+    cookie only: no database access and no cart on page render.
+
+    Pages served from a full-page cache must not carry one visitor's count to
+    the next; they set ``cart_summary_lazy`` (or ``CART_SUMMARY_LAZY`` does
+    for every page) and the badge fetches the ``cart_summary`` view instead.
+    """
+    return {
+        'cart_summary': get_summary(request),
+        'cart_summary_lazy': getattr(settings, 'CART_SUMMARY_LAZY', False),
+    }
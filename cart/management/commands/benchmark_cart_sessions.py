@@ -0,0 +1,49 @@
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Count session table reads and writes for anonymous, cartless page views, '
+        'each from a new visitor without cookies. Everything it writes is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--views', type=int, default=1000, help='Page views to make.')
+        parser.add_argument(
+            '--path', dest='paths', action='append',
+            help='Paths to cycle through (default: home, all products, cart and checkout).'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options['views'], options['paths'] or [
+                    reverse('home'), reverse('all_products'), reverse('cart'), reverse('checkout')
+                ])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, views, paths):
+        sessions = Session.objects.count()
+        table = Session._meta.db_table
+        with CaptureQueriesContext(connection) as captured:
+            for i in range(views):
+                Client().get(paths[i % len(paths)])
+        session_queries = [query['sql'] for query in captured if table in query['sql']]
+        writes = sum(not sql.lstrip().upper().startswith('SELECT') for sql in session_queries)
+        reads = len(session_queries) - writes
+        per_1k = 1000 / views
+        self.stdout.write(f'page views         {views}')
+        self.stdout.write(f'sessions created   {Session.objects.count() - sessions}')
+        self.stdout.write(f'session writes/1k  {writes * per_1k:.0f}')
+        self.stdout.write(f'session reads/1k   {reads * per_1k:.0f}')
@@ -0,0 +1,16 @@
+"""
+Cart middleware.
+"""
+from django.utils.deprecation import MiddlewareMixin
+
+
+class CartStoreMiddleware(MiddlewareMixin):
+    """
+    Let the request's cart store (see ``cart.stores``) write its cookie.
+    """
+
+    def process_response(self, request, response):
+        store = getattr(request, 'cart_store', None)
+        if store is not None:
+            response = store.process_response(response)
+        return response
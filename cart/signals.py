@@ -0,0 +1,15 @@
+"""
+Keep the cart summary cookie in step with the session.
+"""
+from django.contrib.auth.signals import user_logged_out
+from django.dispatch import receiver
+from .stores import EMPTY_SUMMARY, SessionCartStore, get_store
+
+
+@receiver(user_logged_out)
+def clear_cart_summary(sender, request, **kwargs):
+    # Logging out flushes the session, and a session-stored cart with it
+    if request is not None:
+        store = get_store(request)
+        if isinstance(store, SessionCartStore):
+            store.set_summary(**EMPTY_SUMMARY)
@@ -0,0 +1,224 @@
+"""
+Where carts are kept between requests.
+
+``Cart`` reads and writes its data through the store named by ``CART_STORE``
+(a dotted path, default ``cart.stores.SessionCartStore``):
+
+``SessionCartStore``
+    The cart lives in the session, as it always has.
+``CookieCartStore``
+    The cart is a signed cookie, so it needs no server state. Browsers drop
+    cookies over about 4 KB, which is still some hundred lines: fine for small
+    carts.
+``CacheCartStore``
+    The cart lives in the cache named by ``CART_CACHE_ALIAS`` under a random
+    id kept in a cookie. That cache must be shared by every worker process
+    (see ``CACHES`` in the staging and production settings); the
+    ``cart.E001`` system check refuses a process-local one outside ``DEBUG``.
+
+One store is built per request and shared by every ``Cart`` made during it.
+The cookie stores set their cookies on the way out through
+``cart.middleware.CartStoreMiddleware``.
+
+Whatever the store, every change to a cart also writes a signed summary
+cookie (item count and subtotal). ``get_summary`` reads it back for the
+header badge without loading the cart, the session or anything else.
+"""
+import re
+import uuid
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+
+DEFAULT_STORE = 'cart.stores.SessionCartStore'
+CART_SESSION_ID = 'cart'
+SUMMARY_SALT = 'cart.stores.summary'
+EMPTY_SUMMARY = {'count': 0, 'subtotal': Decimal('0.00')}
+
+
+def get_store(request):
+    """
+    The cart store of ``request``, made on first use.
+    """
+    store = getattr(request, 'cart_store', None)
+    if store is None:
+        store = request.cart_store = import_string(getattr(settings, 'CART_STORE', DEFAULT_STORE))(request)
+    return store
+
+
+def cookie_age():
+    return getattr(settings, 'CART_COOKIE_AGE', settings.SESSION_COOKIE_AGE)
+
+
+def summary_cookie_name():
+    return getattr(settings, 'CART_SUMMARY_COOKIE_NAME', 'cart_summary')
+
+
+def get_summary(request):
+    """
+    ``{'count', 'subtotal'}`` of the visitor's cart, from the cart changed
+    during this request or else the summary cookie. Never touches the
+    database or the cart.
+    """
+    store = getattr(request, 'cart_store', None)
+    if store is not None and store.summary is not None:
+        return store.summary
+    value = request.COOKIES.get(summary_cookie_name())
+    if value:
+        try:
+            count, subtotal = signing.Signer(salt=SUMMARY_SALT).unsign(value).split(':')
+            return {'count': int(count), 'subtotal': Decimal(subtotal)}
+        except (signing.BadSignature, ValueError, InvalidOperation):
+            pass
+    return EMPTY_SUMMARY
+
+
+class CartStore:
+    """
+    Keeps one visitor's cart data, a JSON-serialisable dict.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.summary = None
+
+    def load(self):
+        """
+        The stored cart, or ``None`` if there is none.
+        """
+        raise NotImplementedError
+
+    def save(self, data):
+        raise NotImplementedError
+
+    def delete(self):
+        raise NotImplementedError
+
+    def set_summary(self, count, subtotal):
+        """
+        Remember the changed cart's item count and subtotal for the summary cookie.
+        """
+        self.summary = {'count': count, 'subtotal': subtotal}
+
+    def process_response(self, response):
+        if self.summary is None:
+            return response
+        if self.summary['count']:
+            response.set_cookie(
+                summary_cookie_name(),
+                signing.Signer(salt=SUMMARY_SALT).sign(f"{self.summary['count']}:{self.summary['subtotal']}"),
+                max_age=cookie_age(), path=settings.SESSION_COOKIE_PATH, domain=settings.SESSION_COOKIE_DOMAIN,
+                secure=settings.SESSION_COOKIE_SECURE, httponly=True, samesite=settings.SESSION_COOKIE_SAMESITE
+            )
+        elif summary_cookie_name() in self.request.COOKIES:
+            response.delete_cookie(
+                summary_cookie_name(), path=settings.SESSION_COOKIE_PATH, domain=settings.SESSION_COOKIE_DOMAIN,
+                samesite=settings.SESSION_COOKIE_SAMESITE
+            )
+        return response
+
+
+class SessionCartStore(CartStore):
+    def load(self):
+        return self.request.session.get(CART_SESSION_ID)
+
+    def save(self, data):
+        self.request.session[CART_SESSION_ID] = data
+
+    def delete(self):
+        if CART_SESSION_ID in self.request.session:
+            del self.request.session[CART_SESSION_ID]
+
+
+class CookieStore(CartStore):
+    """
+    A store that keeps a signed value in a cookie and sets it on the response.
+    """
+    salt = 'cart.stores'
+
+    def __init__(self, request):
+        super().__init__(request)
+        self.cookie_name = getattr(settings, 'CART_COOKIE_NAME', 'cart')
+        self.max_age = cookie_age()
+        self.cookie = None
+        self.changed = False
+        value = request.COOKIES.get(self.cookie_name)
+        if value:
+            try:
+                self.cookie = signing.loads(value, salt=self.salt, max_age=self.max_age)
+            except signing.BadSignature:
+                # Tampered with or expired: start again
+                self.changed = True
+
+    def set_cookie(self, value):
+        self.cookie = value
+        self.changed = True
+
+    def process_response(self, response):
+        response = super().process_response(response)
+        if not self.changed:
+            return response
+        if self.cookie is None:
+            response.delete_cookie(
+                self.cookie_name, path=settings.SESSION_COOKIE_PATH, domain=settings.SESSION_COOKIE_DOMAIN,
+                samesite=settings.SESSION_COOKIE_SAMESITE
+            )
+        else:
+            response.set_cookie(
+                self.cookie_name, signing.dumps(self.cookie, salt=self.salt, compress=True),
+                max_age=self.max_age, path=settings.SESSION_COOKIE_PATH, domain=settings.SESSION_COOKIE_DOMAIN,
+                secure=settings.SESSION_COOKIE_SECURE, httponly=True, samesite=settings.SESSION_COOKIE_SAMESITE
+            )
+        return response
+
+
+class CookieCartStore(CookieStore):
+    salt = 'cart.stores.CookieCartStore'
+
+    def load(self):
+        return self.cookie
+
+    def save(self, data):
+        self.set_cookie(data)
+
+    def delete(self):
+        if self.cookie is not None:
+            self.set_cookie(None)
+
+
+class CacheCartStore(CookieStore):
+    salt = 'cart.stores.CacheCartStore'
+    key_prefix = 'cart:'
+    cart_id_re = re.compile(r'^[0-9a-f]{32}$')
+
+    def __init__(self, request):
+        super().__init__(request)
+        self.cache = caches[getattr(settings, 'CART_CACHE_ALIAS', 'default')]
+        if not isinstance(self.cookie, str) or not self.cart_id_re.match(self.cookie):
+            self.cookie = None
+        self.data = None
+        self.loaded = False
+
+    def key(self):
+        return self.key_prefix + self.cookie
+
+    def load(self):
+        if not self.loaded:
+            self.data = self.cache.get(self.key()) if self.cookie else None
+            self.loaded = True
+        return self.data
+
+    def save(self, data):
+        # Re-sent on every change so the cookie lives as long as the cache entry
+        self.set_cookie(self.cookie or uuid.uuid4().hex)
+        self.cache.set(self.key(), data, self.max_age)
+        self.data, self.loaded = data, True
+
+    def delete(self):
+        if self.cookie is not None:
+            self.cache.delete(self.key())
+            self.set_cookie(None)
+        self.data, self.loaded = None, True
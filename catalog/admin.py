@@ -1,6 +1,10 @@
-﻿from django.contrib import admin
+﻿from django.contrib import admin, messages
 from modeltranslation.admin import TranslationAdmin
 from .models import Category, Product, ProductImage, ProductColor, Offer
+from .pricing import apply_discount, remove_discount
+
+# Discounts offered as one-click actions on the product list
+DISCOUNT_ACTION_PERCENTAGES = (10, 20, 25, 30, 50)
 
 
 class ProductImageInline(admin.TabularInline):
@@ -13,6 +17,21 @@ class ProductColorInline(admin.StackedInline):
     extra = 0
 
 
+def make_discount_action(percentage):
+    def action(modeladmin, request, queryset):
+        updated = apply_discount(queryset, percentage)
+        modeladmin.message_user(request, f'{percentage}% discount applied to {updated} product(s).', messages.SUCCESS)
+
+    action.__name__ = f'apply_{percentage}_percent_discount'
+    return admin.action(description=f'Apply a {percentage}%% discount to selected products')(action)
+
+
+@admin.action(description='Remove the discount from selected products')
+def remove_discount_action(modeladmin, request, queryset):
+    updated = remove_discount(queryset)
+    modeladmin.message_user(request, f'Discount removed from {updated} product(s).', messages.SUCCESS)
+
+
 @admin.register(Category)
 class CategoryAdmin(TranslationAdmin):
     list_display = ['name', 'slug', 'is_active']
@@ -26,6 +45,7 @@ class ProductAdmin(TranslationAdmin):
     search_fields = ['name', 'description']
     prepopulated_fields = {'slug': ('name',)}
     inlines = [ProductImageInline, ProductColorInline]
+    actions = [make_discount_action(percentage) for percentage in DISCOUNT_ACTION_PERCENTAGES] + [remove_discount_action]
 
 
 @admin.register(Offer)
@@ -0,0 +1,132 @@
+"""
+Facet counts for the product listing sidebar.
+
+All facets for one search/filter state come out of a single grouped
+aggregate over the products table: one row per category, with conditional
+counts for every price bucket and for in-stock products. Each facet ignores
+its own filter (so the sidebar shows what choosing another value would
+return) and honours all the others.
+
+Results are cached per filter state under a version number that every
+``Product`` save or delete bumps (see ``catalog.signals``), as does a
+checkout that sells a product out (see ``orders.services``). The version
+lives in the shared cache, so a bump reaches every worker process.
+"""
+import hashlib
+import json
+from decimal import Decimal
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+
+# Price histogram bucket edges in EGP; the last bucket is open-ended
+PRICE_BUCKET_EDGES = (0, 100, 250, 500, 1000)
+
+FACET_CACHE_TIMEOUT = 60 * 15
+FACET_VERSION_KEY = 'catalog:facets:version'
+
+
+def price_buckets():
+    """
+    Return the ``(min, max)`` bounds of every bucket; ``max`` is exclusive
+    and ``None`` for the last one.
+    """
+    edges = [Decimal(edge) for edge in PRICE_BUCKET_EDGES]
+    return list(zip(edges, edges[1:] + [None]))
+
+
+def _bucket_filter(low, high):
+    condition = Q(effective_price__gte=low)
+    if high is not None:
+        condition &= Q(effective_price__lt=high)
+    return condition
+
+
+def _price_filter(min_price, max_price):
+    condition = Q()
+    if min_price is not None:
+        condition &= Q(effective_price__gte=min_price)
+    if max_price is not None:
+        condition &= Q(effective_price__lte=max_price)
+    return condition
+
+
+def compute_facets(products, category_id=None, min_price=None, max_price=None, in_stock=False):
+    """
+    Count facets for ``products`` (already restricted to active products and
+    the search query, but not to category, price or stock).
+
+    Returns a dict with ``categories`` ({category_id: count}),
+    ``price_buckets`` (a list of ``{'min', 'max', 'count'}``), ``in_stock``
+    and ``total``.
+    """
+    price_condition = _price_filter(min_price, max_price)
+    stock_condition = Q(stock__gt=0) if in_stock else Q()
+    buckets = price_buckets()
+
+    rows = products.order_by().values('category_id').annotate(
+        matching=Count('pk', filter=price_condition & stock_condition),
+        in_stock=Count('pk', filter=price_condition & Q(stock__gt=0)),
+        **{
+            f'bucket_{i}': Count('pk', filter=_bucket_filter(low, high) & stock_condition)
+            for i, (low, high) in enumerate(buckets)
+        }
+    )
+
+    categories = {}
+    bucket_counts = [0] * len(buckets)
+    in_stock_count = 0
+    for row in rows:
+        categories[row['category_id']] = row['matching']
+        # Price and stock facets honour the category filter
+        if category_id is None or row['category_id'] == category_id:
+            in_stock_count += row['in_stock']
+            for i in range(len(buckets)):
+                bucket_counts[i] += row[f'bucket_{i}']
+
+    return {
+        'categories': categories,
+        'price_buckets': [
+            {'min': low, 'max': high, 'count': count}
+            for (low, high), count in zip(buckets, bucket_counts)
+        ],
+        'in_stock': in_stock_count,
+        'total': sum(categories.values()),
+    }
+
+
+def _cache_key(state):
+    version = cache.get(FACET_VERSION_KEY, 0)
+    digest = hashlib.md5(json.dumps(state, sort_keys=True, default=str).encode()).hexdigest()
+    return f'catalog:facets:{version}:{digest}'
+
+
+def get_facets(products, search_query='', category_id=None, min_price=None, max_price=None, in_stock=False):
+    """
+    Cached ``compute_facets``; ``search_query`` is part of the cache key and
+    must be the query ``products`` was filtered with.
+    """
+    state = {
+        'q': search_query, 'category': category_id, 'min': min_price,
+        'max': max_price, 'in_stock': in_stock,
+    }
+    key = _cache_key(state)
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets(
+            products, category_id=category_id, min_price=min_price,
+            max_price=max_price, in_stock=in_stock
+        )
+        cache.set(key, facets, FACET_CACHE_TIMEOUT)
+    return facets
+
+
+def invalidate_facets():
+    """
+    Drop every cached facet result by moving to a new version number.
+    """
+    if not cache.add(FACET_VERSION_KEY, 1, timeout=None):
+        try:
+            cache.incr(FACET_VERSION_KEY)
+        except ValueError:
+            cache.set(FACET_VERSION_KEY, 1, timeout=None)
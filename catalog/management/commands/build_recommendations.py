@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from catalog.recommendations import build_recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the "frequently bought together" recommendations from the order history. '
+        'Schedule it nightly; the product pages read the stored result.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=10, help='Recommendations kept per product.')
+        parser.add_argument(
+            '--min-orders', type=int, default=2,
+            help='Orders two products must share before one is recommended for the other.'
+        )
+        parser.add_argument(
+            '--max-basket', type=int, default=50,
+            help='Orders with more lines than this are ignored.'
+        )
+
+    def handle(self, *args, **options):
+        stored = build_recommendations(
+            top_k=options['top_k'], min_orders=options['min_orders'], max_basket=options['max_basket']
+        )
+        self.stdout.write(self.style.SUCCESS(f'{stored} recommendation(s) stored.'))
@@ -0,0 +1,58 @@
+import random
+import time
+from collections import Counter
+from itertools import accumulate
+from django.core.management.base import BaseCommand
+from catalog.similarity import DEFAULTS, build_similar_products, build_vectors, nearest_neighbours
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the similar-products index from the product names and descriptions. '
+        'Schedule it nightly; saved products are refreshed one by one in between. '
+        'With --benchmark N, time the computation on N synthetic products instead (nothing is written).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=DEFAULTS['top_k'], help='Similar products kept per product.')
+        parser.add_argument('--max-terms', type=int, default=DEFAULTS['max_terms'], help='Terms kept per product vector.')
+        parser.add_argument(
+            '--max-postings', type=int, default=DEFAULTS['max_postings'],
+            help='Products scored per shared term (the heaviest ones).'
+        )
+        parser.add_argument(
+            '--max-df', type=float, default=DEFAULTS['max_df'],
+            help='Ignore terms used by more than this share of the products.'
+        )
+        parser.add_argument('--min-score', type=float, default=DEFAULTS['min_score'], help='Lowest cosine kept.')
+        parser.add_argument('--benchmark', type=int, metavar='N', help='Time N synthetic products instead.')
+
+    def handle(self, *args, **options):
+        settings = {key: options[key] for key in DEFAULTS}
+        if options['benchmark']:
+            self.benchmark(options['benchmark'], settings)
+            return
+        products, stored = build_similar_products(**settings)
+        self.stdout.write(self.style.SUCCESS(f'{stored} similar product(s) stored for {products} product(s).'))
+
+    def benchmark(self, count, settings):
+        # Zipf-like word use over a catalogue-sized vocabulary, ~40 words a product
+        rng = random.Random(0)
+        vocabulary = [f'word{i}' for i in range(max(count // 2, 1000))]
+        cum_weights = list(accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+        documents = {
+            pk: Counter(rng.choices(vocabulary, cum_weights=cum_weights, k=rng.randint(20, 60)))
+            for pk in range(count)
+        }
+
+        started = time.perf_counter()
+        vectors = build_vectors(documents, settings['max_df'], settings['max_terms'])
+        vectorised = time.perf_counter()
+        neighbours = nearest_neighbours(vectors, settings['top_k'], settings['max_postings'], settings['min_score'])
+        done = time.perf_counter()
+
+        self.stdout.write(f'products      {count}')
+        self.stdout.write(f'vectorise     {vectorised - started:.2f} s')
+        self.stdout.write(f'neighbours    {done - vectorised:.2f} s')
+        self.stdout.write(f'per product   {(done - started) / count * 1000:.3f} ms')
+        self.stdout.write(f'avg neighbours {sum(map(len, neighbours.values())) / count:.1f}')
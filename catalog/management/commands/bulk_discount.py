@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from catalog.models import Category, Product
+from catalog.pricing import apply_discount, remove_discount
+
+
+class Command(BaseCommand):
+    help = 'Apply or remove a percentage discount on whole categories (or the whole store) in one UPDATE.'
+
+    def add_arguments(self, parser):
+        action = parser.add_mutually_exclusive_group(required=True)
+        action.add_argument('--percent', type=int, help='Discount to apply, 1-100.')
+        action.add_argument('--remove', action='store_true', help='Restore the original prices.')
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument('--category', action='append', metavar='SLUG', help='Category slug; repeat for several.')
+        target.add_argument('--all', action='store_true', help='Every product in the store.')
+
+    def handle(self, *args, **options):
+        products = Product.objects.all()
+        if options['category']:
+            slugs = set(options['category'])
+            found = set(Category.objects.filter(slug__in=slugs).values_list('slug', flat=True))
+            if slugs - found:
+                raise CommandError(f'Unknown category: {", ".join(sorted(slugs - found))}')
+            products = products.filter(category__slug__in=slugs)
+
+        if options['remove']:
+            updated = remove_discount(products)
+            self.stdout.write(self.style.SUCCESS(f'Discount removed from {updated} product(s).'))
+        else:
+            try:
+                updated = apply_discount(products, options['percent'])
+            except ValueError as e:
+                raise CommandError(str(e))
+            self.stdout.write(self.style.SUCCESS(f'{options["percent"]}% discount applied to {updated} product(s).'))
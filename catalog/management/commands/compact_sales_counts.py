@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from catalog.sales import compact_sales
+
+
+class Command(BaseCommand):
+    help = (
+        'Fold pending sales increments into the products\' sales counts. '
+        'Schedule it every few minutes; best-seller listings lag by at most that long.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000, help='Increments folded per transaction.')
+
+    def handle(self, *args, **options):
+        folded, products = compact_sales(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{folded} increment(s) folded into {products} product(s).'))
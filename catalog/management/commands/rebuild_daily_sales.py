@@ -0,0 +1,28 @@
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from catalog.sales import compact_sales, rebuild_daily_sales
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the daily sales rollups from the order items, e.g. to backfill history. '
+        'Folds pending sales increments first; rebuild only days whose orders have been recorded.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', required=True, help='First day to rebuild (YYYY-MM-DD).')
+        parser.add_argument('--until', help='Last day to rebuild (YYYY-MM-DD, default yesterday).')
+
+    def handle(self, *args, **options):
+        try:
+            since = date.fromisoformat(options['since'])
+            until = date.fromisoformat(options['until']) if options['until'] else timezone.localdate() - timedelta(days=1)
+        except ValueError as e:
+            raise CommandError(str(e))
+        if until < since:
+            raise CommandError('--until is before --since.')
+
+        compact_sales()
+        written = rebuild_daily_sales(since, until)
+        self.stdout.write(self.style.SUCCESS(f'{written} daily sales row(s) written for {since}..{until}.'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from catalog.search import get_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text product search index from the product table.'
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        if backend is None:
+            raise CommandError(f'No full-text search backend for the "{connection.vendor}" database.')
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            backend.create(cursor)
+            backend.index(cursor)
+
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt.'))
@@ -0,0 +1,36 @@
+import time
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from catalog.pricing import recompute_effective_prices
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the stored effective price of every product from the offers valid now. '
+        'Schedule it to run when offers start or end, or keep it running with --watch.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--watch', action='store_true',
+            help='Keep running and recompute at every offer start/end boundary.'
+        )
+        parser.add_argument(
+            '--max-sleep', type=int, default=300,
+            help='With --watch, seconds to wait at most between runs (default 300), '
+                 'so offers created elsewhere are picked up.'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            changed, resolver = recompute_effective_prices()
+            self.stdout.write(self.style.SUCCESS(f'{changed} effective price(s) updated.'))
+            if not options['watch']:
+                return
+
+            sleep = options['max_sleep']
+            if resolver.expires_at is not None:
+                until_boundary = (resolver.expires_at - timezone.now()).total_seconds()
+                # Wake just past the boundary so an ending offer is no longer valid
+                sleep = min(sleep, max(until_boundary, 0) + 1)
+            time.sleep(sleep)
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.11 on 2026-10-17 20:46
+
+from django.db import migrations, models
+
+
+def fold_existing_rows(apps, schema_editor):
+    from catalog.normalization import fold_text
+    from catalog.search import get_backend
+
+    fields = {
+        'Category': ('name_en', 'name_ar'),
+        'Product': ('name_en', 'name_ar', 'description_en', 'description_ar'),
+    }
+    for model_name, sources in fields.items():
+        model = apps.get_model('catalog', model_name)
+        folded = [f'folded_{source}' for source in sources]
+        objects = list(model.objects.only('pk', *sources))
+        for obj in objects:
+            for source in sources:
+                setattr(obj, f'folded_{source}', fold_text(getattr(obj, source)))
+        model.objects.bulk_update(objects, folded, batch_size=500)
+
+    # The full-text index now covers the folded columns
+    backend = get_backend(schema_editor.connection)
+    if backend is not None:
+        with schema_editor.connection.cursor() as cursor:
+            backend.drop(cursor)
+            backend.create(cursor)
+            backend.index(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0008_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='folded_name_ar',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='folded_name_en',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='folded_description_ar',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='folded_description_en',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='folded_name_ar',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='folded_name_en',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(fold_existing_rows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.11 on 2026-10-17 20:53
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_effective_prices(apps, schema_editor):
+    from catalog.offers import OfferResolver
+
+    Product = apps.get_model('catalog', 'Product')
+    Offer = apps.get_model('catalog', 'Offer')
+    Product.objects.update(effective_price=models.F('price'))
+
+    now = timezone.now()
+    offers = Offer.objects.filter(is_active=True, start_date__lte=now, end_date__gte=now).order_by('pk')
+    resolver = OfferResolver(offers)
+    products = list(Product.objects.filter(
+        models.Q(pk__in=resolver.by_product) | models.Q(category_id__in=resolver.by_category)
+    ).only('pk', 'category_id', 'price'))
+    for product in products:
+        product.effective_price = resolver.resolve(product).price
+    Product.objects.bulk_update(products, ['effective_price'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0010_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='effective_price',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+        migrations.RunPython(fill_effective_prices, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_active_price_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_active_cat_price_idx',
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['effective_price', 'id'], name='product_active_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['category', 'effective_price', 'id'], name='product_active_cat_price_idx'),
+        ),
+    ]
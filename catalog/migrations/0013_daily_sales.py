@@ -0,0 +1,53 @@
+# Generated by Django 5.2.11 on 2026-10-17 21:11
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def fill_days(apps, schema_editor):
+    # Increments not yet compacted keep the local day they were recorded on
+    SalesIncrement = apps.get_model('catalog', 'SalesIncrement')
+    SalesIncrement.objects.update(day=TruncDate('created_at', tzinfo=timezone.get_current_timezone()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0012_sales_increments'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salesincrement',
+            name='day',
+            field=models.DateField(null=True),
+        ),
+        migrations.RunPython(fill_days, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='salesincrement',
+            name='day',
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+        migrations.RemoveField(
+            model_name='salesincrement',
+            name='created_at',
+        ),
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('category', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='catalog.category')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='catalog.product')),
+            ],
+            options={
+                'verbose_name_plural': 'Daily sales',
+                'indexes': [models.Index(fields=['category', 'day'], name='daily_sales_category_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'product'), name='unique_daily_sales')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.11 on 2026-10-17 21:43
+
+import catalog.models
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0015_similar_products'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(django.db.models.functions.comparison.Coalesce(django.db.models.functions.comparison.NullIf('name_ar', catalog.models.Blank(), output_field=models.CharField()), 'name_en', output_field=models.CharField()), models.F('id'), condition=models.Q(('is_active', True)), name='product_active_name_ar_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.11 on 2026-10-17 21:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0016_product_name_ar_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='category',
+            name='folded_name_ar',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='category',
+            name='folded_name_en',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+    ]
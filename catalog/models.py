@@ -1,13 +1,49 @@
+from django.conf import settings
 from django.db import models
 from django.utils.text import slugify
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db.models.functions import Coalesce, NullIf
 from django.utils import timezone
 
+# Number of color swatches shown on a product card before the "+N" label
+CARD_COLOR_LIMIT = 5
+
+
+class Blank(models.Expression):
+    """
+    An empty string written into the SQL itself. A bound parameter would
+    stop SQLite from matching the query to an expression index.
+    """
+    output_field = models.CharField()
+
+    def as_sql(self, compiler, connection):
+        return "''", []
+
+
+def translated_field(field, language):
+    """
+    The ``language`` column of a translated field, falling back to the
+    default language's where it is blank, as modeltranslation does when
+    reading the attribute.
+    """
+    default = settings.MODELTRANSLATION_DEFAULT_LANGUAGE
+    if language == default:
+        return models.F(f'{field}_{default}')
+    return Coalesce(
+        NullIf(f'{field}_{language}', Blank(), output_field=models.CharField()),
+        f'{field}_{default}',
+        output_field=models.CharField(),
+    )
+
 class Category(models.Model):
     name = models.CharField(max_length=255)
     slug = models.SlugField(unique=True, max_length=255)
     image = models.ImageField(upload_to='categories/', blank=True, null=True)
     is_active = models.BooleanField(default=True)
+
+    # Search-folded copies of the translated name (see catalog.translation)
+    folded_name_en = models.CharField(max_length=255, blank=True, default='', editable=False)
+    folded_name_ar = models.CharField(max_length=255, blank=True, default='', editable=False)
     
     class Meta:
         verbose_name_plural = 'Categories'
@@ -22,6 +58,24 @@ class Category(models.Model):
         super().save(*args, **kwargs)
 
 
+class ProductQuerySet(models.QuerySet):
+    def for_cards(self):
+        """
+        Preload everything the product card partial renders, so a listing
+        costs a fixed number of queries regardless of how many cards it shows.
+        """
+        color_count = ProductColor.objects.filter(
+            product=models.OuterRef('pk')
+        ).order_by().values('product').annotate(n=models.Count('pk')).values('n')
+        return self.select_related('category').annotate(
+            # Colors beyond the dots the card shows, for its "+N" label
+            color_overflow=Coalesce(models.Subquery(color_count), 0) - CARD_COLOR_LIMIT,
+        ).prefetch_related(
+            models.Prefetch('images', queryset=ProductImage.objects.all()[:1], to_attr='card_images'),
+            models.Prefetch('colors', queryset=ProductColor.objects.all()[:CARD_COLOR_LIMIT], to_attr='card_colors'),
+        )
+
+
 class Product(models.Model):
     category = models.ForeignKey(Category, related_name='products', on_delete=models.CASCADE)
     name = models.CharField(max_length=255)
@@ -34,18 +88,59 @@ class Product(models.Model):
     is_featured = models.BooleanField(default=False)
     
     # Best-seller tracking: denormalized field for read performance
-    sales_count = models.PositiveIntegerField(default=0, db_index=True)
+    sales_count = models.PositiveIntegerField(default=0)
     
     discount_percentage = models.PositiveIntegerField(default=0, validators=[MaxValueValidator(100)])
 
+    # Price after the active offer, if any (see catalog.pricing)
+    effective_price = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
+
+    # Search-folded copies of the translated fields (see catalog.translation)
+    folded_name_en = models.CharField(max_length=255, blank=True, default='', editable=False, db_index=True)
+    folded_name_ar = models.CharField(max_length=255, blank=True, default='', editable=False, db_index=True)
+    folded_description_en = models.TextField(blank=True, default='', editable=False)
+    folded_description_ar = models.TextField(blank=True, default='', editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        # One index per listing access path. Shoppers only ever see active
+        # products, so the indexes are partial where the backend allows it
+        # and each one ends in ``id`` to match the keyset tiebreaker.
         indexes = [
-            models.Index(fields=['slug']),
-            models.Index(fields=['is_active']),
+            models.Index(
+                fields=['-created_at', '-id'], name='product_active_newest_idx',
+                condition=models.Q(is_active=True)
+            ),
+            models.Index(
+                fields=['category', '-created_at', '-id'], name='product_active_cat_newest_idx',
+                condition=models.Q(is_active=True)
+            ),
+            models.Index(
+                fields=['effective_price', 'id'], name='product_active_price_idx',
+                condition=models.Q(is_active=True)
+            ),
+            models.Index(
+                fields=['category', 'effective_price', 'id'], name='product_active_cat_price_idx',
+                condition=models.Q(is_active=True)
+            ),
+            models.Index(
+                fields=['name_en', 'id'], name='product_active_name_idx',
+                condition=models.Q(is_active=True)
+            ),
+            # The Arabic name sort falls back to English for untranslated names
+            models.Index(
+                translated_field('name', 'ar'), 'id', name='product_active_name_ar_idx',
+                condition=models.Q(is_active=True)
+            ),
+            models.Index(
+                fields=['-sales_count', 'id'], name='product_active_best_idx',
+                condition=models.Q(is_active=True)
+            ),
         ]
 
     def __str__(self):
@@ -61,10 +156,10 @@ class Product(models.Model):
                 # If no original price set, assign current price to it
                 self.compare_at_price = self.price
             
-            # Calculate new selling price
-            from decimal import Decimal
+            # Calculate new selling price, rounded half up to the cent like apply_discount()
+            from decimal import Decimal, ROUND_HALF_UP
             discount_factor = Decimal(1) - (Decimal(self.discount_percentage) / Decimal(100))
-            self.price = self.compare_at_price * discount_factor
+            self.price = (self.compare_at_price * discount_factor).quantize(Decimal('0.01'), ROUND_HALF_UP)
             
         super().save(*args, **kwargs)
     
@@ -117,6 +212,24 @@ class Offer(models.Model):
     product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True, related_name='active_offers')
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='active_offers')
 
+    class Meta:
+        # Offers are looked up by target and "not yet ended"; start_date is
+        # checked on the few rows that survive
+        indexes = [
+            models.Index(
+                fields=['product', 'end_date'], name='offer_active_product_idx',
+                condition=models.Q(is_active=True)
+            ),
+            models.Index(
+                fields=['category', 'end_date'], name='offer_active_category_idx',
+                condition=models.Q(is_active=True)
+            ),
+            models.Index(
+                fields=['end_date'], name='offer_active_end_idx',
+                condition=models.Q(is_active=True)
+            ),
+        ]
+
     def __str__(self):
         return self.title
     
@@ -124,3 +237,117 @@ class Offer(models.Model):
     def is_valid(self):
         now = timezone.now()
         return self.is_active and self.start_date <= now <= self.end_date
+
+
+class SalesIncrement(models.Model):
+    """
+    Units sold of a product, appended per order and folded into
+    ``Product.sales_count`` by ``compact_sales_counts`` (see ``catalog.sales``).
+    """
+    # No index on product: rows are only ever inserted and then read back in id order
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+', db_index=False)
+    quantity = models.PositiveIntegerField()
+    # The day of the order, for the daily rollups
+    day = models.DateField(default=timezone.localdate)
+
+    def __str__(self):
+        return f"+{self.quantity} for {self.product_id}"
+
+
+class DailySales(models.Model):
+    """
+    Units of a product sold on one day, kept up to date by sales compaction;
+    the source of the windowed best-seller rankings.
+    """
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+    # The product's category when the sales were folded in, for per-category rankings
+    category = models.ForeignKey(
+        Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', db_index=False
+    )
+    quantity = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'Daily sales'
+        constraints = [
+            # Also the index for "sold since <day>" range scans
+            models.UniqueConstraint(fields=['day', 'product'], name='unique_daily_sales'),
+        ]
+        indexes = [
+            models.Index(fields=['category', 'day'], name='daily_sales_category_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity}x {self.product_id} on {self.day}"
+
+
+class ProductRecommendation(models.Model):
+    """
+    A product often bought together with ``product``, ``rank`` 1 being the
+    strongest; rebuilt in bulk by ``build_recommendations``.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recommendations')
+    recommended = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recommended_by')
+    rank = models.PositiveSmallIntegerField()
+    # Orders that contained both products
+    score = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ['product', 'rank']
+        constraints = [
+            # Also the index the product page reads its recommendations through
+            models.UniqueConstraint(fields=['product', 'rank'], name='unique_recommendation_rank'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.recommended_id} (#{self.rank})"
+
+
+class ProductTerm(models.Model):
+    """
+    One weighted term of a product's TF-IDF vector (see ``catalog.similarity``),
+    kept so a saved product can be compared with the rest without a rebuild.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    term = models.CharField(max_length=100)
+    weight = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['term'], name='product_term_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.term} ({self.weight:.3f}) for {self.product_id}"
+
+
+class DocumentFrequency(models.Model):
+    """
+    How many active products use ``term``, as of the last similarity rebuild.
+    """
+    term = models.CharField(max_length=100, unique=True)
+    products = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"{self.term}: {self.products}"
+
+
+class SimilarProduct(models.Model):
+    """
+    A product whose name and description read like ``product``'s, ``rank`` 1
+    being the closest by cosine ``score``.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='similar_products')
+    similar = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='similar_to')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['product', 'rank']
+        constraints = [
+            # Also the index the product page reads its similar products through
+            models.UniqueConstraint(fields=['product', 'rank'], name='unique_similar_rank'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} ~ {self.similar_id} (#{self.rank})"
@@ -0,0 +1,40 @@
+"""
+Text folding for search.
+
+Shoppers type Arabic with or without diacritics, with any alef/hamza form,
+and with taa marbuta or haa interchangeably. ``fold_text`` maps all of those
+spellings (and Latin case/accents) to one canonical form, so both the
+indexed copies and the incoming queries can be compared with plain equality
+or prefix lookups.
+"""
+import re
+import unicodedata
+
+
+# Letters that stay distinct after NFKD but are typed interchangeably
+ARABIC_LETTER_MAP = str.maketrans({
+    'ٱ': 'ا',  # alef wasla -> alef
+    'ى': 'ي',  # alef maksura -> yeh
+    'ی': 'ي',  # farsi yeh -> yeh
+    'ة': 'ه',  # taa marbuta -> haa
+    'ک': 'ك',  # keheh -> kaf
+    'ـ': None,      # tatweel
+    **{chr(0x0660 + digit): str(digit) for digit in range(10)},  # Arabic-Indic digits
+    **{chr(0x06f0 + digit): str(digit) for digit in range(10)},  # Extended Arabic-Indic digits
+})
+
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def fold_text(text):
+    """
+    Fold ``text`` for matching: decompose, drop every combining mark
+    (Arabic harakat, hamza/madda carriers, Latin accents), unify letter
+    variants, casefold and collapse whitespace.
+    """
+    if not text:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', text)
+    stripped = ''.join(char for char in decomposed if unicodedata.category(char) != 'Mn')
+    folded = stripped.translate(ARABIC_LETTER_MAP).casefold()
+    return WHITESPACE_RE.sub(' ', folded).strip()
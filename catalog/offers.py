@@ -0,0 +1,145 @@
+"""
+Batch offer resolution for product cards and the product detail page.
+
+``OfferResolver`` holds every currently valid offer in two maps, product id
+-> offer and category id -> offer, and prices a whole page of products
+without touching the database. A product offer wins over a category offer;
+among several offers for the same target the oldest (lowest id) wins, as
+the detail page's ``.first()`` lookups always did.
+
+The resolver is cached under a version number that every ``Offer`` save or
+delete bumps (see ``catalog.signals``) and is rebuilt as soon as the next
+offer starts or ends.
+"""
+from collections import namedtuple
+from decimal import Decimal, ROUND_HALF_UP
+from django.core.cache import cache
+from django.utils import timezone
+
+
+# Upper bound for a cached resolver when no offer is scheduled to change
+OFFER_CACHE_TIMEOUT = 60 * 60
+OFFER_VERSION_KEY = 'catalog:offers:version'
+
+CENT = Decimal('0.01')
+
+Discount = namedtuple('Discount', ['offer', 'price', 'percent'])
+
+
+def discount_for(offer, price):
+    """
+    Price ``price`` under ``offer``: the discounted price rounded to cents and
+    the whole-number percentage saved (``None`` when nothing is saved).
+    """
+    if offer.offer_type == 'percentage':
+        percent = offer.value
+        discount_price = price * (1 - offer.value / 100)
+    else:  # fixed amount
+        discount_price = max(price - offer.value, Decimal(0))
+        percent = (price - discount_price) / price * 100 if price > 0 else None
+    percent = int(percent.quantize(Decimal(1))) if percent else None
+    return Discount(offer, discount_price.quantize(CENT, rounding=ROUND_HALF_UP), percent or None)
+
+
+class OfferResolver:
+    """
+    A snapshot of the offers valid at one moment (in id order), good until
+    ``expires_at``.
+    """
+
+    def __init__(self, offers, expires_at=None):
+        self.offers = list(offers)
+        self.expires_at = expires_at
+        self.by_product = {}
+        self.by_category = {}
+        for offer in self.offers:
+            if offer.product_id is not None:
+                self.by_product.setdefault(offer.product_id, offer)
+            if offer.category_id is not None:
+                self.by_category.setdefault(offer.category_id, offer)
+
+    @classmethod
+    def load(cls, now=None):
+        """
+        Read the offers valid at ``now`` and the moment the next one starts or ends.
+        """
+        from .models import Offer
+
+        now = now or timezone.now()
+        offers = list(Offer.objects.filter(
+            is_active=True, end_date__gte=now
+        ).select_related('product', 'category'))
+        # Sorted here rather than in SQL so the end_date index drives the query
+        valid = sorted((offer for offer in offers if offer.start_date <= now), key=lambda offer: offer.pk)
+        boundaries = [offer.start_date for offer in offers if offer.start_date > now]
+        boundaries += [offer.end_date for offer in valid]
+        return cls(valid, expires_at=min(boundaries, default=None))
+
+    def is_expired(self, now=None):
+        return self.expires_at is not None and (now or timezone.now()) >= self.expires_at
+
+    def offer_for(self, product):
+        """
+        The offer that applies to ``product``: its own, else its category's.
+        """
+        return self.by_product.get(product.pk) or self.by_category.get(product.category_id)
+
+    def resolve(self, product):
+        """
+        Return the ``Discount`` for ``product``, or ``None`` without an offer.
+        """
+        offer = self.offer_for(product)
+        if offer is None:
+            return None
+        return discount_for(offer, product.price)
+
+    def apply(self, products):
+        """
+        Set ``offer``, ``discount_price`` and ``discount_percent`` on every
+        product (``None`` when no offer applies) and return them.
+        """
+        for product in products:
+            discount = self.resolve(product)
+            product.offer = discount.offer if discount else None
+            product.discount_price = discount.price if discount else None
+            product.discount_percent = discount.percent if discount else None
+        return products
+
+
+def _cache_key():
+    return f'catalog:offers:{cache.get(OFFER_VERSION_KEY, 0)}'
+
+
+def get_offer_resolver():
+    """
+    Return the cached resolver, loading a fresh one when it is missing,
+    invalidated or past its next offer boundary.
+    """
+    now = timezone.now()
+    key = _cache_key()
+    resolver = cache.get(key)
+    if resolver is None or resolver.is_expired(now):
+        resolver = OfferResolver.load(now)
+        timeout = OFFER_CACHE_TIMEOUT
+        if resolver.expires_at is not None:
+            timeout = max(1, min(timeout, int((resolver.expires_at - now).total_seconds()) + 1))
+        cache.set(key, resolver, timeout)
+    return resolver
+
+
+def apply_offers(products):
+    """
+    Price a page of products with the current offers.
+    """
+    return get_offer_resolver().apply(products)
+
+
+def invalidate_offers():
+    """
+    Drop the cached resolver by moving to a new version number.
+    """
+    if not cache.add(OFFER_VERSION_KEY, 1, timeout=None):
+        try:
+            cache.incr(OFFER_VERSION_KEY)
+        except ValueError:
+            cache.set(OFFER_VERSION_KEY, 1, timeout=None)
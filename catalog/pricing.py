@@ -0,0 +1,146 @@
+"""
+The price a customer actually pays, stored on the product.
+
+``Product.effective_price`` is ``price`` (which already includes
+``discount_percentage``) with the currently applicable ``Offer`` on top, so
+listings can sort and filter on it with an index. It is set on every
+product save, refreshed for the affected products on every offer write (see
+``catalog.signals``) and recomputed in bulk by the
+``recompute_effective_prices`` command when offers start or end.
+
+``apply_discount``/``remove_discount`` reprice whole querysets with one
+``UPDATE`` following the same rules as ``Product.save()``.
+"""
+from django.db import transaction
+from django.db.models import DecimalField, F, Func, Q, Value
+from django.db.models.functions import Coalesce
+from .facets import invalidate_facets
+from .models import Product
+from .offers import OfferResolver, get_offer_resolver
+
+
+def effective_price(product, resolver=None):
+    """
+    The price ``product`` sells for under ``resolver`` (default: the cached one).
+    """
+    discount = (resolver or get_offer_resolver()).resolve(product)
+    return discount.price if discount else product.price
+
+
+def recompute_effective_prices(products=None, now=None, batch_size=1000):
+    """
+    Recompute ``effective_price`` for ``products`` (default: all) against the
+    offers valid at ``now``, writing only the rows that changed.
+
+    Only the products an offer targets are priced one by one. The others sell
+    at their plain ``price``, and the few still holding an old offer price are
+    reset with a single ``UPDATE``.
+
+    Returns ``(changed, resolver)``; ``resolver.expires_at`` is when the
+    prices next need recomputing.
+    """
+    resolver = OfferResolver.load(now)
+    if products is None:
+        products = Product.objects.all()
+    products = products.order_by()
+    targets = Q(pk__in=list(resolver.by_product)) | Q(category_id__in=list(resolver.by_category))
+
+    reset = products.exclude(targets).exclude(effective_price=F('price')).update(effective_price=F('price'))
+    changed = []
+    offered = products.filter(targets).only('pk', 'category_id', 'price', 'effective_price')
+    for product in offered.iterator(chunk_size=batch_size):
+        price = effective_price(product, resolver)
+        if price != product.effective_price:
+            product.effective_price = price
+            changed.append(product)
+    Product.objects.bulk_update(changed, ['effective_price'], batch_size=batch_size)
+
+    if reset or changed:
+        invalidate_facets()
+    return reset + len(changed), resolver
+
+
+def refresh_offer_targets(product_ids=(), category_ids=()):
+    """
+    Recompute the products an offer targets (or targeted before an edit).
+    """
+    product_ids = {pk for pk in product_ids if pk is not None}
+    category_ids = {pk for pk in category_ids if pk is not None}
+    if not product_ids and not category_ids:
+        return 0
+    products = Product.objects.filter(Q(pk__in=product_ids) | Q(category_id__in=category_ids))
+    changed, _ = recompute_effective_prices(products)
+    return changed
+
+
+def _offered_ids(products):
+    """
+    Ids of the ``products`` an offer applies to; a bulk update sets their
+    ``effective_price`` to the plain price, so they are recomputed afterwards.
+    """
+    resolver = get_offer_resolver()
+    if not resolver.by_product and not resolver.by_category:
+        return []
+    return list(products.filter(
+        Q(pk__in=list(resolver.by_product)) | Q(category_id__in=list(resolver.by_category))
+    ).values_list('pk', flat=True))
+
+
+def _round(expression):
+    # A plain ROUND(): modeltranslation's update() cannot rewrite the Round transform
+    return Func(expression, Value(0), function='ROUND', output_field=DecimalField(max_digits=14, decimal_places=0))
+
+
+def _after_bulk_price_change():
+    invalidate_facets()
+    transaction.on_commit(invalidate_facets)
+
+
+def apply_discount(products, percentage):
+    """
+    Sell every product in ``products`` at ``percentage`` off its original
+    price, like saving each one with ``discount_percentage`` set: the current
+    price becomes ``compare_at_price`` if that is empty, and ``price`` is
+    ``compare_at_price`` scaled down. Returns the number of products updated.
+    """
+    percentage = int(percentage)
+    if not 0 < percentage <= 100:
+        raise ValueError('The discount must be between 1 and 100 percent.')
+
+    original = Coalesce('compare_at_price', 'price')
+    # Rounded half up in whole cents like save(): the halves land on exact
+    # .5 values, which even SQLite's floating point ROUND() gets right
+    cents = _round(original * Value(100))
+    new_price = _round(cents * Value(100 - percentage) / Value(100)) / Value(100)
+    with transaction.atomic():
+        offered = _offered_ids(products)
+        updated = products.update(
+            compare_at_price=original,
+            price=new_price,
+            effective_price=new_price,
+            discount_percentage=percentage,
+        )
+        if offered:
+            recompute_effective_prices(Product.objects.filter(pk__in=offered))
+        _after_bulk_price_change()
+    return updated
+
+
+def remove_discount(products):
+    """
+    Undo ``apply_discount``: products with a percentage discount go back to
+    their ``compare_at_price``. Returns the number of products updated.
+    """
+    products = products.filter(discount_percentage__gt=0)
+    original = Coalesce('compare_at_price', 'price')
+    with transaction.atomic():
+        offered = _offered_ids(products)
+        updated = products.update(
+            price=original,
+            effective_price=original,
+            discount_percentage=0,
+        )
+        if offered:
+            recompute_effective_prices(Product.objects.filter(pk__in=offered))
+        _after_bulk_price_change()
+    return updated
@@ -0,0 +1,86 @@
+"""
+"Frequently bought together" recommendations.
+
+``build_recommendations`` computes the product co-occurrence matrix from the
+order items: the product x product counts of orders that contained both.
+Only the non-zero cells are ever produced, since the matrix is a self-join of
+the order lines on their order grouped by product pair, and the database
+ranks each row with a window function. The top ``top_k`` neighbours of every
+product replace the contents of ``ProductRecommendation`` in one transaction,
+so the product page reads them back with a single indexed query, together
+with the text-similar products that stand in for products without order
+history (and falls back to other products of the category without either).
+
+Very large orders (wholesale, test orders) would add ``lines ** 2`` pairs of
+noise and are left out above ``max_basket`` lines.
+"""
+from django.db import transaction
+from django.db.models import Count, F, Value, Window
+from django.db.models.functions import RowNumber
+from .models import ProductRecommendation, SimilarProduct
+
+
+def co_occurrences(top_k=10, min_orders=2, max_basket=50):
+    """
+    ``(product_id, partner_id, orders, rank)`` for the ``top_k`` partners of
+    every product bought together with it in at least ``min_orders`` orders.
+    """
+    from orders.models import OrderItem
+
+    baskets = OrderItem.objects.values('order').annotate(lines=Count('pk')).filter(
+        lines__lte=max_basket
+    ).values('order')
+    return OrderItem.objects.filter(
+        order__in=baskets, product__isnull=False
+    ).annotate(
+        partner=F('order__items__product')
+    ).filter(
+        partner__isnull=False
+    ).exclude(
+        partner=F('product')
+    ).values('product', 'partner').annotate(
+        together=Count('order', distinct=True)
+    ).filter(
+        together__gte=min_orders
+    ).annotate(
+        rank=Window(RowNumber(), partition_by=F('product'), order_by=[F('together').desc(), F('partner').asc()])
+    ).filter(
+        rank__lte=top_k
+    ).values_list('product', 'partner', 'together', 'rank')
+
+
+def build_recommendations(top_k=10, min_orders=2, max_basket=50, batch_size=2000):
+    """
+    Replace every stored recommendation with a fresh top-k. Returns the number stored.
+    """
+    rows = co_occurrences(top_k, min_orders, max_basket).iterator(chunk_size=batch_size)
+    stored = 0
+    with transaction.atomic():
+        ProductRecommendation.objects.all().delete()
+        batch = []
+        for product, partner, together, rank in rows:
+            batch.append(ProductRecommendation(product_id=product, recommended_id=partner, score=together, rank=rank))
+            if len(batch) == batch_size:
+                stored += len(ProductRecommendation.objects.bulk_create(batch))
+                batch = []
+        stored += len(ProductRecommendation.objects.bulk_create(batch))
+    return stored
+
+
+def recommended_ids(product, limit=4):
+    """
+    Ids of up to ``limit`` active products to show with ``product``, in one
+    query: those bought together with it, then those similar to it by text
+    (see ``catalog.similarity``), best first.
+    """
+    bought = ProductRecommendation.objects.filter(
+        product=product, recommended__is_active=True
+    ).annotate(source=Value(0)).order_by().values_list('recommended_id', 'source', 'rank')
+    similar = SimilarProduct.objects.filter(
+        product=product, similar__is_active=True
+    ).annotate(source=Value(1)).order_by().values_list('similar_id', 'source', 'rank')
+    ids = []
+    for pk, _, _ in bought.union(similar, all=True).order_by('source', 'rank'):
+        if pk not in ids:
+            ids.append(pk)
+    return ids[:limit]
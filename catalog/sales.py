@@ -0,0 +1,218 @@
+"""
+Sales counters without hot rows.
+
+Checkout does not touch ``Product.sales_count``: each order appends one
+``SalesIncrement`` row per product (see ``orders.tasks.record_sales``), so
+concurrent orders for the same best seller only ever insert. The
+``compact_sales_counts`` command periodically folds the increments into
+``sales_count`` and into the per-day ``DailySales`` rollups, and deletes
+them; counts lag by at most one compaction interval.
+
+``best_sellers`` ranks products by the units sold in the last N days from
+the rollups: a range scan over one small row per product and day rather than
+an aggregate over every order item. ``rebuild_daily_sales`` backfills the
+rollups from ``OrderItem`` and ``Order.created_at``.
+
+Compaction claims its batch with ``DELETE ... RETURNING`` where the database
+supports it, so two compactors running at once never fold the same rows
+twice; elsewhere the rows are locked with ``SELECT ... FOR UPDATE`` first.
+"""
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import DailySales, Product, SalesIncrement
+
+
+# Rows written per UPDATE/INSERT statement during compaction
+UPDATE_CHUNK = 500
+
+
+# Backends that can ``INSERT ... ON CONFLICT ... DO UPDATE`` with an expression
+UPSERT_VENDORS = ('sqlite', 'postgresql')
+
+
+def record_increments(quantities, day=None):
+    """
+    Append ``{product_id: quantity}`` sold on ``day`` (default: today) as
+    increments; one ``INSERT``.
+    """
+    day = day or timezone.localdate()
+    SalesIncrement.objects.bulk_create([
+        SalesIncrement(product_id=pk, quantity=quantity, day=day)
+        for pk, quantity in quantities.items()
+        if quantity > 0
+    ])
+
+
+def _claim(batch_size):
+    """
+    Delete the oldest ``batch_size`` increments; returns their ``(product_id, quantity, day)``.
+    """
+    # Backends that can return columns from an INSERT can from a DELETE too
+    if connection.features.can_return_columns_from_insert and connection.vendor in ('sqlite', 'postgresql'):
+        table = connection.ops.quote_name(SalesIncrement._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {table} WHERE id IN (SELECT id FROM {table} ORDER BY id LIMIT %s) '
+                f'RETURNING product_id, quantity, day',
+                [batch_size]
+            )
+            # SQLite hands dates back as text
+            return [(pk, quantity, date.fromisoformat(str(day))) for pk, quantity, day in cursor.fetchall()]
+
+    ids = list(SalesIncrement.objects.select_for_update().order_by('pk').values_list('pk', flat=True)[:batch_size])
+    rows = list(SalesIncrement.objects.filter(pk__in=ids).values_list('product_id', 'quantity', 'day'))
+    SalesIncrement.objects.filter(pk__in=ids).delete()
+    return rows
+
+
+def _add_sales(totals):
+    # In id order, like checkout's row locks
+    items = sorted(totals.items())
+    for start in range(0, len(items), UPDATE_CHUNK):
+        chunk = dict(items[start:start + UPDATE_CHUNK])
+        Product.objects.filter(pk__in=chunk).update(sales_count=F('sales_count') + Case(
+            *[When(pk=pk, then=Value(sold)) for pk, sold in chunk.items()],
+            output_field=IntegerField()
+        ))
+
+
+def _add_daily_sales(daily):
+    """
+    Add ``{(day, product_id): quantity}`` to the rollups.
+    """
+    categories = dict(Product.objects.filter(
+        pk__in={pk for _, pk in daily}
+    ).values_list('pk', 'category_id'))
+    rows = [
+        (day, pk, categories[pk], quantity)
+        for (day, pk), quantity in sorted(daily.items())
+        # Products deleted since the sale have no rollups to keep
+        if pk in categories
+    ]
+    if not rows:
+        return
+
+    if connection.vendor in UPSERT_VENDORS:
+        table = connection.ops.quote_name(DailySales._meta.db_table)
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), UPDATE_CHUNK):
+                chunk = rows[start:start + UPDATE_CHUNK]
+                params = []
+                for day, pk, category, quantity in chunk:
+                    params += [connection.ops.adapt_datefield_value(day), pk, category, quantity]
+                cursor.execute(
+                    f'INSERT INTO {table} (day, product_id, category_id, quantity) '
+                    f'VALUES {", ".join(["(%s, %s, %s, %s)"] * len(chunk))} '
+                    f'ON CONFLICT (day, product_id) DO UPDATE SET '
+                    f'quantity = {table}.quantity + excluded.quantity, category_id = excluded.category_id',
+                    params
+                )
+        return
+
+    existing = {
+        (row.day, row.product_id): row
+        for row in DailySales.objects.select_for_update().filter(
+            day__in={day for day, *_ in rows}, product_id__in=categories
+        )
+    }
+    created, updated = [], []
+    for day, pk, category, quantity in rows:
+        row = existing.get((day, pk))
+        if row is None:
+            created.append(DailySales(day=day, product_id=pk, category_id=category, quantity=quantity))
+        else:
+            row.quantity += quantity
+            row.category_id = category
+            updated.append(row)
+    DailySales.objects.bulk_create(created)
+    DailySales.objects.bulk_update(updated, ['quantity', 'category'])
+
+
+def compact_sales(batch_size=10000):
+    """
+    Fold every pending increment into ``Product.sales_count`` and the daily
+    rollups, ``batch_size`` rows per transaction. Returns ``(increments,
+    products)`` folded.
+    """
+    folded = 0
+    products = set()
+    while True:
+        with transaction.atomic():
+            rows = _claim(batch_size)
+            if not rows:
+                return folded, len(products)
+            totals = Counter()
+            daily = Counter()
+            for product_id, quantity, day in rows:
+                totals[product_id] += quantity
+                daily[(day, product_id)] += quantity
+            _add_sales(totals)
+            _add_daily_sales(daily)
+        folded += len(rows)
+        products.update(totals)
+
+
+def rebuild_daily_sales(since, until):
+    """
+    Recompute the rollups for the days ``since``..``until`` from the order
+    items. Sales still waiting in increments (or in queued ``record_sales``
+    jobs) for those days would be counted twice, so run it for past days
+    after a compaction. Returns the number of rollup rows written.
+    """
+    from orders.models import OrderItem
+
+    start = timezone.make_aware(datetime.combine(since, time.min))
+    end = timezone.make_aware(datetime.combine(until + timedelta(days=1), time.min))
+    sold = OrderItem.objects.filter(
+        order__created_at__gte=start, order__created_at__lt=end, product__isnull=False
+    ).annotate(day=TruncDate('order__created_at')).values('day', 'product', 'product__category').annotate(
+        sold=Sum('quantity')
+    ).values_list('day', 'product', 'product__category', 'sold')
+    with transaction.atomic():
+        DailySales.objects.filter(day__gte=since, day__lte=until).delete()
+        return len(DailySales.objects.bulk_create(
+            [DailySales(day=day, product_id=pk, category_id=category, quantity=quantity)
+             for day, pk, category, quantity in sold.iterator()],
+            batch_size=1000
+        ))
+
+
+def ranked_sales(days, category_id=None, limit=5, today=None):
+    """
+    ``[(product_id, sold)]`` for the ``limit`` active products that sold the
+    most units in the last ``days`` days (today included).
+    """
+    since = (today or timezone.localdate()) - timedelta(days=days - 1)
+    rollups = DailySales.objects.filter(day__gte=since, product__is_active=True)
+    if category_id is not None:
+        rollups = rollups.filter(category_id=category_id)
+    return list(rollups.values('product').annotate(sold=Sum('quantity')).order_by(
+        '-sold', 'product'
+    ).values_list('product', 'sold')[:limit])
+
+
+def best_sellers(products, days, category_id=None, limit=5, fill=True):
+    """
+    The ``products`` (a queryset) that sold most in the last ``days`` days,
+    best first, each with ``recent_sales`` set. With ``fill``, a short
+    ranking is topped up by all-time ``sales_count``.
+    """
+    ranking = ranked_sales(days, category_id, limit)
+    ids = [pk for pk, _ in ranking]
+    if fill and len(ids) < limit:
+        others = products.filter(sales_count__gt=0).exclude(pk__in=ids)
+        if category_id is not None:
+            others = others.filter(category_id=category_id)
+        ids += others.order_by('-sales_count', 'pk').values_list('pk', flat=True)[:limit - len(ids)]
+    found = products.in_bulk(ids)
+    sold = dict(ranking)
+    ranked = []
+    for pk in ids:
+        if pk in found:
+            found[pk].recent_sales = sold.get(pk, 0)
+            ranked.append(found[pk])
+    return ranked
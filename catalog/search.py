@@ -0,0 +1,237 @@
+"""
+Full-text product search.
+
+Products are indexed on the search-folded copies of their English and Arabic
+names and descriptions (see ``catalog.normalization``) in a backend-native
+full-text index:
+
+* SQLite: an FTS5 virtual table keyed by the product id (rowid).
+* PostgreSQL: a ``tsvector`` table with a GIN index.
+
+The index is kept in sync by the ``Product`` signals in ``catalog.signals``
+and can be rebuilt with ``manage.py rebuild_search_index``.
+"""
+import re
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from .normalization import fold_text
+
+
+# Search-folded columns indexed for every product, in FTS column order
+INDEXED_FIELDS = ('folded_name_en', 'folded_name_ar', 'folded_description_en', 'folded_description_ar')
+
+SQLITE_TABLE = 'catalog_product_fts'
+POSTGRES_TABLE = 'catalog_product_search'
+
+TOKEN_RE = re.compile(r'[^\W_]+')
+
+
+def tokenize(query):
+    """
+    Fold a user query the same way the indexed columns are folded and split
+    it into word tokens, dropping any syntax the full-text engines would
+    interpret (quotes, operators, parentheses).
+    """
+    return TOKEN_RE.findall(fold_text(query))
+
+
+class SQLiteSearchBackend:
+    """FTS5 index, ranked with bm25 (lower is better)."""
+
+    # bm25 column weights: names count ten times as much as descriptions
+    weights = (10.0, 10.0, 1.0, 1.0)
+
+    def create(self, cursor):
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TABLE} USING fts5("
+            f"{', '.join(INDEXED_FIELDS)}, tokenize='unicode61 remove_diacritics 2')"
+        )
+
+    def drop(self, cursor):
+        cursor.execute(f"DROP TABLE IF EXISTS {SQLITE_TABLE}")
+
+    def index(self, cursor, product_ids=None):
+        """
+        (Re)index the given products, or every product when ``product_ids`` is None.
+        """
+        columns = ', '.join(INDEXED_FIELDS)
+        if product_ids is None:
+            cursor.execute(f"DELETE FROM {SQLITE_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {SQLITE_TABLE}(rowid, {columns}) SELECT id, {columns} FROM catalog_product"
+            )
+            return
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+        placeholders = ', '.join(['%s'] * len(product_ids))
+        cursor.execute(f"DELETE FROM {SQLITE_TABLE} WHERE rowid IN ({placeholders})", product_ids)
+        cursor.execute(
+            f"INSERT INTO {SQLITE_TABLE}(rowid, {columns}) "
+            f"SELECT id, {columns} FROM catalog_product WHERE id IN ({placeholders})",
+            product_ids
+        )
+
+    def remove(self, cursor, product_ids):
+        product_ids = list(product_ids)
+        if product_ids:
+            placeholders = ', '.join(['%s'] * len(product_ids))
+            cursor.execute(f"DELETE FROM {SQLITE_TABLE} WHERE rowid IN ({placeholders})", product_ids)
+
+    def build_query(self, tokens):
+        # Every token must match, each as a prefix: "lam"* "des"*
+        return ' '.join(f'"{token}"*' for token in tokens)
+
+    def filter(self, queryset, tokens, rank=True):
+        match = self.build_query(tokens)
+        table = queryset.model._meta.db_table
+        weights = ', '.join(str(weight) for weight in self.weights)
+        queryset = queryset.filter(
+            id__in=RawSQL(f"SELECT rowid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s", [match])
+        )
+        if not rank:
+            return queryset
+        return queryset.annotate(search_rank=RawSQL(
+            f"SELECT bm25({SQLITE_TABLE}, {weights}) FROM {SQLITE_TABLE} "
+            f"WHERE {SQLITE_TABLE} MATCH %s AND rowid = {table}.id",
+            [match], output_field=FloatField()
+        ))
+
+
+class PostgresSearchBackend:
+    """tsvector + GIN index, ranked with ts_rank (negated so lower is better)."""
+
+    def create(self, cursor):
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {POSTGRES_TABLE} ("
+            f"product_id bigint PRIMARY KEY REFERENCES catalog_product(id) ON DELETE CASCADE "
+            f"DEFERRABLE INITIALLY DEFERRED, "
+            f"document tsvector NOT NULL)"
+        )
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {POSTGRES_TABLE}_document_gin "
+            f"ON {POSTGRES_TABLE} USING GIN (document)"
+        )
+
+    def drop(self, cursor):
+        cursor.execute(f"DROP TABLE IF EXISTS {POSTGRES_TABLE}")
+
+    def document_sql(self):
+        # Names weigh more (A) than descriptions (B); 'simple' avoids
+        # English stemming rules mangling Arabic text
+        return (
+            "setweight(to_tsvector('simple', folded_name_en), 'A') || "
+            "setweight(to_tsvector('simple', folded_name_ar), 'A') || "
+            "setweight(to_tsvector('simple', folded_description_en), 'B') || "
+            "setweight(to_tsvector('simple', folded_description_ar), 'B')"
+        )
+
+    def index(self, cursor, product_ids=None):
+        sql = (
+            f"INSERT INTO {POSTGRES_TABLE}(product_id, document) "
+            f"SELECT id, {self.document_sql()} FROM catalog_product"
+        )
+        conflict = " ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document"
+        if product_ids is None:
+            cursor.execute(f"TRUNCATE {POSTGRES_TABLE}")
+            cursor.execute(sql)
+            return
+        product_ids = list(product_ids)
+        if product_ids:
+            cursor.execute(sql + " WHERE id = ANY(%s)" + conflict, [product_ids])
+
+    def remove(self, cursor, product_ids):
+        product_ids = list(product_ids)
+        if product_ids:
+            cursor.execute(f"DELETE FROM {POSTGRES_TABLE} WHERE product_id = ANY(%s)", [product_ids])
+
+    def build_query(self, tokens):
+        return ' & '.join(f'{token}:*' for token in tokens)
+
+    def filter(self, queryset, tokens, rank=True):
+        tsquery = self.build_query(tokens)
+        table = queryset.model._meta.db_table
+        queryset = queryset.filter(
+            id__in=RawSQL(
+                f"SELECT product_id FROM {POSTGRES_TABLE} "
+                f"WHERE document @@ to_tsquery('simple', %s)", [tsquery]
+            )
+        )
+        if not rank:
+            return queryset
+        return queryset.annotate(search_rank=RawSQL(
+            f"SELECT -ts_rank(document, to_tsquery('simple', %s)) FROM {POSTGRES_TABLE} "
+            f"WHERE product_id = {table}.id",
+            [tsquery], output_field=FloatField()
+        ))
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_backend(conn=None):
+    """
+    Return the search backend for a connection, or None when the database
+    has no supported full-text engine.
+    """
+    backend_class = BACKENDS.get((conn or connection).vendor)
+    return backend_class() if backend_class else None
+
+
+def match_products(queryset, query):
+    """
+    Restrict a product queryset to ``query`` matches without ranking them,
+    e.g. as the base of an aggregate.
+    """
+    return _search(queryset, query, rank=False)
+
+
+def search_products(queryset, query):
+    """
+    Restrict a product queryset to ``query`` matches, annotated with
+    ``search_rank`` (lower ranks first).
+    """
+    return _search(queryset, query, rank=True)
+
+
+def _search(queryset, query, rank):
+    tokens = tokenize(query)
+    backend = get_backend()
+    if tokens and backend is not None:
+        return backend.filter(queryset, tokens, rank=rank)
+
+    if not tokens:
+        queryset = queryset.none()
+    else:
+        # No full-text engine: indexed prefix match on the folded names
+        folded = ' '.join(tokens)
+        queryset = queryset.filter(
+            Q(folded_name_en__startswith=folded) | Q(folded_name_ar__startswith=folded)
+        )
+    if rank:
+        queryset = queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+    return queryset
+
+
+def index_products(product_ids=None):
+    """
+    Refresh the index for the given product ids (all products when None).
+    """
+    backend = get_backend()
+    if backend is not None:
+        with connection.cursor() as cursor:
+            backend.index(cursor, product_ids)
+
+
+def remove_products(product_ids):
+    """
+    Drop the given product ids from the index.
+    """
+    backend = get_backend()
+    if backend is not None:
+        with connection.cursor() as cursor:
+            backend.remove(cursor, product_ids)
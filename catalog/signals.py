@@ -0,0 +1,134 @@
+"""
+Keep denormalized product data in sync with the catalog.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from jobs.queue import enqueue_once
+from .models import Category, Product, Offer
+from .facets import invalidate_facets
+from .offers import invalidate_offers
+from .pricing import effective_price, refresh_offer_targets
+from .similarity import refresh_similar_products, text_fields
+from .translation import fold_translations
+from . import search, suggest
+
+
+# Product fields the similar-products vectors depend on
+SIMILARITY_FIELDS = {'is_active', 'name', 'description', *(
+    f'{field}_{language}' for field in ('name', 'description') for language in settings.MODELTRANSLATION_LANGUAGES
+)}
+
+
+@receiver(pre_save, sender=Category)
+@receiver(pre_save, sender=Product)
+def fold_translated_fields(sender, instance, raw=False, **kwargs):
+    if not raw:
+        fold_translations(instance)
+
+
+@receiver(pre_save, sender=Product)
+def set_effective_price(sender, instance, raw=False, **kwargs):
+    if not raw:
+        instance.effective_price = effective_price(instance)
+
+
+@receiver(post_save, sender=Product)
+def index_saved_product(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_products([instance.pk])
+    invalidate_facets_now_and_on_commit()
+
+
+@receiver(pre_save, sender=Product)
+def remember_similarity_text(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Saves that cannot change the text or visibility leave the vectors alone
+    instance._previous_similarity_text = None
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not set(update_fields) & SIMILARITY_FIELDS:
+        return
+    instance._previous_similarity_text = Product.objects.filter(pk=instance.pk).values_list(
+        'is_active', *text_fields()
+    ).first()
+
+
+@receiver(post_save, sender=Product)
+def queue_similarity_refresh(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        # A new product has no order history; its neighbours come from its text
+        if instance.is_active:
+            enqueue_once(refresh_similar_products, product_id=instance.pk)
+        return
+    previous = getattr(instance, '_previous_similarity_text', None)
+    current = tuple(getattr(instance, field) for field in ['is_active', *text_fields()])
+    if previous is None or previous == current:
+        return
+    enqueue_once(refresh_similar_products, product_id=instance.pk)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_deleted_product(sender, instance, **kwargs):
+    search.remove_products([instance.pk])
+    invalidate_facets_now_and_on_commit()
+
+
+def invalidate_facets_now_and_on_commit():
+    # Bumping again on commit keeps a request that read the old rows between
+    # the write and the commit from caching them under the new version
+    invalidate_facets()
+    transaction.on_commit(invalidate_facets)
+
+
+@receiver(post_save, sender=Offer)
+@receiver(post_delete, sender=Offer)
+def invalidate_offer_cache(sender, **kwargs):
+    invalidate_offers()
+    transaction.on_commit(invalidate_offers)
+
+
+@receiver(pre_save, sender=Offer)
+def remember_offer_targets(sender, instance, raw=False, **kwargs):
+    # An edit can move an offer off products that must then be repriced
+    instance._previous_targets = ()
+    if instance.pk and not raw:
+        instance._previous_targets = Offer.objects.filter(pk=instance.pk).values_list(
+            'product_id', 'category_id'
+        ).first() or ()
+
+
+@receiver(post_save, sender=Offer)
+@receiver(post_delete, sender=Offer)
+def reprice_offer_targets(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_targets', ()) or (None, None)
+    refresh_offer_targets(
+        product_ids=[instance.product_id, previous[0]],
+        category_ids=[instance.category_id, previous[1]]
+    )
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Product)
+def update_suggest_index(sender, instance, raw=False, **kwargs):
+    index = suggest.loaded_index()
+    if index is None or raw:
+        return
+    if sender is Category:
+        transaction.on_commit(lambda: suggest.index_category(index, instance))
+    else:
+        transaction.on_commit(lambda: suggest.index_product(index, instance))
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Product)
+def remove_from_suggest_index(sender, instance, **kwargs):
+    index = suggest.loaded_index()
+    if index is not None:
+        kind = suggest.CATEGORY if sender is Category else suggest.PRODUCT
+        pk = instance.pk
+        transaction.on_commit(lambda: index.remove(kind, pk))
@@ -0,0 +1,241 @@
+"""
+Content-based "similar products" from the product texts.
+
+Every product is a TF-IDF vector over the words of its search-folded names
+and descriptions in every language (name words count twice). The
+``build_similar_products`` command computes the vectors and the top-k cosine
+neighbours of every active product offline and stores them: vectors as
+``ProductTerm`` rows (with the ``DocumentFrequency`` of every term),
+neighbours as ``SimilarProduct`` rows that the product page reads with one
+indexed query.
+
+Vectors are sparse ``{term: weight}`` dicts, L2-normalised and cut to their
+``max_terms`` heaviest terms. Neighbours are found through an inverted index,
+so only products sharing a term are ever scored, and each term's postings
+are cut to its ``max_postings`` heaviest products: a word shared by
+thousands of products says little about any two of them.
+
+Creating a product, or changing its names, descriptions or visibility,
+queues ``refresh_similar_products`` (once, however many saves come before a
+worker runs it). The task re-vectorises that one product against the stored
+document frequencies, scores it with one grouped query over ``ProductTerm``
+and patches the lists it enters or leaves. The scheduled rebuild corrects
+any drift.
+"""
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+from operator import itemgetter
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Sum, Value, When
+from modeltranslation.utils import build_localized_fieldname
+from .models import DocumentFrequency, Product, ProductTerm, SimilarProduct
+
+
+WORD_RE = re.compile(r'\w{2,}')
+NAME_WEIGHT = 2
+
+DEFAULTS = {'top_k': 10, 'max_df': 0.5, 'max_terms': 24, 'max_postings': 100, 'min_score': 0.05}
+
+
+def text_fields():
+    """
+    The folded name and description columns, names first.
+    """
+    return [
+        f'folded_{build_localized_fieldname(field, language)}'
+        for field in ('name', 'description')
+        for language in settings.MODELTRANSLATION_LANGUAGES
+    ]
+
+
+def term_counts(texts):
+    """
+    Count the words of ``texts`` (as ordered by ``text_fields``); name words count twice.
+    """
+    names = len(settings.MODELTRANSLATION_LANGUAGES)
+    counts = Counter()
+    for i, text in enumerate(texts):
+        for word in WORD_RE.findall(text or ''):
+            if not word.isdigit():
+                counts[word] += NAME_WEIGHT if i < names else 1
+    return counts
+
+
+def weigh(counts, df, n, max_df=DEFAULTS['max_df'], max_terms=DEFAULTS['max_terms']):
+    """
+    The normalised TF-IDF vector of one product's ``counts`` among ``n``
+    products with document frequencies ``df``.
+    """
+    # Words in more than max_df of the products do not tell them apart
+    limit = max(max_df * n, 2)
+    weights = [
+        (term, (1 + math.log(tf)) * (math.log((1 + n) / (1 + df.get(term, 0))) + 1))
+        for term, tf in counts.items()
+        if df.get(term, 0) <= limit
+    ]
+    top = heapq.nlargest(max_terms, weights, key=itemgetter(1))
+    norm = math.sqrt(sum(weight * weight for _, weight in top)) or 1.0
+    return {term: weight / norm for term, weight in top}
+
+
+def build_vectors(documents, max_df=DEFAULTS['max_df'], max_terms=DEFAULTS['max_terms']):
+    """
+    ``{pk: vector}`` for ``{pk: term counts}``.
+    """
+    df = document_frequencies(documents)
+    n = len(documents)
+    return {pk: weigh(counts, df, n, max_df, max_terms) for pk, counts in documents.items()}
+
+
+def document_frequencies(documents):
+    df = Counter()
+    for counts in documents.values():
+        df.update(counts.keys())
+    return df
+
+
+def nearest_neighbours(vectors, top_k=DEFAULTS['top_k'], max_postings=DEFAULTS['max_postings'],
+                       min_score=DEFAULTS['min_score']):
+    """
+    ``{pk: [(other_pk, cosine), ...]}``, the ``top_k`` closest first.
+    """
+    postings = defaultdict(list)
+    for pk, vector in vectors.items():
+        for term, weight in vector.items():
+            postings[term].append((weight, pk))
+    for term, entries in postings.items():
+        if len(entries) > max_postings:
+            postings[term] = heapq.nlargest(max_postings, entries)
+
+    neighbours = {}
+    for pk, vector in vectors.items():
+        scores = {}
+        get = scores.get
+        for term, weight in vector.items():
+            for other_weight, other in postings[term]:
+                scores[other] = get(other, 0.0) + weight * other_weight
+        scores.pop(pk, None)
+        neighbours[pk] = heapq.nlargest(
+            top_k,
+            ((other, score) for other, score in scores.items() if score >= min_score),
+            key=lambda item: (item[1], -item[0])
+        )
+    return neighbours
+
+
+def _similar_rows(pk, found):
+    return [
+        SimilarProduct(product_id=pk, similar_id=other, rank=rank, score=score)
+        for rank, (other, score) in enumerate(found, start=1)
+    ]
+
+
+def build_similar_products(batch_size=2000, **options):
+    """
+    Recompute every vector and neighbour list. Returns ``(products, neighbours)`` stored.
+    """
+    options = {**DEFAULTS, **options}
+    rows = Product.objects.filter(is_active=True).values_list('pk', *text_fields())
+    documents = {pk: term_counts(texts) for pk, *texts in rows.iterator(chunk_size=batch_size)}
+    df = document_frequencies(documents)
+    vectors = {
+        pk: weigh(counts, df, len(documents), options['max_df'], options['max_terms'])
+        for pk, counts in documents.items()
+    }
+    neighbours = nearest_neighbours(vectors, options['top_k'], options['max_postings'], options['min_score'])
+
+    with transaction.atomic():
+        DocumentFrequency.objects.all().delete()
+        ProductTerm.objects.all().delete()
+        SimilarProduct.objects.all().delete()
+        _insert(DocumentFrequency, (
+            DocumentFrequency(term=term, products=products) for term, products in df.items() if len(term) <= 100
+        ), batch_size)
+        _insert(ProductTerm, (
+            ProductTerm(product_id=pk, term=term[:100], weight=weight)
+            for pk, vector in vectors.items() for term, weight in vector.items()
+        ), batch_size)
+        stored = _insert(SimilarProduct, (
+            row for pk, found in neighbours.items() for row in _similar_rows(pk, found)
+        ), batch_size)
+    return len(vectors), stored
+
+
+def _insert(model, objs, batch_size):
+    # bulk_create() would build the whole list first
+    stored = 0
+    batch = []
+    for obj in objs:
+        batch.append(obj)
+        if len(batch) == batch_size:
+            stored += len(model.objects.bulk_create(batch))
+            batch = []
+    return stored + len(model.objects.bulk_create(batch))
+
+
+def refresh_similar_products(product_id, **options):
+    """
+    Re-vectorise one product and update its list and the lists it belongs
+    in. Returns its new ``[(other_pk, cosine)]``.
+    """
+    options = {**DEFAULTS, **options}
+    product = Product.objects.filter(pk=product_id).values_list('is_active', *text_fields()).first()
+    with transaction.atomic():
+        ProductTerm.objects.filter(product_id=product_id).delete()
+        SimilarProduct.objects.filter(product_id=product_id).delete()
+        if product is None or not product[0]:
+            SimilarProduct.objects.filter(similar_id=product_id).delete()
+            return []
+
+        counts = term_counts(product[1:])
+        n = Product.objects.filter(is_active=True).count()
+        df = dict(DocumentFrequency.objects.filter(term__in=list(counts)).values_list('term', 'products'))
+        # Terms new since the rebuild occur at least in this product
+        vector = weigh(counts, {term: df.get(term, 1) for term in counts}, n,
+                       options['max_df'], options['max_terms'])
+        ProductTerm.objects.bulk_create(
+            [ProductTerm(product_id=product_id, term=term[:100], weight=weight) for term, weight in vector.items()]
+        )
+
+        found = []
+        if vector:
+            score = Sum(F('weight') * Case(
+                *[When(term=term, then=Value(weight)) for term, weight in vector.items()],
+                output_field=FloatField()
+            ))
+            found = list(ProductTerm.objects.filter(
+                term__in=list(vector), product__is_active=True
+            ).exclude(product_id=product_id).values('product').annotate(score=score).filter(
+                score__gte=options['min_score']
+            ).order_by('-score', 'product').values_list('product', 'score')[:options['top_k']])
+        SimilarProduct.objects.bulk_create(_similar_rows(product_id, found))
+        _patch_lists(product_id, dict(found), options['top_k'])
+    return found
+
+
+def _patch_lists(product_id, found, top_k):
+    """
+    Put ``product_id`` into the lists of the products it is now close to
+    (cosine is symmetric) and take it out of the others.
+    """
+    affected = set(found) | set(SimilarProduct.objects.filter(similar_id=product_id).values_list('product_id', flat=True))
+    if not affected:
+        return
+    lists = defaultdict(list)
+    for pk, other, score in SimilarProduct.objects.filter(product_id__in=affected).values_list(
+        'product_id', 'similar_id', 'score'
+    ):
+        if other != product_id:
+            lists[pk].append((other, score))
+    rows = []
+    for pk in affected:
+        entries = lists[pk]
+        if pk in found:
+            entries.append((product_id, found[pk]))
+        entries.sort(key=lambda item: (-item[1], item[0]))
+        rows += _similar_rows(pk, entries[:top_k])
+    SimilarProduct.objects.filter(product_id__in=affected).delete()
+    SimilarProduct.objects.bulk_create(rows)
@@ -0,0 +1,210 @@
+"""
+In-memory prefix index behind the search box typeahead.
+
+Each process keeps a sorted array of ``(folded key, kind, id)`` entries for
+the active product and category names in every language and answers prefix
+queries with ``bisect``, so keystrokes never reach the database. Every word
+of a name starts its own key, so "lamp" finds "Desk Lamp".
+
+The index is built lazily on first use, patched in place by the catalog
+``post_save``/``post_delete`` signals, and rebuilt after
+``SUGGEST_INDEX_TTL`` seconds so processes that did not see a signal catch
+up. Lookups keep using the old index while the rebuild runs.
+``SUGGEST_INDEX_MAX_ENTRIES`` caps its memory; products are loaded best
+sellers first, so the cap drops the least popular names.
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+from itertools import chain
+from django.conf import settings
+from modeltranslation.utils import build_localized_fieldname
+from .normalization import fold_text
+
+
+CATEGORY = 'category'
+PRODUCT = 'product'
+
+
+def _keys(names):
+    """
+    Every word-start suffix of every folded name, e.g. "desk lamp" -> {"desk lamp", "lamp"}.
+    """
+    keys = set()
+    for name in names:
+        words = fold_text(name).split(' ')
+        for i in range(len(words)):
+            key = ' '.join(words[i:])
+            if key:
+                keys.add(key)
+    return keys
+
+
+class PrefixIndex:
+    """
+    A sorted array of folded keys plus the display data of each object.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = []
+        # (kind, id) -> {'names': {lang: name}, 'slug': ..., 'weight': ..., 'keys': set()}
+        self.objects = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, kind, pk, names, slug, weight=0):
+        """
+        Insert (or replace) an object; skipped when the index is full.
+        """
+        with self.lock:
+            self._remove((kind, pk))
+            keys = _keys(name for name in names.values() if name)
+            if len(self.entries) + len(keys) > self.max_entries:
+                return False
+            for key in keys:
+                insort(self.entries, (key, kind, pk))
+            self.objects[(kind, pk)] = {'names': names, 'slug': slug, 'weight': weight, 'keys': keys}
+            return True
+
+    def fill(self, objects):
+        """
+        Load ``(kind, pk, names, slug, weight)`` tuples into an empty index,
+        sorting once at the end, until the next object would not fit.
+        """
+        entries = []
+        for kind, pk, names, slug, weight in objects:
+            keys = _keys(name for name in names.values() if name)
+            if len(entries) + len(keys) > self.max_entries:
+                break
+            entries.extend((key, kind, pk) for key in keys)
+            self.objects[(kind, pk)] = {'names': names, 'slug': slug, 'weight': weight, 'keys': keys}
+        entries.sort()
+        with self.lock:
+            self.entries = entries
+
+    def remove(self, kind, pk):
+        with self.lock:
+            self._remove((kind, pk))
+
+    def _remove(self, ref):
+        obj = self.objects.pop(ref, None)
+        if obj is None:
+            return
+        for key in obj['keys']:
+            entry = (key, *ref)
+            i = bisect_left(self.entries, entry)
+            if i < len(self.entries) and self.entries[i] == entry:
+                del self.entries[i]
+
+    def lookup(self, query, language, limit=8):
+        """
+        Return up to ``limit`` ``(kind, slug, name)`` matches for ``query``:
+        categories first, then products by weight.
+        """
+        prefix = fold_text(query)
+        if not prefix:
+            return []
+        with self.lock:
+            # Every key starting with the prefix sorts before prefix + U+10FFFF
+            start = bisect_left(self.entries, (prefix,))
+            end = bisect_left(self.entries, (prefix + '\U0010ffff',), start)
+            found = {(kind, pk) for _, kind, pk in self.entries[start:end]}
+            objects = [(ref, self.objects[ref]) for ref in found]
+
+        default = settings.MODELTRANSLATION_DEFAULT_LANGUAGE
+        # Rank every match, so a best seller late in the alphabet still shows
+        best = heapq.nsmallest(
+            limit, objects, key=lambda item: (item[0][0] != CATEGORY, -item[1]['weight'], item[0][1])
+        )
+        return [
+            (kind, obj['slug'], obj['names'].get(language) or obj['names'].get(default))
+            for (kind, pk), obj in best
+        ]
+
+
+def _names(instance):
+    return {
+        language: getattr(instance, build_localized_fieldname('name', language))
+        for language in settings.MODELTRANSLATION_LANGUAGES
+    }
+
+
+def index_category(index, category):
+    if category.is_active:
+        index.add(CATEGORY, category.pk, _names(category), category.slug)
+    else:
+        index.remove(CATEGORY, category.pk)
+
+
+def index_product(index, product):
+    if product.is_active:
+        index.add(PRODUCT, product.pk, _names(product), product.slug, weight=product.sales_count)
+    else:
+        index.remove(PRODUCT, product.pk)
+
+
+def build_index():
+    """
+    Load every active category and product name into a fresh index.
+    """
+    from .models import Category, Product
+
+    index = PrefixIndex(getattr(settings, 'SUGGEST_INDEX_MAX_ENTRIES', 50000))
+    name_fields = [build_localized_fieldname('name', language) for language in settings.MODELTRANSLATION_LANGUAGES]
+    categories = Category.objects.filter(is_active=True).only('pk', 'slug', *name_fields)
+    products = Product.objects.filter(is_active=True).order_by('-sales_count', 'pk').only(
+        'pk', 'slug', 'sales_count', *name_fields
+    )
+    index.fill(chain(
+        ((CATEGORY, category.pk, _names(category), category.slug, 0) for category in categories),
+        ((PRODUCT, product.pk, _names(product), product.slug, product.sales_count)
+         for product in products.iterator(chunk_size=2000)),
+    ))
+    return index
+
+
+_index = None
+_built_at = 0.0
+_build_lock = threading.Lock()
+
+
+def get_index():
+    """
+    Return this process's index, building it when missing.
+
+    Once it has expired, the first request to notice rebuilds it while every
+    other request keeps answering from the old one instead of waiting.
+    """
+    global _index, _built_at
+    if _index is None:
+        with _build_lock:
+            if _index is None:
+                _index, _built_at = build_index(), time.monotonic()
+        return _index
+    expired = time.monotonic() - _built_at > getattr(settings, 'SUGGEST_INDEX_TTL', 300)
+    if expired and _build_lock.acquire(blocking=False):
+        try:
+            _index, _built_at = build_index(), time.monotonic()
+        finally:
+            _build_lock.release()
+    return _index
+
+
+def loaded_index():
+    """
+    The index if this process has built one, else None (nothing to patch).
+    """
+    return _index
+
+
+def reset_index():
+    global _index
+    _index = None
+
+
+def suggest(query, language, limit=8):
+    return get_index().lookup(query, language, limit=limit)
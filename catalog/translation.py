@@ -1,5 +1,8 @@
-﻿from modeltranslation.translator import TranslationOptions, translator
+﻿from django.conf import settings
+from modeltranslation.translator import TranslationOptions, translator
+from modeltranslation.utils import build_localized_fieldname
 from .models import Category, Product
+from .normalization import fold_text
 
 
 class CategoryTranslationOptions(TranslationOptions):
@@ -11,4 +14,31 @@ class ProductTranslationOptions(TranslationOptions):
 
 
 translator.register(Category, CategoryTranslationOptions)
-translator.register(Product, ProductTranslationOptions)
\ No newline at end of file
+translator.register(Product, ProductTranslationOptions)
+
+
+# Translated fields that also keep a search-folded copy per language,
+# stored as ``folded_<field>_<lang>`` on the model
+FOLDED_FIELDS = {
+    Category: ('name',),
+    Product: ('name', 'description'),
+}
+
+
+def folded_field_names(model):
+    """
+    Map every ``folded_<field>_<lang>`` column of ``model`` to its source column.
+    """
+    return {
+        f'folded_{build_localized_fieldname(field, language)}': build_localized_fieldname(field, language)
+        for field in FOLDED_FIELDS.get(model, ())
+        for language in settings.MODELTRANSLATION_LANGUAGES
+    }
+
+
+def fold_translations(instance):
+    """
+    Refresh the folded copies of ``instance`` from its translation columns.
+    """
+    for folded, source in folded_field_names(type(instance)).items():
+        setattr(instance, folded, fold_text(getattr(instance, source)))
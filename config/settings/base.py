@@ -51,12 +51,14 @@ INSTALLED_APPS = [
     'catalog',
     'cart',
     'orders',
+    'jobs',
     'pages',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'cart.middleware.CartStoreMiddleware',
     'django.middleware.locale.LocaleMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -78,6 +80,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'django.template.context_processors.i18n',
+                'cart.context_processors.cart_summary',
             ],
         },
     },
@@ -154,3 +157,9 @@ MEDIA_ROOT = BASE_DIR / 'media'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'accounts.CustomUser'
+
+# Where carts are kept: cart.stores.SessionCartStore, CookieCartStore or CacheCartStore
+CART_STORE = env('CART_STORE', default='cart.stores.SessionCartStore')
+
+# Render the header cart badge from a lazy fetch (for full-page cached pages)
+CART_SUMMARY_LAZY = env.bool('CART_SUMMARY_LAZY', default=False)
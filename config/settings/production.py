@@ -9,3 +9,11 @@ DATABASE_URL = env('DATABASE_URL')  # will raise error if missing
 DATABASES = {
     'default': env.db('DATABASE_URL'),
 }
+
+# Shared by every worker process, so an offer or product saved in one is seen
+# by all (see catalog.offers and catalog.facets) and carts in the cache store
+# survive moving between workers. Run ``manage.py createcachetable`` for the
+# default database cache, or point CACHE_URL at Redis or Memcached.
+CACHES = {
+    'default': env.cache('CACHE_URL', default='dbcache://django_cache'),
+}
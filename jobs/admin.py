@@ -0,0 +1,19 @@
+from django.contrib import admin, messages
+from django.utils import timezone
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['task', 'status', 'attempts', 'max_attempts', 'run_at', 'created_at', 'finished_at']
+    list_filter = ['status', 'task']
+    search_fields = ['task']
+    readonly_fields = ['attempts', 'locked_at', 'locked_by', 'last_error', 'created_at', 'finished_at']
+    actions = ['retry_now']
+
+    @admin.action(description="Run selected jobs again now")
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status=Job.RUNNING).update(
+            status=Job.QUEUED, run_at=timezone.now(), attempts=0, finished_at=None
+        )
+        self.message_user(request, f"{updated} job(s) queued.", messages.SUCCESS)
@@ -0,0 +1,27 @@
+import signal
+from django.core.management.base import BaseCommand
+from jobs.worker import Worker, run_workers
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs until stopped (SIGTERM finishes the jobs in hand first).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help='Jobs run at once by each worker process.')
+        parser.add_argument('--processes', type=int, default=1, help='Worker processes to start.')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to wait when the queue is empty.')
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty.')
+
+    def handle(self, *args, **options):
+        threads = max(options['threads'], 1)
+        if options['processes'] > 1:
+            run_workers(options['processes'], threads, options['poll_interval'], options['burst'])
+            return
+
+        worker = Worker(threads=threads, poll_interval=options['poll_interval'])
+        signal.signal(signal.SIGTERM, worker.stop)
+        try:
+            done = worker.run(burst=options['burst'])
+        except KeyboardInterrupt:
+            return
+        self.stdout.write(self.style.SUCCESS(f'{done} job(s) run.'))
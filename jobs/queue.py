@@ -0,0 +1,146 @@
+"""
+A small job queue kept in the database.
+
+``enqueue(task, **payload)`` stores a ``Job`` in the caller's transaction, so
+the job exists exactly when the work that asked for it was committed. Workers
+(``manage.py runworker``) claim due jobs in batches and run each task with
+``task(**payload)`` in a transaction that also marks the job done, so tasks
+that only write to the database take effect once even if a worker dies.
+
+Claiming uses ``SELECT ... FOR UPDATE SKIP LOCKED`` where the database has
+it, so workers never wait on each other's rows. Elsewhere (SQLite) the
+candidates are claimed with a conditional ``UPDATE ... WHERE status =
+'queued'``, which writes serialise, and each worker reads back the rows that
+carry its own claim token.
+
+A failing task is retried after ``JOB_RETRY_BACKOFF * 2 ** (attempts - 1)``
+seconds, at most ``JOB_RETRY_MAX_DELAY``, until ``max_attempts`` is used
+up. Jobs left running by a worker that died are queued again after
+``JOB_LOCK_TIMEOUT`` seconds.
+"""
+import hashlib
+import json
+import logging
+import traceback
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import Job
+
+
+logger = logging.getLogger(__name__)
+
+
+def task_path(task):
+    """
+    The dotted path a worker imports ``task`` by.
+    """
+    if isinstance(task, str):
+        return task
+    return f'{task.__module__}.{task.__qualname__}'
+
+
+def enqueue(task, *, delay=None, max_attempts=None, dedupe_key='', **payload):
+    """
+    Queue ``task(**payload)``; ``payload`` must be JSON serialisable. Returns the ``Job``.
+    """
+    job = Job(task=task_path(task), payload=payload, dedupe_key=dedupe_key)
+    if delay:
+        job.run_at = timezone.now() + timedelta(seconds=delay)
+    if max_attempts:
+        job.max_attempts = max_attempts
+    job.save()
+    return job
+
+
+def enqueue_once(task, **payload):
+    """
+    Queue ``task(**payload)`` unless the same call is already waiting to run.
+    Returns the new or the waiting ``Job``.
+
+    Concurrent callers are settled by the unique constraint on queued jobs:
+    the losing insert fails and its caller gets the winner's job.
+    """
+    key = hashlib.sha256(json.dumps(payload, sort_keys=True, cls=DjangoJSONEncoder).encode()).hexdigest()
+    queued = Job.objects.filter(status=Job.QUEUED, task=task_path(task), dedupe_key=key)
+    while True:
+        job = queued.first()
+        if job is not None:
+            return job
+        try:
+            with transaction.atomic():
+                return enqueue(task, dedupe_key=key, **payload)
+        except IntegrityError:
+            # Queued by someone else since the lookup
+            continue
+
+
+def retry_delay(attempts):
+    """
+    Seconds to wait before the next try after ``attempts`` failed ones.
+    """
+    base = getattr(settings, 'JOB_RETRY_BACKOFF', 10)
+    return min(base * 2 ** (attempts - 1), getattr(settings, 'JOB_RETRY_MAX_DELAY', 3600))
+
+
+def claim(worker, limit=1, now=None):
+    """
+    Mark up to ``limit`` due jobs as running for ``worker`` and return them.
+    """
+    now = now or timezone.now()
+    token = f'{worker}:{uuid.uuid4().hex[:8]}'[-100:]
+    due = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).order_by('run_at', 'id')
+    with transaction.atomic():
+        if connection.features.has_select_for_update_skip_locked:
+            ids = list(due.select_for_update(skip_locked=True).values_list('pk', flat=True)[:limit])
+        else:
+            ids = list(due.values_list('pk', flat=True)[:limit])
+        if not ids:
+            return []
+        # The status condition drops rows another worker claimed in between
+        Job.objects.filter(pk__in=ids, status=Job.QUEUED).update(
+            # A claimed job no longer stands in for new calls, so its retries
+            # never clash with a job queued meanwhile
+            status=Job.RUNNING, locked_at=now, locked_by=token, attempts=F('attempts') + 1, dedupe_key=''
+        )
+        return list(Job.objects.filter(pk__in=ids, status=Job.RUNNING, locked_by=token).order_by('run_at', 'id'))
+
+
+def requeue_stale(now=None):
+    """
+    Queue again the jobs whose worker has held them past ``JOB_LOCK_TIMEOUT``.
+    """
+    now = now or timezone.now()
+    cutoff = now - timedelta(seconds=getattr(settings, 'JOB_LOCK_TIMEOUT', 300))
+    return Job.objects.filter(status=Job.RUNNING, locked_at__lt=cutoff).update(
+        status=Job.QUEUED, run_at=now, locked_at=None, locked_by=''
+    )
+
+
+def run_job(job):
+    """
+    Run a claimed job and record the outcome. Returns True on success.
+    """
+    # Only the claim that still holds the job may record its outcome
+    claimed = Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=job.locked_by)
+    try:
+        with transaction.atomic():
+            import_string(job.task)(**job.payload)
+            claimed.update(status=Job.DONE, finished_at=timezone.now(), last_error='')
+        return True
+    except Exception:
+        logger.exception('Job %s (%s) failed on attempt %s', job.pk, job.task, job.attempts)
+        now = timezone.now()
+        if job.attempts >= job.max_attempts:
+            claimed.update(status=Job.FAILED, finished_at=now, last_error=traceback.format_exc())
+        else:
+            claimed.update(
+                status=Job.QUEUED, run_at=now + timedelta(seconds=retry_delay(job.attempts)),
+                locked_at=None, locked_by='', last_error=traceback.format_exc()
+            )
+        return False
@@ -0,0 +1,112 @@
+"""
+The loop behind ``manage.py runworker``.
+
+A ``Worker`` claims as many due jobs as it has threads and runs them in a
+thread pool, sleeping ``poll_interval`` seconds whenever the queue is empty.
+``run_workers`` forks one worker per process for CPU-bound tasks.
+"""
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.db import DatabaseError, close_old_connections, connection, connections
+from .queue import claim, requeue_stale, run_job
+
+
+logger = logging.getLogger(__name__)
+
+
+class Worker:
+    def __init__(self, threads=1, poll_interval=1.0, name=None):
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = threading.Event()
+
+    def stop(self, *args):
+        """
+        Finish the jobs in hand, then return from ``run``.
+        """
+        self.stopping.set()
+
+    def run(self, burst=False):
+        """
+        Work until stopped, or until the queue is empty when ``burst`` is set.
+        Returns the number of jobs run.
+        """
+        executor = ThreadPoolExecutor(self.threads) if self.threads > 1 else None
+        done = 0
+        try:
+            while not self.stopping.is_set():
+                try:
+                    requeue_stale()
+                    jobs = claim(self.name, limit=self.threads)
+                except DatabaseError:
+                    # A busy or restarting database: try again after a pause
+                    logger.exception('Worker %s could not claim jobs', self.name)
+                    close_old_connections()
+                    self.stopping.wait(self.poll_interval)
+                    continue
+                if not jobs:
+                    if burst:
+                        break
+                    self.stopping.wait(self.poll_interval)
+                    continue
+                if executor is None:
+                    for job in jobs:
+                        run_job(job)
+                else:
+                    list(executor.map(self.run_in_thread, jobs))
+                done += len(jobs)
+                close_old_connections()
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return done
+
+    def run_in_thread(self, job):
+        try:
+            return run_job(job)
+        finally:
+            # Pool threads keep their own connection; do not leave it open between batches
+            connection.close()
+
+
+def _work(threads, poll_interval, burst):
+    import django
+
+    django.setup()
+    worker = Worker(threads=threads, poll_interval=poll_interval)
+    signal.signal(signal.SIGTERM, worker.stop)
+    worker.run(burst=burst)
+
+
+def run_workers(processes, threads=1, poll_interval=1.0, burst=False):
+    """
+    Run ``processes`` workers in child processes until they all exit.
+    """
+    # Children must not share the parent's database connections
+    connections.close_all()
+    children = [
+        multiprocessing.Process(target=_work, args=(threads, poll_interval, burst), daemon=True)
+        for _ in range(processes)
+    ]
+    for child in children:
+        child.start()
+
+    def stop_children(*args):
+        # SIGTERM lets each child finish the jobs in hand
+        for child in children:
+            child.terminate()
+
+    signal.signal(signal.SIGTERM, stop_children)
+    try:
+        for child in children:
+            child.join()
+    except KeyboardInterrupt:
+        stop_children()
+        for child in children:
+            child.join()
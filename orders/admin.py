@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Order, OrderItem
+from .models import Order, OrderItem, StockReservation
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
@@ -13,3 +13,10 @@ class OrderAdmin(admin.ModelAdmin):
     search_fields = ['order_number', 'customer_name', 'phone', 'state', 'city']
     inlines = [OrderItemInline]
     readonly_fields = ['order_number', 'created_at']
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ['product', 'quantity', 'session_key', 'expires_at']
+    list_select_related = ['product']
+    readonly_fields = ['created_at']
@@ -0,0 +1,58 @@
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from catalog.models import Category, Product
+from orders.models import Order
+from orders.services import place_order
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Time order placement for carts of growing size. Everything it creates '
+        'is rolled back, so it is safe to run against a development database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lines', type=int, nargs='+', default=[1, 5, 10, 25, 50, 100],
+            help='Cart sizes (distinct products) to measure.'
+        )
+        parser.add_argument('--repeat', type=int, default=20, help='Orders placed per cart size.')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options['lines'], options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, sizes, repeat):
+        category = Category.objects.create(name='Benchmark', slug='benchmark-checkout', is_active=False)
+        products = [
+            Product.objects.create(
+                name=f'Benchmark {i}', slug=f'benchmark-checkout-{i}', category=category,
+                description='', price=Decimal('10.00'), stock=10 ** 6, is_active=False
+            )
+            for i in range(max(sizes))
+        ]
+
+        self.stdout.write(f'{"lines":>6} {"queries":>8} {"ms/order":>9}')
+        for size in sizes:
+            items = [
+                {'product': product, 'quantity': 1, 'price': product.price}
+                for product in products[:size]
+            ]
+            with CaptureQueriesContext(connection) as captured:
+                place_order(Order(customer_name='Benchmark', phone='0', address='-'), items)
+            started = time.perf_counter()
+            for _ in range(repeat):
+                place_order(Order(customer_name='Benchmark', phone='0', address='-'), items)
+            elapsed = (time.perf_counter() - started) / repeat * 1000
+            self.stdout.write(f'{size:>6} {len(captured):>8} {elapsed:>9.2f}')
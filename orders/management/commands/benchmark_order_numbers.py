@@ -0,0 +1,41 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.module_loading import import_string
+from orders.models import Order
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure order insert throughput under each order-number generator. '
+        'Every order is committed in its own transaction, as at checkout, and '
+        'deleted again at the end; run it against a development database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=2000, help='Orders inserted per generator.')
+        parser.add_argument(
+            '--generator', nargs='+',
+            default=['orders.numbering.RandomGenerator', 'orders.numbering.SequenceGenerator'],
+            help='Dotted paths of the generators to compare.'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{"generator":<40} {"orders/s":>9}  {"first":<12} {"last":<12}')
+        for path in options['generator']:
+            generator = import_string(path)()
+            created = []
+            try:
+                started = time.perf_counter()
+                for _ in range(options['orders']):
+                    with transaction.atomic():
+                        order = Order(customer_name='Benchmark', phone='0', address='-', order_number=generator())
+                        order.save()
+                    created.append(order)
+                elapsed = time.perf_counter() - started
+            finally:
+                Order.objects.filter(pk__in=[order.pk for order in created]).delete()
+            rate = len(created) / elapsed if elapsed else 0
+            self.stdout.write(
+                f'{path:<40} {rate:>9.0f}  {created[0].order_number:<12} {created[-1].order_number:<12}'
+            )
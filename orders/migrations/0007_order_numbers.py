@@ -0,0 +1,32 @@
+# Generated by Django 5.2.11 on 2026-10-17 21:05
+
+from django.db import migrations, models
+
+
+def create_order_sequence(apps, schema_editor):
+    OrderSequence = apps.get_model('orders', 'OrderSequence')
+    OrderSequence.objects.get_or_create(name='order')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_order_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_order_sequence, migrations.RunPython.noop),
+        # order_number is unique, which already indexes it
+        migrations.RemoveIndex(
+            model_name='order',
+            name='orders_orde_order_n_f3ada5_idx',
+        ),
+    ]
@@ -1,8 +1,8 @@
 from django.db import models
 from catalog.models import Product
-import uuid
 
 from django.utils.translation import gettext_lazy as _
+from .numbering import next_order_number
 
 class Order(models.Model):
     STATUS_CHOICES = [
@@ -14,6 +14,8 @@ class Order(models.Model):
     ]
     
     order_number = models.CharField(max_length=50, unique=True, editable=False)
+    # Token from the checkout form; a resubmitted form finds its order by it
+    idempotency_key = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
     
     # Customer Info
     customer_name = models.CharField(max_length=255)
@@ -32,7 +34,6 @@ class Order(models.Model):
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['order_number']),
             models.Index(fields=['phone']),
         ]
 
@@ -41,11 +42,22 @@ class Order(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.order_number:
-            # Generate a unique order number (e.g., ORD-UUID-PREFIX)
-            self.order_number = f"ORD-{uuid.uuid4().hex[:8].upper()}"
+            # Next number from the configured generator (see orders.numbering)
+            self.order_number = next_order_number()
         super().save(*args, **kwargs)
 
 
+class OrderSequence(models.Model):
+    """
+    A named counter that order numbers are reserved from in blocks.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    last_value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.last_value}"
+
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)
     product = models.ForeignKey(Product, related_name='order_items', on_delete=models.SET_NULL, null=True)
@@ -62,3 +74,29 @@ class OrderItem(models.Model):
         
         self.line_total = self.unit_price * self.quantity
         super().save(*args, **kwargs)
+
+
+class StockReservation(models.Model):
+    """
+    Stock held for one shopper's checkout until ``expires_at`` (see
+    ``orders.reservations``).
+    """
+    session_key = models.CharField(max_length=40)
+    product = models.ForeignKey(Product, related_name='reservations', on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['session_key', 'product'], name='unique_session_product_reservation'),
+        ]
+        indexes = [
+            # Live holds per product, summed for available stock
+            models.Index(fields=['product', 'expires_at'], name='reservation_product_live_idx'),
+            # Expired holds, for the sweeper
+            models.Index(fields=['expires_at'], name='reservation_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity}x {self.product_id} held for {self.session_key}"
@@ -0,0 +1,113 @@
+"""
+Order number generation.
+
+``Order.save`` asks the generator named by ``ORDER_NUMBER_GENERATOR`` (a
+dotted path, default ``orders.numbering.SequenceGenerator``) for the next
+number. A generator is any callable returning an unused number.
+
+``SequenceGenerator`` counts up from a row in ``OrderSequence``. Each process
+reserves ``ORDER_NUMBER_BLOCK_SIZE`` numbers with one ``UPDATE`` and hands
+them out from memory, so numbers are unique without retries, increase within
+a process and new orders land at the right edge of the ``order_number``
+index instead of at random pages. A block only becomes reusable once the
+transaction that reserved it commits: if it rolls back, the database gives
+the same block to the next process and this one forgets it.
+
+Numbers are ``ORD-`` plus seven Crockford base32 characters (no I, L, O or U,
+easy to read out over the phone), fixed width so they sort like the counter,
+and never clash with the eight-character random numbers of older orders.
+"""
+import threading
+import uuid
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils.module_loading import import_string
+
+
+PREFIX = 'ORD-'
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+WIDTH = 7
+
+DEFAULT_GENERATOR = 'orders.numbering.SequenceGenerator'
+
+
+def encode(value, width=WIDTH):
+    """
+    ``value`` in Crockford base32, zero-padded to ``width`` characters.
+    """
+    digits = []
+    while value:
+        value, digit = divmod(value, len(ALPHABET))
+        digits.append(ALPHABET[digit])
+    return ''.join(reversed(digits)).rjust(width, ALPHABET[0])
+
+
+def reserve_block(name, size):
+    """
+    Advance the ``name`` counter by ``size``; returns the reserved range.
+    """
+    from .models import OrderSequence
+
+    with transaction.atomic(savepoint=False):
+        if not OrderSequence.objects.filter(name=name).update(last_value=F('last_value') + size):
+            OrderSequence.objects.get_or_create(name=name)
+            OrderSequence.objects.filter(name=name).update(last_value=F('last_value') + size)
+        # The update holds the row until commit, so this reads our own value
+        last = OrderSequence.objects.filter(name=name).values_list('last_value', flat=True).get()
+    return range(last - size + 1, last + 1)
+
+
+class SequenceGenerator:
+    """
+    Numbers from blocks of a database counter, one block per process at a time.
+    """
+
+    def __init__(self, name='order', block_size=None):
+        self.name = name
+        self.block_size = block_size or getattr(settings, 'ORDER_NUMBER_BLOCK_SIZE', 20)
+        self.block = iter(())
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            value = next(self.block, None)
+            if value is None:
+                block = iter(reserve_block(self.name, self.block_size))
+                value = next(block)
+                # The rest of the block is ours only if the reservation commits
+                transaction.on_commit(lambda: self.accept(block))
+            return PREFIX + encode(value)
+
+    def accept(self, block):
+        with self.lock:
+            self.block = block
+
+
+class RandomGenerator:
+    """
+    The original scheme: eight random hex characters, left to the unique
+    index to catch the rare collision. Kept for comparison benchmarks.
+    """
+
+    def __call__(self):
+        return f'{PREFIX}{uuid.uuid4().hex[:8].upper()}'
+
+
+_generator = None
+
+
+def get_generator():
+    global _generator
+    if _generator is None:
+        _generator = import_string(getattr(settings, 'ORDER_NUMBER_GENERATOR', DEFAULT_GENERATOR))()
+    return _generator
+
+
+def reset_generator():
+    global _generator
+    _generator = None
+
+
+def next_order_number():
+    return get_generator()()
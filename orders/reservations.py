@@ -0,0 +1,101 @@
+"""
+Time-limited stock holds for shoppers in checkout.
+
+Opening the checkout page holds the cart's quantities for the session for
+``STOCK_RESERVATION_TTL`` seconds, so a shopper who reached the form does not
+lose the items to someone who arrives later. Available stock is ``stock``
+minus the live holds of other sessions; checkout honours it (see
+``orders.services.take_stock``) and consumes the session's own holds.
+
+Every operation costs a fixed number of statements however many lines the
+cart has. ``hold_stock`` starts with a write, so on SQLite it owns the write
+lock before it reads, and on backends with row locks it locks the products
+in id order first; either way concurrent holds on the same products are
+serialised and never grant more than is in stock. Expired holds are ignored
+by every query and deleted by the ``release_expired_reservations`` command.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+from catalog.models import Product
+from .models import StockReservation
+
+
+def reservation_ttl():
+    return timedelta(seconds=getattr(settings, 'STOCK_RESERVATION_TTL', 600))
+
+
+def held_by_others(product_ids, session_key=None, now=None):
+    """
+    Return ``{product_id: quantity}`` held by live reservations of sessions
+    other than ``session_key``.
+    """
+    holds = StockReservation.objects.filter(
+        product_id__in=product_ids, expires_at__gt=now or timezone.now()
+    )
+    if session_key:
+        holds = holds.exclude(session_key=session_key)
+    return dict(holds.order_by().values('product_id').annotate(
+        held=Sum('quantity')
+    ).values_list('product_id', 'held'))
+
+
+def available_stock(product_ids, session_key=None, now=None):
+    """
+    Return ``{product_id: stock left}`` for ``session_key``: stock minus the
+    other sessions' live holds.
+    """
+    held = held_by_others(product_ids, session_key, now)
+    return {
+        pk: max(stock - held.get(pk, 0), 0)
+        for pk, stock in Product.objects.filter(pk__in=product_ids).values_list('pk', 'stock')
+    }
+
+
+def hold_stock(session_key, quantities):
+    """
+    Replace the session's holds with ``{product_id: quantity}``, capped at
+    what is available, for another TTL. Returns ``{product_id: held}``.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        # Write first: the rest of the transaction then runs under the write lock
+        StockReservation.objects.filter(session_key=session_key).delete()
+        if not quantities:
+            return {}
+        if connection.features.has_select_for_update:
+            list(Product.objects.filter(pk__in=quantities).order_by('pk').select_for_update().values_list('pk'))
+
+        available = available_stock(list(quantities), session_key, now)
+        granted = {pk: min(quantity, available.get(pk, 0)) for pk, quantity in quantities.items()}
+        expires_at = now + reservation_ttl()
+        StockReservation.objects.bulk_create([
+            StockReservation(session_key=session_key, product_id=pk, quantity=quantity, expires_at=expires_at)
+            for pk, quantity in granted.items()
+            if quantity > 0
+        ])
+    return granted
+
+
+def release_stock(session_key):
+    """
+    Drop every hold of the session.
+    """
+    return StockReservation.objects.filter(session_key=session_key).delete()[0]
+
+
+def release_expired(batch_size=1000, now=None):
+    """
+    Delete expired holds in batches of ``batch_size``; returns how many.
+    """
+    now = now or timezone.now()
+    released = 0
+    while True:
+        batch = list(StockReservation.objects.filter(
+            expires_at__lte=now
+        ).values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return released
+        released += StockReservation.objects.filter(pk__in=batch).delete()[0]
@@ -0,0 +1,167 @@
+"""
+Order placement.
+
+``place_order`` turns a hydrated cart into an order in one transaction. The
+number of statements stays fixed however many lines the cart has. One
+conditional ``UPDATE`` takes the stock for every line. One ``INSERT`` saves
+the order, one bulk ``INSERT`` saves its items and one more queues the
+follow-up work in ``orders.tasks``.
+
+A few statements come on top of those. Backends that lock rows run one
+``SELECT ... FOR UPDATE`` first. A shopper with stock reservations has them
+removed with one ``DELETE``. A form submission with an idempotency key
+costs one ``SELECT`` to look for an order it already placed. A last
+``SELECT`` checks whether the order sold a product out, which is when the
+cached facet counts must be dropped.
+"""
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from catalog.facets import invalidate_facets
+from catalog.models import Product
+from jobs.queue import enqueue
+from .models import Order, OrderItem, StockReservation
+from .reservations import available_stock
+from .tasks import record_sales
+
+
+class InsufficientStock(Exception):
+    """
+    Raised when a line asks for more than is in stock; nothing is written.
+    ``shortages`` lists ``(product, requested, available)`` per short line.
+    """
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        super().__init__(', '.join(
+            f'{product.name}: {requested} requested, {available} available'
+            for product, requested, available in shortages
+        ))
+
+
+# Backends that support ``UPDATE ... FROM (VALUES ...)`` (SQLite 3.33+)
+UPDATE_FROM_VENDORS = ('sqlite', 'postgresql')
+
+
+def _per_product(quantities):
+    return Case(
+        *[When(pk=pk, then=Value(quantity)) for pk, quantity in quantities.items()],
+        output_field=IntegerField()
+    )
+
+
+def _others_holds(session_key, now):
+    return StockReservation.objects.filter(
+        product=OuterRef('pk'), expires_at__gt=now
+    ).exclude(session_key=session_key or '').order_by().values('product').annotate(
+        held=Sum('quantity')
+    ).values('held')
+
+
+def take_stock(quantities, session_key=None):
+    """
+    Decrement stock for ``{product_id: quantity}`` in one ``UPDATE``. Only
+    rows that still have enough stock are touched, after subtracting the live
+    holds of sessions other than ``session_key``. Returns the number of rows
+    updated; fewer than ``len(quantities)`` means a line was short.
+
+    The ``stock >= quantity`` condition is re-checked by the database against
+    the committed row after any concurrent update, so two buyers of the last
+    unit cannot both get it. Where rows can be locked, they are locked in id
+    order first, so orders sharing products never deadlock each other.
+    """
+    if connection.features.has_select_for_update:
+        list(Product.objects.filter(pk__in=quantities).order_by('pk').select_for_update().values_list('pk'))
+
+    now = timezone.now()
+    if connection.vendor not in UPDATE_FROM_VENDORS:
+        held = Coalesce(Subquery(_others_holds(session_key, now)), 0)
+        return Product.objects.filter(
+            pk__in=quantities, stock__gte=_per_product(quantities) + held
+        ).update(
+            stock=F('stock') - _per_product(quantities),
+        )
+
+    # Joining a VALUES list keeps the statement (and the time spent building
+    # it) flat in the number of lines, unlike one CASE branch per line
+    table = connection.ops.quote_name(Product._meta.db_table)
+    holds = connection.ops.quote_name(StockReservation._meta.db_table)
+    rows = ', '.join(['(%s, %s)'] * len(quantities))
+    params = [value for line in quantities.items() for value in line]
+    params += [connection.ops.adapt_datetimefield_value(now), session_key or '']
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {table} SET stock = {table}.stock - lines.column2 '
+            f'FROM (VALUES {rows}) AS lines '
+            f'WHERE {table}.id = lines.column1 AND {table}.stock - COALESCE(('
+            f'SELECT SUM(held.quantity) FROM {holds} held WHERE held.product_id = {table}.id '
+            f'AND held.expires_at > %s AND held.session_key <> %s'
+            f'), 0) >= lines.column2',
+            params
+        )
+        return cursor.rowcount
+
+
+def _shortages(items, session_key):
+    stock = available_stock([item['product'].pk for item in items], session_key)
+    return [
+        (item['product'], item['quantity'], stock.get(item['product'].pk, 0))
+        for item in items
+        if stock.get(item['product'].pk, 0) < item['quantity']
+    ]
+
+
+def place_order(order, items, session_key=None):
+    """
+    Save the unsaved ``order`` with one ``OrderItem`` per cart item (dicts
+    with ``product``, ``quantity`` and ``price``, as yielded by ``Cart``) and
+    take their stock, all or nothing. Stock held for ``session_key`` is
+    available to it and its holds are consumed. Raises ``InsufficientStock``.
+
+    Returns ``(order, created)``. When ``order.idempotency_key`` belongs to
+    an order already placed, that order is returned with ``created=False``
+    and nothing is written.
+    """
+    if order.idempotency_key:
+        existing = Order.objects.filter(idempotency_key=order.idempotency_key).first()
+        if existing is not None:
+            return existing, False
+
+    quantities = {}
+    for item in items:
+        quantities[item['product'].pk] = quantities.get(item['product'].pk, 0) + item['quantity']
+
+    try:
+        with transaction.atomic():
+            # The order goes in first: a concurrent duplicate stops on the
+            # unique idempotency key before it touches any stock
+            order.save()
+            if take_stock(quantities, session_key) != len(quantities):
+                raise InsufficientStock(_shortages(items, session_key))
+            if session_key:
+                StockReservation.objects.filter(session_key=session_key).delete()
+
+            OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    product=item['product'],
+                    quantity=item['quantity'],
+                    unit_price=item['price'],
+                    line_total=item['price'] * item['quantity'],
+                )
+                for item in items
+            ])
+            # Sales counters are not needed to answer the shopper; a worker updates them
+            enqueue(record_sales, order_id=order.pk)
+            # Only a product selling out changes the in-stock facet counts
+            if Product.objects.filter(pk__in=quantities, stock=0).exists():
+                transaction.on_commit(invalidate_facets)
+    except IntegrityError:
+        if not order.idempotency_key:
+            raise
+        existing = Order.objects.filter(idempotency_key=order.idempotency_key).first()
+        if existing is None:
+            raise
+        return existing, False
+    return order, True
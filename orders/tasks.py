@@ -0,0 +1,32 @@
+"""
+Background work for orders, run by the job queue (see ``jobs.queue``).
+"""
+import logging
+from django.db.models import Sum
+from django.utils import timezone
+from catalog.sales import record_increments
+from .models import Order
+
+
+logger = logging.getLogger(__name__)
+
+
+def record_sales(order_id):
+    """
+    Append the order's quantities as sales increments; ``compact_sales_counts``
+    adds them to ``Product.sales_count``.
+    """
+    order = Order.objects.get(pk=order_id)
+    record_increments(dict(
+        order.items.filter(product__isnull=False).values('product').annotate(
+            quantity=Sum('quantity')
+        ).values_list('product', 'quantity')
+    ), day=timezone.localdate(order.created_at))
+
+
+def order_status_changed(order_id, status):
+    """
+    Hook for what follows a status change (customer notifications and the like).
+    """
+    order = Order.objects.get(pk=order_id)
+    logger.info('Order #%s is now %s', order.order_number, status)
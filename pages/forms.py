@@ -1,3 +1,4 @@
+import uuid
 from django import forms
 from django.utils.translation import gettext_lazy as _
 from orders.models import Order
@@ -49,6 +50,22 @@ class CheckoutForm(forms.ModelForm):
         })
     )
 
+    # One token per rendered form, so a double-submitted form places one order
+    idempotency_key = forms.RegexField(
+        regex=r'^[0-9a-f]{32}$',
+        required=False,
+        widget=forms.HiddenInput
+    )
+
     class Meta:
         model = Order
         fields = ['customer_name', 'phone', 'state', 'city', 'address', 'notes']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not self.is_bound:
+            self.initial.setdefault('idempotency_key', uuid.uuid4().hex)
+
+    def save(self, commit=True):
+        self.instance.idempotency_key = self.cleaned_data.get('idempotency_key') or None
+        return super().save(commit=commit)
@@ -0,0 +1,173 @@
+"""
+Keyset (seek) pagination for product listings.
+
+Instead of ``OFFSET n LIMIT k`` every page is fetched with a ``WHERE`` clause
+that seeks past the last row of the previous page, so deep pages cost the
+same as the first one. Cursors are signed, opaque tokens that carry the sort
+values of the boundary row.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from django.core import signing
+from django.db.models import Q
+
+
+CURSOR_SALT = 'pages.pagination.cursor'
+
+
+def _encode_value(value):
+    """Make a sort value JSON serializable."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class KeysetPage:
+    """
+    One page of a keyset-paginated queryset.
+
+    Mirrors the parts of ``django.core.paginator.Page`` the templates use.
+    """
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset by seeking on its sort key.
+
+    Args:
+        queryset: The filtered queryset to paginate
+        ordering: Field names in ``order_by`` syntax; the last one must be
+            unique (normally ``id``/``-id``) so the order is total
+        per_page: Number of objects per page
+        count_limit: Stop counting after this many rows (``None`` disables
+            the count entirely), keeping the total cheap on huge listings
+    """
+
+    def __init__(self, queryset, ordering, per_page, count_limit=1000):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.count_limit = count_limit
+        self.fields = [
+            (name.lstrip('-'), name.startswith('-')) for name in self.ordering
+        ]
+        self._count = None
+
+    def _capped_count(self):
+        if self._count is None:
+            self._count = self.queryset.order_by().values('pk')[:self.count_limit + 1].count()
+        return self._count
+
+    @property
+    def count(self):
+        """
+        Number of matching rows, capped at ``count_limit``.
+        """
+        if self.count_limit is None:
+            return None
+        return min(self._capped_count(), self.count_limit)
+
+    @property
+    def count_is_exact(self):
+        """
+        False when the count stopped at ``count_limit``.
+        """
+        return self.count_limit is not None and self._capped_count() <= self.count_limit
+
+    def encode_cursor(self, obj, direction):
+        """
+        Build an opaque cursor pointing just past ``obj``.
+        """
+        values = [_encode_value(getattr(obj, name)) for name, _ in self.fields]
+        return signing.dumps(
+            {'o': self.ordering, 'd': direction, 'v': values},
+            salt=CURSOR_SALT, compress=True
+        )
+
+    def decode_cursor(self, cursor):
+        """
+        Return ``(direction, values)`` or ``None`` for a missing, tampered or
+        stale cursor (e.g. one created for another sort order).
+        """
+        if not cursor:
+            return None
+        try:
+            data = signing.loads(cursor, salt=CURSOR_SALT)
+        except signing.BadSignature:
+            return None
+        if not isinstance(data, dict) or tuple(data.get('o', ())) != self.ordering:
+            return None
+        values = data.get('v')
+        if data.get('d') not in ('next', 'prev') or not isinstance(values, list) or len(values) != len(self.fields):
+            return None
+        return data['d'], values
+
+    def _seek_filter(self, values, reverse):
+        """
+        Build ``(a, b) > (va, vb)`` (or ``<``) as a chain of OR'ed conditions.
+        """
+        condition = Q()
+        for i, (name, descending) in enumerate(self.fields):
+            lookup = 'lt' if descending != reverse else 'gt'
+            term = Q(**{f'{name}__{lookup}': values[i]})
+            for j in range(i):
+                term &= Q(**{self.fields[j][0]: values[j]})
+            condition |= term
+        return condition
+
+    def page(self, cursor=None):
+        """
+        Return the page after (or before) ``cursor``, or the first page.
+        """
+        decoded = self.decode_cursor(cursor)
+        direction, values = decoded if decoded else ('next', None)
+        reverse = direction == 'prev'
+
+        queryset = self.queryset
+        if values is not None:
+            queryset = queryset.filter(self._seek_filter(values, reverse))
+        if reverse:
+            ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering]
+        else:
+            ordering = list(self.ordering)
+
+        rows = list(queryset.order_by(*ordering)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+
+        if reverse:
+            has_next, has_previous = values is not None, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+
+        next_cursor = self.encode_cursor(rows[-1], 'next') if rows and has_next else None
+        previous_cursor = self.encode_cursor(rows[0], 'prev') if rows and has_previous else None
+        return KeysetPage(rows, self, next_cursor=next_cursor, previous_cursor=previous_cursor)
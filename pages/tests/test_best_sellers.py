@@ -0,0 +1,111 @@
+"""
+Tests for daily sales rollups and windowed best sellers.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from catalog.models import Category, DailySales, Product
+from catalog.sales import best_sellers, compact_sales, ranked_sales, record_increments
+from orders.models import Order, OrderItem
+
+
+class BestSellerTests(TestCase):
+    """Best sellers are ranked by the units sold in a recent window."""
+
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.lamps = Category.objects.create(name='Lamps', slug='lamps', is_active=True)
+        self.chairs = Category.objects.create(name='Chairs', slug='chairs', is_active=True)
+        self.old_hit = self.create_product('old-hit', self.lamps, sales_count=1000)
+        self.lamp = self.create_product('lamp', self.lamps)
+        self.chair = self.create_product('chair', self.chairs)
+
+    def create_product(self, slug, category, sales_count=0, is_active=True):
+        return Product.objects.create(
+            name=slug.title(), slug=slug, category=category, description='Best', price=Decimal('10.00'),
+            stock=100, sales_count=sales_count, is_active=is_active
+        )
+
+    def sell(self, product, quantity, days_ago):
+        record_increments({product.pk: quantity}, day=self.today - timedelta(days=days_ago))
+
+    def test_compaction_builds_daily_rollups(self):
+        self.sell(self.lamp, 2, 0)
+        self.sell(self.lamp, 3, 0)
+        self.sell(self.lamp, 1, 1)
+        compact_sales()
+        self.sell(self.lamp, 4, 0)
+        compact_sales()
+        self.assertEqual(
+            sorted(DailySales.objects.values_list('day', 'product_id', 'category_id', 'quantity')),
+            [(self.today - timedelta(days=1), self.lamp.pk, self.lamps.pk, 1),
+             (self.today, self.lamp.pk, self.lamps.pk, 9)]
+        )
+        self.lamp.refresh_from_db()
+        self.assertEqual(self.lamp.sales_count, 10)
+
+    def test_windows_and_categories(self):
+        self.sell(self.old_hit, 50, 20)
+        self.sell(self.lamp, 5, 2)
+        self.sell(self.chair, 3, 6)
+        self.sell(self.chair, 4, 0)
+        compact_sales()
+        self.assertEqual(ranked_sales(7), [(self.chair.pk, 7), (self.lamp.pk, 5)])
+        self.assertEqual(ranked_sales(30), [(self.old_hit.pk, 50), (self.chair.pk, 7), (self.lamp.pk, 5)])
+        self.assertEqual(ranked_sales(30, category_id=self.lamps.pk), [(self.old_hit.pk, 50), (self.lamp.pk, 5)])
+        self.assertEqual(ranked_sales(1), [(self.chair.pk, 4)])
+
+    def test_inactive_products_are_not_ranked(self):
+        hidden = self.create_product('hidden', self.lamps, is_active=False)
+        self.sell(hidden, 9, 0)
+        compact_sales()
+        self.assertEqual(ranked_sales(7), [])
+
+    def test_short_ranking_is_filled_by_all_time_sales(self):
+        self.sell(self.chair, 2, 0)
+        compact_sales()
+        products = Product.objects.filter(is_active=True)
+        ranked = best_sellers(products, 7)
+        self.assertEqual([(p.pk, p.recent_sales) for p in ranked], [(self.chair.pk, 2), (self.old_hit.pk, 0)])
+        self.assertEqual(best_sellers(products, 7, fill=False), [self.chair])
+
+    def test_home_page_ranks_recent_sales_first(self):
+        self.sell(self.lamp, 5, 0)
+        compact_sales()
+        response = self.client.get(reverse('home'))
+        self.assertEqual([p.pk for p in response.context['best_sellers']], [self.lamp.pk, self.old_hit.pk])
+
+    def test_dashboard_window(self):
+        staff = get_user_model().objects.create_user(
+            username='staff', email='staff@example.com', password='password', is_staff=True
+        )
+        self.client.force_login(staff)
+        self.sell(self.lamp, 5, 10)
+        self.sell(self.chair, 1, 0)
+        compact_sales()
+        response = self.client.get(reverse('admin_dashboard'))
+        self.assertEqual([p.pk for p in response.context['best_sellers']], [self.lamp.pk, self.chair.pk])
+        response = self.client.get(reverse('admin_dashboard'), {'best_sellers': '7'})
+        self.assertEqual([p.pk for p in response.context['best_sellers']], [self.chair.pk])
+        self.assertContains(response, '1 sold')
+
+    def test_rebuild_from_order_items(self):
+        order = Order.objects.create(customer_name='A', phone='1', address='-')
+        OrderItem.objects.create(order=order, product=self.lamp, quantity=2, unit_price=Decimal('10.00'))
+        OrderItem.objects.create(order=order, product=self.chair, quantity=1, unit_price=Decimal('10.00'))
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=3))
+        DailySales.objects.create(day=self.today - timedelta(days=3), product=self.lamp, quantity=99)
+
+        out = StringIO()
+        since = (self.today - timedelta(days=5)).isoformat()
+        call_command('rebuild_daily_sales', '--since', since, stdout=out)
+        self.assertIn('2 daily sales row(s) written', out.getvalue())
+        self.assertEqual(
+            sorted(DailySales.objects.values_list('product_id', 'quantity')),
+            sorted([(self.lamp.pk, 2), (self.chair.pk, 1)])
+        )
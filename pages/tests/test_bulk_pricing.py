@@ -0,0 +1,129 @@
+"""
+Tests for bulk discount operations.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from catalog.models import Category, Product, Offer
+from catalog.offers import invalidate_offers
+from catalog.pricing import apply_discount, remove_discount
+
+
+class BulkDiscountTests(TestCase):
+    """Bulk discounts match Product.save() and run as one UPDATE."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.client = Client()
+        self.addCleanup(invalidate_offers)
+        self.category = Category.objects.create(name='Chairs', slug='chairs', is_active=True)
+        self.other_category = Category.objects.create(name='Desks', slug='desks', is_active=True)
+        self.chair = self.create_product('chair', Decimal('99.99'))
+        self.stool = self.create_product('stool', Decimal('40.00'), compare_at_price=Decimal('50.00'))
+        self.desk = self.create_product('desk', Decimal('300.00'), category=self.other_category)
+
+    def create_product(self, slug, price, category=None, **fields):
+        return Product.objects.create(
+            name=slug.title(),
+            slug=slug,
+            category=category or self.category,
+            description='Bulk pricing test product.',
+            price=price,
+            stock=5,
+            is_active=True,
+            **fields
+        )
+
+    def prices(self, slug):
+        return Product.objects.filter(slug=slug).values_list(
+            'price', 'compare_at_price', 'effective_price', 'discount_percentage'
+        ).get()
+
+    def test_apply_matches_save(self):
+        """The bulk update produces the prices a per-product save would."""
+        saved = self.create_product('saved-chair', Decimal('99.99'), discount_percentage=15)
+        apply_discount(Product.objects.filter(category=self.category).exclude(pk=saved.pk), 15)
+        self.assertEqual(self.prices('chair'), self.prices('saved-chair'))
+        self.assertEqual(self.prices('chair'), (Decimal('84.99'), Decimal('99.99'), Decimal('84.99'), 15))
+        self.assertEqual(self.prices('stool'), (Decimal('42.50'), Decimal('50.00'), Decimal('42.50'), 15))
+        self.assertEqual(self.prices('desk'), (Decimal('300.00'), None, Decimal('300.00'), 0))
+
+    def test_apply_and_save_round_halves_alike(self):
+        """Prices landing on half a cent round up on both paths."""
+        originals = ['10.25', '0.05', '33.33', '2.01', '1.01', '12345.67']
+        for percentage, expected in [
+            (50, ['5.13', '0.03', '16.67', '1.01', '0.51', '6172.84']),
+            (15, ['8.71', '0.04', '28.33', '1.71', '0.86', '10493.82']),
+        ]:
+            with self.subTest(percentage=percentage):
+                Product.objects.all().delete()
+                for i, original in enumerate(originals):
+                    self.create_product(f'bulk-{i}', Decimal(original))
+                    self.create_product(f'saved-{i}', Decimal(original), discount_percentage=percentage)
+                apply_discount(Product.objects.filter(slug__startswith='bulk-'), percentage)
+                for i, price in enumerate(expected):
+                    self.assertEqual(self.prices(f'bulk-{i}'), self.prices(f'saved-{i}'))
+                    self.assertEqual(self.prices(f'bulk-{i}')[0], Decimal(price))
+
+    def test_apply_is_a_single_update(self):
+        """Without offers the whole category is repriced by one statement."""
+        for i in range(20):
+            self.create_product(f'chair-{i}', Decimal('10.00'))
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(apply_discount(Product.objects.filter(category=self.category), 50), 22)
+        updates = [q['sql'] for q in captured.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(Product.objects.filter(category=self.category, price=Decimal('5.00')).count(), 20)
+
+    def test_remove_restores_original_prices(self):
+        """Removing the discount restores compare_at_price and leaves undiscounted products alone."""
+        apply_discount(Product.objects.filter(slug='chair'), 20)
+        self.assertEqual(remove_discount(Product.objects.all()), 1)
+        self.assertEqual(self.prices('chair'), (Decimal('99.99'), Decimal('99.99'), Decimal('99.99'), 0))
+        self.assertEqual(self.prices('stool'), (Decimal('40.00'), Decimal('50.00'), Decimal('40.00'), 0))
+
+    def test_offers_still_apply_after_a_bulk_change(self):
+        """Products under an offer keep the offer on top of their new price."""
+        now = timezone.now()
+        Offer.objects.create(
+            title='Desk Week', offer_type='fixed', value=Decimal('100'),
+            start_date=now - timedelta(days=1), end_date=now + timedelta(days=1),
+            category=self.other_category
+        )
+        apply_discount(Product.objects.all(), 10)
+        self.assertEqual(self.prices('desk'), (Decimal('270.00'), Decimal('300.00'), Decimal('170.00'), 10))
+        remove_discount(Product.objects.all())
+        self.assertEqual(self.prices('desk')[2], Decimal('200.00'))
+
+    def test_invalid_percentage(self):
+        for percentage in [0, 101, -5]:
+            with self.subTest(percentage=percentage):
+                with self.assertRaises(ValueError):
+                    apply_discount(Product.objects.all(), percentage)
+
+    def test_command(self):
+        """The command targets categories by slug or the whole store."""
+        out = StringIO()
+        call_command('bulk_discount', '--percent', '50', '--category', 'desks', stdout=out)
+        self.assertIn('50% discount applied to 1 product(s).', out.getvalue())
+        self.assertEqual(self.prices('desk')[0], Decimal('150.00'))
+        call_command('bulk_discount', '--remove', '--all', stdout=out)
+        self.assertEqual(self.prices('desk')[0], Decimal('300.00'))
+
+    def test_admin_action(self):
+        """The product changelist offers one-click discounts."""
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'pass'))
+        response = self.client.post(reverse('admin:catalog_product_changelist'), {
+            'action': 'apply_25_percent_discount',
+            '_selected_action': [self.chair.pk, self.desk.pk],
+        }, follow=True)
+        self.assertContains(response, '25% discount applied to 2 product(s).')
+        self.assertEqual(self.prices('desk')[0], Decimal('225.00'))
+        self.assertEqual(self.prices('stool')[3], 0)
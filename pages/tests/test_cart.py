@@ -2,10 +2,17 @@
 Tests for cart functionality.
 """
 from decimal import Decimal
-from django.test import TestCase, Client
+from io import StringIO
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core import signing
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from catalog.models import Category, Product
 from cart.cart import Cart
+from cart.checks import check_cart_cache
 
 
 class CartClassTests(TestCase):
@@ -115,6 +122,16 @@ class CartClassTests(TestCase):
         self.assertContains(response, 'FREE')
 
 
+@override_settings(CART_STORE='cart.stores.CookieCartStore')
+class CookieCartClassTests(CartClassTests):
+    pass
+
+
+@override_settings(CART_STORE='cart.stores.CacheCartStore')
+class CacheCartClassTests(CartClassTests):
+    pass
+
+
 class CheckoutViewTests(TestCase):
     """Tests for the checkout page."""
     
@@ -151,3 +168,165 @@ class CheckoutViewTests(TestCase):
         response = self.client.get(reverse('checkout'))
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, 'Checkout Product')
+
+
+@override_settings(CART_STORE='cart.stores.CookieCartStore')
+class CookieCheckoutViewTests(CheckoutViewTests):
+    pass
+
+
+@override_settings(CART_STORE='cart.stores.CacheCartStore')
+class CacheCheckoutViewTests(CheckoutViewTests):
+    pass
+
+
+class CartSessionTests(TestCase):
+    """The cart only touches the session once it holds something."""
+
+    def setUp(self):
+        category = Category.objects.create(name='Session', slug='session', is_active=True)
+        self.product = Product.objects.create(
+            name='Session Product', slug='session-product', category=category,
+            price=Decimal('10.00'), stock=3, is_active=True
+        )
+
+    def test_cartless_views_create_no_session(self):
+        for url in [reverse('home'), reverse('cart'), reverse('checkout')]:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertFalse(Session.objects.exists())
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, self.client.cookies)
+
+    def test_compact_storage(self):
+        self.client.post(reverse('cart_add', args=[self.product.id]), {'quantity': 2})
+        self.client.post(reverse('cart_add', args=[self.product.id]), {'quantity': 5})
+        self.assertEqual(self.client.session['cart'], {
+            'v': 2, 'items': {str(self.product.id): 3}, 'prices': {str(self.product.id): '10.00'}
+        })
+        self.client.post(reverse('cart_remove', args=[self.product.id]))
+        self.assertNotIn('cart', self.client.session)
+
+    def test_carts_saved_before_version_2_are_read(self):
+        session = self.client.session
+        session['cart'] = {str(self.product.id): {'quantity': 2, 'price': '9.50'}}
+        session.save()
+        response = self.client.get(reverse('cart'))
+        self.assertEqual(response.context['subtotal'], Decimal('19.00'))
+        self.assertEqual([item['quantity'] for item in response.context['cart_items']], [2])
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_cart_sessions', '--views', '4', stdout=out)
+        self.assertIn('session writes/1k  0', out.getvalue())
+
+
+class CartStoreTests(TestCase):
+    """The cookie and cache stores keep the cart without the session."""
+
+    def setUp(self):
+        category = Category.objects.create(name='Stores', slug='stores', is_active=True)
+        self.product = Product.objects.create(
+            name='Store Product', slug='store-product', category=category,
+            price=Decimal('10.00'), stock=5, is_active=True
+        )
+
+    def add(self, quantity=2):
+        return self.client.post(reverse('cart_add', args=[self.product.id]), {'quantity': quantity})
+
+    def subtotal(self):
+        return self.client.get(reverse('cart')).context['subtotal']
+
+    @override_settings(CART_STORE='cart.stores.CookieCartStore')
+    def test_cookie_store_needs_no_server_state(self):
+        self.add()
+        self.assertFalse(Session.objects.exists())
+        self.assertEqual(self.subtotal(), Decimal('20.00'))
+        self.client.post(reverse('cart_remove', args=[self.product.id]))
+        self.assertEqual(self.client.cookies['cart'].value, '')
+
+    @override_settings(CART_STORE='cart.stores.CookieCartStore')
+    def test_tampered_cookie_is_an_empty_cart(self):
+        self.add()
+        value = self.client.cookies['cart'].value
+        self.client.cookies['cart'] = value[:-2] + ('AA' if not value.endswith('AA') else 'BB')
+        self.assertEqual(self.subtotal(), 0)
+
+    @override_settings(CART_STORE='cart.stores.CacheCartStore')
+    def test_cache_store_keeps_the_cart_under_a_cookie_id(self):
+        self.add()
+        self.assertFalse(Session.objects.exists())
+        key = signing.loads(self.client.cookies['cart'].value, salt='cart.stores.CacheCartStore')
+        self.assertEqual(cache.get(f'cart:{key}')['items'], {str(self.product.id): 2})
+        self.add(1)
+        self.assertEqual(self.subtotal(), Decimal('30.00'))
+
+    @override_settings(CART_STORE='cart.stores.CacheCartStore')
+    def test_checkout_empties_the_cache_cart(self):
+        self.add()
+        key = signing.loads(self.client.cookies['cart'].value, salt='cart.stores.CacheCartStore')
+        response = self.client.post(reverse('checkout'), {
+            'customer_name': 'A', 'phone': '01000000000', 'state': 'Cairo', 'city': 'Nasr City', 'address': '-',
+        })
+        self.assertRedirects(response, reverse('order_success'))
+        self.assertIsNone(cache.get(f'cart:{key}'))
+        self.assertEqual(Product.objects.get(pk=self.product.pk).stock, 3)
+
+
+    def test_cache_store_needs_a_shared_cache(self):
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'carts'}}
+        local = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        for store, caches, debug, errors in [
+            ('cart.stores.CacheCartStore', local, False, ['cart.E001']),
+            ('cart.stores.CacheCartStore', local, True, []),
+            ('cart.stores.CacheCartStore', shared, False, []),
+            ('cart.stores.SessionCartStore', local, False, []),
+        ]:
+            with self.subTest(store=store, debug=debug), \
+                    self.settings(CART_STORE=store, CACHES=caches, DEBUG=debug):
+                self.assertEqual([error.id for error in check_cart_cache(None)], errors)
+
+
+class CartHydrationTests(TestCase):
+    """A cart fetches its products once and keeps its totals until it changes."""
+
+    def setUp(self):
+        category = Category.objects.create(name='Hydration', slug='hydration', is_active=True)
+        self.products = [
+            Product.objects.create(
+                name=f'Hydration {i}', slug=f'hydration-{i}', category=category,
+                price=Decimal('10.00'), stock=5, is_active=True
+            )
+            for i in range(5)
+        ]
+
+    def add(self, product, quantity=1):
+        self.client.post(reverse('cart_add', args=[product.id]), {'quantity': quantity})
+
+    def test_cart_page_queries_do_not_grow_with_lines(self):
+        self.add(self.products[0])
+        # The session, the products with their categories and their first images
+        with self.assertNumQueries(3):
+            self.client.get(reverse('cart'))
+        for product in self.products[1:]:
+            self.add(product)
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('cart'))
+        self.assertEqual(len(response.context['cart_items']), 5)
+
+    def test_lines_and_totals_are_kept_until_the_cart_changes(self):
+        self.add(self.products[0], 2)
+        request = self.client.get(reverse('cart')).wsgi_request
+        cart = Cart(request)
+        with self.assertNumQueries(2):
+            lines = list(cart)
+            self.assertIs(list(cart)[0], lines[0])
+            self.assertEqual(cart.get_total(), Decimal('25.99'))
+        cart.add(self.products[1], 3)
+        with self.assertNumQueries(2):
+            self.assertEqual([item['quantity'] for item in cart], [2, 3])
+        self.assertEqual(cart.get_total(), Decimal('50.00'))
+        self.assertEqual(request.session['cart'], {
+            'v': 2,
+            'items': {str(self.products[0].id): 2, str(self.products[1].id): 3},
+            'prices': {str(self.products[0].id): '10.00', str(self.products[1].id): '10.00'},
+        })
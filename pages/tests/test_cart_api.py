@@ -0,0 +1,89 @@
+"""
+Tests for the JSON batch cart API.
+"""
+import json
+from decimal import Decimal
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from catalog.models import Category, Product
+
+
+class CartApiTests(TestCase):
+    """A batch of cart operations costs one product query and one cart save."""
+
+    def setUp(self):
+        category = Category.objects.create(name='Api', slug='api', is_active=True)
+        self.products = [
+            Product.objects.create(
+                name=f'Api Product {i}', slug=f'api-product-{i}', category=category,
+                price=Decimal('10.00'), stock=5, is_active=True
+            )
+            for i in range(6)
+        ]
+
+    def post(self, *operations):
+        return self.client.post(
+            reverse('cart_api'), json.dumps({'operations': list(operations)}), content_type='application/json'
+        )
+
+    def add(self, product, quantity=1):
+        return {'op': 'add', 'product': product.id, 'quantity': quantity}
+
+    def test_batch_updates_the_cart(self):
+        self.post(self.add(self.products[0]), self.add(self.products[1]), self.add(self.products[2]))
+        response = self.post(
+            self.add(self.products[0], 9),
+            {'op': 'set', 'product': self.products[1].id, 'quantity': 2},
+            {'op': 'remove', 'product': self.products[2].id},
+            self.add(self.products[3], 3),
+        )
+        data = response.json()
+        self.assertEqual(
+            [(line['product'], line['quantity'], line['total_price']) for line in data['lines']],
+            [(self.products[0].id, 5, '50.00'), (self.products[1].id, 2, '20.00'), (self.products[3].id, 3, '30.00')]
+        )
+        self.assertEqual(data['lines'][0]['url'], reverse('product_detail', args=['api-product-0']))
+        self.assertEqual((data['subtotal'], data['shipping'], data['total']), ('100.00', '0.00', '100.00'))
+        self.assertEqual((data['count'], data['rejected']), (10, []))
+        self.assertEqual(self.client.get(reverse('cart')).context['subtotal'], Decimal('100.00'))
+
+    def test_queries_do_not_grow_with_the_batch(self):
+        self.post(self.add(self.products[0]))
+        for count in [1, 6]:
+            with self.subTest(operations=count):
+                with CaptureQueriesContext(connection) as captured:
+                    self.post(*[self.add(product) for product in self.products[:count]])
+                product_queries = [q for q in captured if 'FROM "catalog_product"' in q['sql']]
+                session_writes = [q for q in captured if q['sql'].startswith('UPDATE "django_session"')]
+                self.assertEqual((len(product_queries), len(session_writes)), (1, 1))
+
+    def test_unavailable_products_are_rejected(self):
+        self.post(self.add(self.products[0]))
+        Product.objects.filter(pk=self.products[0].pk).update(stock=0)
+        Product.objects.filter(pk=self.products[1].pk).update(is_active=False)
+        data = self.post(
+            self.add(self.products[1]),
+            {'op': 'set', 'product': self.products[0].id, 'quantity': 1},
+            self.add(self.products[2]),
+            {'op': 'add', 'product': 999999},
+        ).json()
+        self.assertEqual(data['rejected'], [self.products[1].id, self.products[0].id, 999999])
+        self.assertEqual([line['product'] for line in data['lines']], [self.products[2].id])
+
+    def test_malformed_requests(self):
+        for body in ['not json', '[]', '{"operations": [{"op": "buy", "product": 1}]}',
+                     '{"operations": [{"op": "add", "product": "1"}]}',
+                     '{"operations": [{"op": "add", "product": 1, "quantity": 0}]}']:
+            with self.subTest(body=body):
+                response = self.client.post(reverse('cart_api'), body, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(reverse('cart_api')).status_code, 405)
+
+    @override_settings(CART_STORE='cart.stores.CookieCartStore')
+    def test_cookie_store(self):
+        response = self.post(self.add(self.products[0], 2))
+        self.assertIn('cart', response.cookies)
+        data = self.post({'op': 'remove', 'product': self.products[0].id}).json()
+        self.assertEqual((data['lines'], data['count']), ([], 0))
@@ -0,0 +1,89 @@
+"""
+Tests for the header cart badge summary.
+"""
+import json
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from cart.context_processors import cart_summary
+from catalog.models import Category, Product
+
+
+class CartSummaryTests(TestCase):
+    """The badge reads a summary cookie written whenever the cart changes."""
+
+    def setUp(self):
+        category = Category.objects.create(name='Badge', slug='badge', is_active=True)
+        self.product = Product.objects.create(
+            name='Badge Product', slug='badge-product', category=category,
+            price=Decimal('12.50'), stock=5, is_active=True
+        )
+
+    def add(self, quantity):
+        return self.client.post(reverse('cart_add', args=[self.product.id]), {'quantity': quantity})
+
+    def summary(self):
+        request = RequestFactory().get('/')
+        request.COOKIES = {name: morsel.value for name, morsel in self.client.cookies.items()}
+        with self.assertNumQueries(0):
+            return cart_summary(request)['cart_summary']
+
+    def test_summary_follows_the_cart_without_queries(self):
+        self.assertEqual(self.summary(), {'count': 0, 'subtotal': Decimal('0.00')})
+        self.add(2)
+        self.assertEqual(self.summary(), {'count': 2, 'subtotal': Decimal('25.00')})
+        self.client.post(reverse('cart_api'), json.dumps({'operations': [
+            {'op': 'add', 'product': self.product.id, 'quantity': 1}
+        ]}), content_type='application/json')
+        self.assertEqual(self.summary(), {'count': 3, 'subtotal': Decimal('37.50')})
+        self.client.post(reverse('cart_remove', args=[self.product.id]))
+        self.assertEqual(self.client.cookies['cart_summary'].value, '')
+        self.assertEqual(self.summary()['count'], 0)
+
+    def test_tampered_summary_is_ignored(self):
+        self.add(2)
+        self.client.cookies['cart_summary'] = '99:1.00:forged'
+        self.assertEqual(self.summary()['count'], 0)
+
+    def test_badge_renders_the_count(self):
+        self.add(2)
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.context['cart_summary']['count'], 2)
+        self.assertContains(response, 'title="EGP 25.00"')
+
+    @override_settings(CART_STORE='cart.stores.CacheCartStore')
+    def test_summary_with_another_store(self):
+        self.add(1)
+        self.assertEqual(self.summary(), {'count': 1, 'subtotal': Decimal('12.50')})
+
+    @override_settings(CART_SUMMARY_LAZY=True)
+    def test_lazy_badge_fetches_the_summary(self):
+        self.add(2)
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, f'data-cart-summary-url="{reverse("cart_summary")}"')
+        self.assertNotContains(response, 'title="EGP 25.00"')
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('cart_summary'))
+        self.assertEqual(response.json(), {'count': 2, 'subtotal': '25.00'})
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_logout_clears_the_badge(self):
+        user = get_user_model().objects.create_user(username='shopper', password='password')
+        self.client.force_login(user)
+        self.add(2)
+        self.client.post(reverse('logout'))
+        self.assertEqual(self.client.cookies['cart_summary'].value, '')
+        response = self.client.get(reverse('cart'))
+        self.assertEqual(response.context['cart_items'], [])
+        self.assertEqual(response.context['cart_summary']['count'], 0)
+        self.assertEqual(self.summary()['count'], 0)
+
+    def test_lost_cart_resets_the_summary(self):
+        self.add(2)
+        # The session expires or is evicted: the cookie still says 2
+        Session.objects.all().delete()
+        response = self.client.get(reverse('cart'))
+        self.assertEqual(response.context['cart_summary'], {'count': 0, 'subtotal': Decimal('0.00')})
+        self.assertEqual(self.client.cookies['cart_summary'].value, '')
@@ -0,0 +1,232 @@
+"""
+Tests for order placement at checkout.
+"""
+import threading
+import time
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, Client
+from django.urls import reverse
+from catalog.models import Category, Product
+from catalog.sales import compact_sales
+from jobs.models import Job
+from jobs.worker import Worker
+from orders.models import Order, OrderItem
+from orders.numbering import next_order_number, reset_generator
+from orders.services import InsufficientStock, place_order
+
+
+CHECKOUT_DATA = {
+    'customer_name': 'Test Customer',
+    'phone': '01000000000',
+    'state': 'Cairo',
+    'city': 'Nasr City',
+    'address': '1 Test Street',
+}
+
+
+class PlaceOrderTests(TestCase):
+    """Orders are placed all or nothing with a fixed number of queries."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.client = Client()
+        self.category = Category.objects.create(
+            name='Checkout Category',
+            slug='checkout-category',
+            is_active=True
+        )
+        self.products = [self.create_product(i) for i in range(20)]
+
+    def create_product(self, i, stock=5):
+        return Product.objects.create(
+            name=f'Checkout Product {i}',
+            slug=f'checkout-product-{i}',
+            category=self.category,
+            description='Checkout',
+            price=Decimal('12.50'),
+            stock=stock,
+            is_active=True
+        )
+
+    def add_to_cart(self, product, quantity):
+        self.client.post(reverse('cart_add', args=[product.id]), {'quantity': quantity})
+
+    def items(self, count, quantity=1):
+        return [
+            {'product': product, 'quantity': quantity, 'price': product.price}
+            for product in self.products[:count]
+        ]
+
+    def test_checkout_places_the_order(self):
+        """Checking out creates the order and items, takes the stock and empties the cart."""
+        self.add_to_cart(self.products[0], 2)
+        self.add_to_cart(self.products[1], 1)
+        response = self.client.post(reverse('checkout'), CHECKOUT_DATA)
+        self.assertRedirects(response, reverse('order_success'))
+
+        order = Order.objects.get()
+        self.assertEqual(order.totals, Decimal('43.49'))
+        self.assertEqual(
+            sorted(order.items.values_list('product_id', 'quantity', 'line_total')),
+            [(self.products[0].pk, 2, Decimal('25.00')), (self.products[1].pk, 1, Decimal('12.50'))]
+        )
+        bought = Product.objects.filter(pk__in=[self.products[0].pk, self.products[1].pk]).order_by('pk')
+        self.assertEqual(list(bought.values_list('stock', 'sales_count')), [(3, 0), (4, 0)])
+        self.assertNotIn('cart', self.client.session)
+
+        # Sales counters follow once a worker records the sales and they are compacted
+        Worker().run(burst=True)
+        self.assertEqual(Job.objects.get(task='orders.tasks.record_sales').status, Job.DONE)
+        compact_sales()
+        self.assertEqual(list(bought.values_list('stock', 'sales_count')), [(3, 2), (4, 1)])
+
+    def test_query_count_does_not_grow_with_cart_lines(self):
+        """One conditional update, order insert, bulk insert, job insert and sold-out check for any cart size."""
+        # Reserve a block of order numbers first, as a running process has
+        reset_generator()
+        self.addCleanup(reset_generator)
+        with self.captureOnCommitCallbacks(execute=True):
+            next_order_number()
+        with self.assertNumQueries(7) as captured:
+            place_order(Order(**CHECKOUT_DATA), self.items(1))
+        for count in [5, 20]:
+            with self.subTest(lines=count):
+                with self.assertNumQueries(len(captured)):
+                    place_order(Order(**CHECKOUT_DATA), self.items(count))
+
+    def test_short_line_rejects_the_whole_order(self):
+        """If one line is short, no order is created and no stock is taken."""
+        items = self.items(3)
+        items[2]['quantity'] = 6
+        with self.assertRaises(InsufficientStock) as raised:
+            place_order(Order(**CHECKOUT_DATA), items)
+        self.assertEqual(raised.exception.shortages, [(self.products[2], 6, 5)])
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertEqual(set(Product.objects.values_list('stock', flat=True)), {5})
+
+    def test_checkout_reports_a_short_cart(self):
+        """Stock sold elsewhere after the cart was filled is reported per line and the cart trimmed to match."""
+        self.add_to_cart(self.products[0], 3)
+        self.add_to_cart(self.products[1], 2)
+        Product.objects.filter(pk=self.products[0].pk).update(stock=1)
+        Product.objects.filter(pk=self.products[1].pk).update(stock=0)
+        response = self.client.post(reverse('checkout'), CHECKOUT_DATA)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['form'].non_field_errors(), [
+            'Only 1 left of Checkout Product 0.', 'Checkout Product 1 is out of stock.'
+        ])
+        self.assertFalse(Order.objects.exists())
+        cart = self.client.session['cart']['items']
+        self.assertEqual(cart[str(self.products[0].pk)], 1)
+        self.assertNotIn(str(self.products[1].pk), cart)
+
+        response = self.client.post(reverse('checkout'), CHECKOUT_DATA)
+        self.assertRedirects(response, reverse('order_success'))
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).stock, 0)
+
+    def test_same_key_places_one_order(self):
+        """place_order with a key already used returns the first order and writes nothing."""
+        key = 'a' * 32
+        first, created = place_order(Order(idempotency_key=key, **CHECKOUT_DATA), self.items(2))
+        self.assertTrue(created)
+        with self.assertNumQueries(1):
+            again, created = place_order(Order(idempotency_key=key, **CHECKOUT_DATA), self.items(2))
+        self.assertFalse(created)
+        self.assertEqual(again.pk, first.pk)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(OrderItem.objects.count(), 2)
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).stock, 4)
+
+    def test_resubmitted_checkout_form_places_one_order(self):
+        """Posting the same checkout form twice takes the stock once and lands on the same order."""
+        self.add_to_cart(self.products[0], 2)
+        key = self.client.get(reverse('checkout')).context['form']['idempotency_key'].value()
+        self.assertRegex(key, r'^[0-9a-f]{32}$')
+        data = dict(CHECKOUT_DATA, idempotency_key=key)
+
+        response = self.client.post(reverse('checkout'), data)
+        self.assertRedirects(response, reverse('order_success'))
+        order = Order.objects.get()
+        self.assertEqual(order.idempotency_key, key)
+
+        # The cart is empty now, but the replay still reaches the placed order
+        response = self.client.post(reverse('checkout'), data)
+        self.assertRedirects(response, reverse('order_success'))
+        self.assertEqual(self.client.session['last_order_number'], order.order_number)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).stock, 3)
+
+    def test_benchmark_command(self):
+        """The benchmark reports the same query count for every cart size and leaves no data behind."""
+        out = StringIO()
+        call_command('benchmark_checkout', '--lines', '1', '10', '--repeat', '1', stdout=out)
+        rows = [line.split() for line in out.getvalue().splitlines()[1:]]
+        self.assertEqual([row[0] for row in rows], ['1', '10'])
+        self.assertEqual(rows[0][1], rows[1][1])
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(Product.objects.count(), 20)
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    """Many buyers racing for the same stock never oversell it."""
+
+    THREADS = 8
+    ATTEMPTS_PER_THREAD = 250
+    STOCK = 500
+
+    def setUp(self):
+        """Set up test data."""
+        category = Category.objects.create(name='Race', slug='race', is_active=True)
+        self.products = [
+            Product.objects.create(
+                name=f'Race Product {i}', slug=f'race-product-{i}', category=category,
+                description='Race', price=Decimal('5.00'), stock=self.STOCK, is_active=True
+            )
+            for i in range(2)
+        ]
+
+    def buyer(self, outcomes):
+        """Place orders until the attempts run out, retrying when the database is busy."""
+        first, second = self.products
+        try:
+            for attempt in range(self.ATTEMPTS_PER_THREAD):
+                # Alternate the line order so lock ordering is exercised too
+                lines = [(first, 1), (second, 1)] if attempt % 2 else [(second, 1), (first, 1)]
+                items = [{'product': product, 'quantity': quantity, 'price': product.price}
+                         for product, quantity in lines]
+                while True:
+                    try:
+                        place_order(Order(**CHECKOUT_DATA), items)
+                        outcomes.append('placed')
+                    except InsufficientStock:
+                        outcomes.append('rejected')
+                    except OperationalError:
+                        # SQLite reports a concurrent writer instead of waiting for it
+                        time.sleep(0.001)
+                        continue
+                    break
+        finally:
+            connection.close()
+
+    def test_no_oversells_under_concurrent_checkouts(self):
+        """2000 checkouts for 500 units: exactly 500 succeed and stock ends at zero."""
+        outcomes = []
+        threads = [threading.Thread(target=self.buyer, args=(outcomes,)) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(outcomes), self.THREADS * self.ATTEMPTS_PER_THREAD)
+        self.assertEqual(outcomes.count('placed'), self.STOCK)
+        Worker().run(burst=True)
+        compact_sales()
+        for product in Product.objects.all():
+            self.assertEqual((product.stock, product.sales_count), (0, self.STOCK))
+        self.assertEqual(Order.objects.count(), self.STOCK)
+        self.assertEqual(OrderItem.objects.aggregate(total=Sum('quantity'))['total'], 2 * self.STOCK)
@@ -0,0 +1,104 @@
+"""
+Tests for the all-products facet counts.
+"""
+from decimal import Decimal
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+from catalog.facets import compute_facets, get_facets
+from catalog.models import Category, Product
+from orders.models import Order
+from orders.services import place_order
+
+
+class FacetTests(TestCase):
+    """Facet counts for the current search/filter state."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.client = Client()
+        self.lamps = Category.objects.create(name='Lamps', slug='lamps', is_active=True)
+        self.chairs = Category.objects.create(name='Chairs', slug='chairs', is_active=True)
+        for slug, category, price, stock in [
+            ('lamp-a', self.lamps, '50.00', 3),
+            ('lamp-b', self.lamps, '150.00', 0),
+            ('lamp-c', self.lamps, '1200.00', 1),
+            ('chair-a', self.chairs, '80.00', 2),
+            ('chair-b', self.chairs, '300.00', 5),
+        ]:
+            Product.objects.create(
+                name=slug.replace('-', ' ').title(),
+                slug=slug,
+                category=category,
+                description='Facet product',
+                price=Decimal(price),
+                stock=stock,
+                is_active=True
+            )
+
+    def active_products(self):
+        return Product.objects.filter(is_active=True)
+
+    def bucket_counts(self, facets):
+        return [bucket['count'] for bucket in facets['price_buckets']]
+
+    def test_counts_without_filters(self):
+        """Every facet counts the whole listing."""
+        facets = compute_facets(self.active_products())
+        self.assertEqual(facets['categories'], {self.lamps.id: 3, self.chairs.id: 2})
+        self.assertEqual(self.bucket_counts(facets), [2, 1, 1, 0, 1])
+        self.assertEqual(facets['in_stock'], 4)
+        self.assertEqual(facets['total'], 5)
+
+    def test_each_facet_ignores_its_own_filter(self):
+        """Category counts honour price/stock; price and stock counts honour the category."""
+        facets = compute_facets(
+            self.active_products(), category_id=self.lamps.id,
+            min_price=Decimal('100'), in_stock=True
+        )
+        # Products priced >= 100 and in stock, per category
+        self.assertEqual(facets['categories'], {self.lamps.id: 1, self.chairs.id: 1})
+        # In-stock lamps, by price
+        self.assertEqual(self.bucket_counts(facets), [1, 0, 0, 0, 1])
+        # Lamps priced >= 100 that are in stock
+        self.assertEqual(facets['in_stock'], 1)
+
+    def test_single_query_then_cached(self):
+        """Computing facets is one grouped query; repeating the state hits the cache."""
+        with self.assertNumQueries(1):
+            get_facets(self.active_products())
+        with self.assertNumQueries(0):
+            get_facets(self.active_products())
+
+    def test_product_save_invalidates_cache(self):
+        """Saving a product bumps the facet cache version."""
+        self.assertEqual(get_facets(self.active_products())['total'], 5)
+        Product.objects.filter(slug='lamp-a').first().delete()
+        self.assertEqual(get_facets(self.active_products())['total'], 4)
+
+    def test_checkout_selling_out_invalidates_cache(self):
+        """Checkouts only drop the cached counts when a product sells out."""
+        chair = Product.objects.get(slug='chair-a')
+        self.assertEqual(get_facets(self.active_products())['in_stock'], 4)
+
+        def buy():
+            with self.captureOnCommitCallbacks(execute=True):
+                place_order(Order(customer_name='A', phone='1', address='-'), [
+                    {'product': chair, 'quantity': 1, 'price': chair.price}
+                ])
+
+        buy()
+        with self.assertNumQueries(0):
+            get_facets(self.active_products())
+        buy()
+        self.assertEqual(get_facets(self.active_products())['in_stock'], 3)
+
+    def test_page_shows_counts_and_filters_stock(self):
+        """The sidebar shows category counts and the in-stock filter applies."""
+        response = self.client.get(reverse('all_products'), {'in_stock': '1'})
+        self.assertContains(response, 'Lamps (2)')
+        self.assertEqual(len(response.context['products']), 4)
+        response = self.client.get(reverse('all_products'), {'q': 'chair'})
+        self.assertContains(response, 'Lamps (0)')
+        self.assertEqual(response.context['facets']['total'], 2)
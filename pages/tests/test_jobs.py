@@ -0,0 +1,145 @@
+"""
+Tests for the background job queue.
+"""
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from jobs.models import Job
+from jobs.queue import claim, enqueue, enqueue_once, requeue_stale, retry_delay, run_job
+from jobs.worker import Worker
+from orders.models import Order
+
+
+CALLS = []
+
+
+def remember(value):
+    CALLS.append(value)
+
+
+def explode():
+    raise RuntimeError('boom')
+
+
+class JobQueueTests(TestCase):
+    """Jobs are claimed once, run, and retried with backoff when they fail."""
+
+    def setUp(self):
+        CALLS.clear()
+
+    def test_enqueued_job_runs_with_its_payload(self):
+        job = enqueue(remember, value='hello')
+        self.assertEqual(job.task, 'pages.tests.test_jobs.remember')
+        self.assertEqual(Worker().run(burst=True), 1)
+        self.assertEqual(CALLS, ['hello'])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.DONE, 1))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_claims_do_not_overlap(self):
+        jobs = [enqueue(remember, value=i) for i in range(5)]
+        first = claim('one', limit=3)
+        second = claim('two', limit=3)
+        self.assertEqual([job.pk for job in first], [job.pk for job in jobs[:3]])
+        self.assertEqual([job.pk for job in second], [job.pk for job in jobs[3:]])
+        self.assertEqual(claim('three', limit=3), [])
+
+    def test_enqueue_once_reuses_the_waiting_job(self):
+        job = enqueue_once(remember, value=1)
+        self.assertEqual(enqueue_once(remember, value=1), job)
+        self.assertNotEqual(enqueue_once(remember, value=2), job)
+        Worker().run(burst=True)
+        self.assertNotEqual(enqueue_once(remember, value=1), job)
+        self.assertEqual(CALLS, [1, 2])
+
+    def test_enqueue_once_survives_a_lost_race(self):
+        job = enqueue_once(remember, value=1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            enqueue(remember, dedupe_key=job.dedupe_key, value=1)
+        # Another caller queues the same job between our lookup and insert
+        lookups = []
+        real_first = QuerySet.first
+
+        def first(queryset):
+            lookups.append(queryset)
+            return None if len(lookups) == 1 else real_first(queryset)
+
+        with mock.patch.object(QuerySet, 'first', first):
+            self.assertEqual(enqueue_once(remember, value=1), job)
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_delayed_job_waits(self):
+        enqueue(remember, delay=60, value='later')
+        self.assertEqual(claim('worker'), [])
+        self.assertEqual(len(claim('worker', now=timezone.now() + timedelta(seconds=61))), 1)
+
+    @override_settings(JOB_RETRY_BACKOFF=10, JOB_RETRY_MAX_DELAY=60)
+    def test_failures_back_off_then_give_up(self):
+        self.assertEqual([retry_delay(n) for n in range(1, 6)], [10, 20, 40, 60, 60])
+        job = enqueue(explode, max_attempts=2)
+
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            self.assertFalse(run_job(claim('worker')[0]))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertIn('RuntimeError: boom', job.last_error)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=9))
+
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            self.assertFalse(run_job(claim('worker', now=job.run_at)[0]))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def test_failed_task_rolls_back_its_writes(self):
+        enqueue('pages.tests.test_jobs.write_then_explode')
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            Worker().run(burst=True)
+        self.assertFalse(Order.objects.exists())
+
+    @override_settings(JOB_LOCK_TIMEOUT=300)
+    def test_jobs_of_dead_workers_are_requeued(self):
+        job = enqueue(remember, value='again')
+        stale = claim('dead')[0]
+        self.assertEqual(requeue_stale(), 0)
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(seconds=301))
+        self.assertEqual(requeue_stale(), 1)
+        self.assertEqual(Worker().run(burst=True), 1)
+        self.assertEqual(CALLS, ['again'])
+        # The dead worker's claim can no longer record an outcome
+        run_job(stale)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.DONE, 2))
+
+    def test_runworker_burst(self):
+        enqueue(remember, value=1)
+        enqueue(remember, value=2)
+        out = StringIO()
+        call_command('runworker', '--burst', '--threads', '1', stdout=out)
+        self.assertIn('2 job(s) run.', out.getvalue())
+        self.assertEqual(CALLS, [1, 2])
+
+    def test_status_update_queues_notification(self):
+        staff = get_user_model().objects.create_user(
+            username='staff', email='staff@example.com', password='password', is_staff=True
+        )
+        self.client.force_login(staff)
+        order = Order.objects.create(customer_name='A', phone='1', address='-')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('update_order_status', args=[order.pk]), {'status': 'shipped'})
+        job = Job.objects.get()
+        self.assertEqual((job.task, job.payload), (
+            'orders.tasks.order_status_changed', {'order_id': order.pk, 'status': 'shipped'}
+        ))
+        self.assertEqual(Worker().run(burst=True), 1)
+
+
+def write_then_explode():
+    Order.objects.create(customer_name='Half', phone='1', address='-')
+    raise RuntimeError('after writing')
@@ -0,0 +1,84 @@
+"""
+Query budgets for the product-card listing pages.
+"""
+from decimal import Decimal
+from unittest import mock
+from django.test import TestCase, Client
+from django.urls import reverse
+from catalog.models import Category, Product, ProductImage, ProductColor
+from catalog.offers import get_offer_resolver
+
+
+class ListingQueryBudgetTests(TestCase):
+    """Each listing page must cost a fixed number of queries, however many cards it shows."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.client = Client()
+        self.category = Category.objects.create(
+            name='Budget Category',
+            slug='budget-category',
+            is_active=True
+        )
+        # Offers come from the shared cache once loaded; budgets assume it is warm
+        get_offer_resolver()
+
+    def create_products(self, count):
+        """Create products with images and more colors than a card displays."""
+        start = Product.objects.count()
+        for i in range(start, start + count):
+            product = Product.objects.create(
+                name=f'Budget Product {i}',
+                slug=f'budget-product-{i}',
+                category=self.category,
+                description='A product used for query budgets.',
+                price=Decimal('10.00'),
+                stock=5,
+                is_active=True,
+                is_featured=True,
+                sales_count=i + 1
+            )
+            ProductImage.objects.create(product=product, image='products/images.jpg')
+            for j in range(7):
+                ProductColor.objects.create(product=product, name=f'Color {j}', hex_code='#FF0000')
+
+    def assert_page_budget(self, url, budget):
+        """Render the page with few and with many products and check both stay on budget."""
+        self.create_products(2)
+        with self.assertNumQueries(budget):
+            self.client.get(url)
+        self.create_products(10)
+        with self.assertNumQueries(budget):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_home_page_budget(self):
+        """Home page: categories, best sellers (ranking, all-time fill, cards) and featured products with their prefetches."""
+        self.assert_page_budget(reverse('home'), 9)
+
+    def test_all_products_budget(self):
+        """All products: sidebar categories, facets, count, page and two prefetches."""
+        response = self.assert_page_budget(reverse('all_products'), 6)
+        self.assertContains(response, '+2')
+
+    def test_color_overflow_follows_the_card_limit(self):
+        """The "+N" label counts the colors past the dots the card shows."""
+        self.create_products(1)
+        with mock.patch('catalog.models.CARD_COLOR_LIMIT', 3):
+            product = Product.objects.for_cards().get()
+            response = self.client.get(reverse('all_products'))
+        self.assertEqual((len(product.card_colors), product.color_overflow), (3, 4))
+        self.assertContains(response, '+4')
+
+    def test_category_products_budget(self):
+        """Category page: category lookup, count, page, two prefetches and the sidebar categories."""
+        self.assert_page_budget(reverse('category_products', args=[self.category.slug]), 6)
+
+    def test_product_detail_related_budget(self):
+        """Product detail: product, images, colors, recommendations, related cards and their prefetches; no offer queries."""
+        self.create_products(6)
+        url = reverse('product_detail', args=['budget-product-0'])
+        with self.assertNumQueries(7):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
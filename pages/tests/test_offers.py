@@ -0,0 +1,223 @@
+"""
+Tests for batch offer resolution.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.core.cache.backends.db import DatabaseCache
+from django.core.management import call_command
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from catalog.models import Category, Product, Offer
+from catalog import pricing
+from catalog.offers import OfferResolver, get_offer_resolver, invalidate_offers
+
+
+class OfferResolverTests(TestCase):
+    """Offers price whole pages at once, with product offers over category offers."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.client = Client()
+        self.addCleanup(invalidate_offers)
+        self.now = timezone.now()
+        self.category = Category.objects.create(
+            name='Offer Category',
+            slug='offer-category',
+            is_active=True
+        )
+        self.other_category = Category.objects.create(
+            name='Plain Category',
+            slug='plain-category',
+            is_active=True
+        )
+        self.lamp = self.create_product('lamp', Decimal('200.00'))
+        self.chair = self.create_product('chair', Decimal('80.00'))
+        self.table = self.create_product('table', Decimal('50.00'), category=self.other_category)
+
+    def create_product(self, slug, price, category=None):
+        return Product.objects.create(
+            name=slug.title(),
+            slug=slug,
+            category=category or self.category,
+            description='Offer test product.',
+            price=price,
+            stock=5,
+            is_active=True
+        )
+
+    def create_offer(self, value, offer_type='percentage', start=-1, end=1, **targets):
+        return Offer.objects.create(
+            title=f'{value} {offer_type}',
+            offer_type=offer_type,
+            value=Decimal(value),
+            start_date=self.now + timedelta(days=start),
+            end_date=self.now + timedelta(days=end),
+            **targets
+        )
+
+    def test_product_offer_wins_over_category_offer(self):
+        """Product offers take priority, category offers cover the rest."""
+        category_offer = self.create_offer('10', category=self.category)
+        product_offer = self.create_offer('30', offer_type='fixed', product=self.chair)
+        resolver = OfferResolver.load()
+        lamp, chair, table = resolver.apply([self.lamp, self.chair, self.table])
+        self.assertEqual((lamp.offer, lamp.discount_price, lamp.discount_percent),
+                         (category_offer, Decimal('180.00'), 10))
+        self.assertEqual((chair.offer, chair.discount_price, chair.discount_percent),
+                         (product_offer, Decimal('50.00'), 38))
+        self.assertEqual((table.offer, table.discount_price, table.discount_percent), (None, None, None))
+
+    def test_oldest_offer_wins_and_invalid_offers_are_ignored(self):
+        """Among several offers for one target the lowest id applies; expired, future and inactive ones never do."""
+        first = self.create_offer('20', product=self.lamp)
+        self.create_offer('50', product=self.lamp)
+        self.create_offer('90', start=-3, end=-2, category=self.other_category)
+        self.create_offer('90', start=2, end=3, category=self.other_category)
+        inactive = self.create_offer('90', category=self.other_category)
+        Offer.objects.filter(pk=inactive.pk).update(is_active=False)
+        resolver = OfferResolver.load()
+        self.assertEqual(resolver.resolve(self.lamp).offer, first)
+        self.assertIsNone(resolver.resolve(self.table))
+        self.assertEqual(resolver.offers, [first, Offer.objects.get(value=50)])
+
+    def test_resolver_expires_at_the_next_boundary(self):
+        """The snapshot is good until the next offer starts or ends."""
+        self.create_offer('10', start=-1, end=5, category=self.category)
+        self.create_offer('10', start=2, end=6, product=self.lamp)
+        resolver = OfferResolver.load(self.now)
+        self.assertEqual(resolver.expires_at, self.now + timedelta(days=2))
+        self.assertFalse(resolver.is_expired(self.now + timedelta(days=1)))
+        self.assertTrue(resolver.is_expired(self.now + timedelta(days=2)))
+
+    def test_cached_resolver_follows_offer_saves(self):
+        """The cached resolver costs no queries and is replaced when an offer changes."""
+        get_offer_resolver()
+        with self.assertNumQueries(0):
+            self.assertIsNone(get_offer_resolver().resolve(self.lamp))
+        offer = self.create_offer('25', product=self.lamp)
+        self.assertEqual(get_offer_resolver().resolve(self.lamp).price, Decimal('150.00'))
+        offer.delete()
+        self.assertIsNone(get_offer_resolver().resolve(self.lamp))
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'test_shared_cache'
+    }})
+    def test_offer_saves_reach_other_processes(self):
+        """With a shared cache, an offer saved by one process is seen by the others."""
+        call_command('createcachetable', verbosity=0)
+        # Another worker process: its own connection to the same cache
+        other_process = mock.patch('catalog.offers.cache', DatabaseCache('test_shared_cache', {}))
+        with other_process:
+            self.assertIsNone(get_offer_resolver().resolve(self.lamp))
+        self.create_offer('25', product=self.lamp)
+        with other_process:
+            self.assertEqual(get_offer_resolver().resolve(self.lamp).price, Decimal('150.00'))
+
+    def test_pages_show_offer_prices(self):
+        """Listing cards and the detail page show the same discounted price."""
+        self.create_offer('10', category=self.category)
+        response = self.client.get(reverse('all_products'))
+        self.assertContains(response, 'EGP 180.00')
+        self.assertContains(response, 'EGP 72.00')
+        response = self.client.get(reverse('product_detail', args=['lamp']))
+        self.assertEqual(response.context['discount_price'], Decimal('180.00'))
+        self.assertEqual(response.context['discount_percent'], 10)
+        self.assertContains(response, '10 percentage')
+
+
+class EffectivePriceTests(TestCase):
+    """The stored effective price follows product and offer writes and drives price sort and filters."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.client = Client()
+        self.addCleanup(invalidate_offers)
+        self.now = timezone.now()
+        self.category = Category.objects.create(name='Sofas', slug='sofas', is_active=True)
+        self.other_category = Category.objects.create(name='Rugs', slug='rugs', is_active=True)
+        self.sofa = self.create_product('sofa', Decimal('100.00'), self.category)
+        self.rug = self.create_product('rug', Decimal('70.00'), self.other_category)
+
+    def create_product(self, slug, price, category):
+        return Product.objects.create(
+            name=slug.title(),
+            slug=slug,
+            category=category,
+            description='Effective price test product.',
+            price=price,
+            stock=5,
+            is_active=True
+        )
+
+    def create_offer(self, value, **targets):
+        return Offer.objects.create(
+            title='Sale', offer_type='percentage', value=Decimal(value),
+            start_date=self.now - timedelta(days=1), end_date=self.now + timedelta(days=1),
+            **targets
+        )
+
+    def effective_prices(self):
+        return dict(Product.objects.values_list('slug', 'effective_price'))
+
+    def test_offer_writes_reprice_their_targets(self):
+        """Creating, moving and deleting an offer reprices the old and new targets."""
+        self.assertEqual(self.effective_prices(), {'sofa': Decimal('100.00'), 'rug': Decimal('70.00')})
+        offer = self.create_offer('50', category=self.category)
+        self.assertEqual(self.effective_prices(), {'sofa': Decimal('50.00'), 'rug': Decimal('70.00')})
+        offer.category = self.other_category
+        offer.save()
+        self.assertEqual(self.effective_prices(), {'sofa': Decimal('100.00'), 'rug': Decimal('35.00')})
+        offer.delete()
+        self.assertEqual(self.effective_prices(), {'sofa': Decimal('100.00'), 'rug': Decimal('70.00')})
+
+    def test_product_save_applies_discount_and_offer(self):
+        """A product's own discount and its offer both count."""
+        self.create_offer('10', product=self.sofa)
+        self.sofa.compare_at_price = Decimal('200.00')
+        self.sofa.discount_percentage = 25
+        self.sofa.save()
+        self.sofa.refresh_from_db()
+        self.assertEqual(self.sofa.price, Decimal('150.00'))
+        self.assertEqual(self.sofa.effective_price, Decimal('135.00'))
+
+    def test_price_sort_and_filter_use_effective_price(self):
+        """The sofa on sale sorts and filters by what it actually costs."""
+        self.create_offer('50', product=self.sofa)
+        response = self.client.get(reverse('all_products'), {'sort': 'price_low'})
+        self.assertEqual([p.slug for p in response.context['products']], ['sofa', 'rug'])
+        response = self.client.get(reverse('all_products'), {'max_price': '60'})
+        self.assertEqual([p.slug for p in response.context['products']], ['sofa'])
+        response = self.client.get(reverse('category_products', args=['sofas']), {'min_price': '60'})
+        self.assertEqual([p.slug for p in response.context['products']], [])
+
+    def test_recompute_command_catches_offer_windows(self):
+        """The command applies offers whose window opened without a write."""
+        offer = self.create_offer('10', category=self.category)
+        Offer.objects.filter(pk=offer.pk).update(start_date=self.now + timedelta(hours=1))
+        call_command('recompute_effective_prices', stdout=StringIO())
+        self.assertEqual(self.effective_prices()['sofa'], Decimal('100.00'))
+        Offer.objects.filter(pk=offer.pk).update(start_date=self.now - timedelta(hours=1))
+        out = StringIO()
+        call_command('recompute_effective_prices', stdout=out)
+        self.assertEqual(self.effective_prices()['sofa'], Decimal('90.00'))
+        self.assertIn('1 effective price(s) updated.', out.getvalue())
+
+    def test_recompute_only_prices_offer_targets(self):
+        """Products without an offer are reset in bulk, never priced one by one."""
+        self.create_offer('10', product=self.sofa)
+        for i in range(3):
+            self.create_product(f'plain-{i}', Decimal('20.00'), self.other_category)
+        # An offer on the rug ended without a write
+        Product.objects.filter(pk=self.rug.pk).update(effective_price=Decimal('35.00'))
+        Product.objects.filter(pk=self.sofa.pk).update(effective_price=Decimal('100.00'))
+        with mock.patch.object(pricing, 'effective_price', wraps=pricing.effective_price) as priced:
+            changed, _ = pricing.recompute_effective_prices()
+        self.assertEqual([call.args[0].pk for call in priced.call_args_list], [self.sofa.pk])
+        self.assertEqual(changed, 2)
+        self.assertEqual(self.effective_prices(), {
+            'sofa': Decimal('90.00'), 'rug': Decimal('70.00'),
+            'plain-0': Decimal('20.00'), 'plain-1': Decimal('20.00'), 'plain-2': Decimal('20.00'),
+        })
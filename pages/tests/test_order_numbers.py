@@ -0,0 +1,78 @@
+"""
+Tests for order number generation.
+"""
+from io import StringIO
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from orders.models import Order, OrderSequence
+from orders.numbering import SequenceGenerator, encode, get_generator, reset_generator
+
+
+class Rollback(Exception):
+    pass
+
+
+class SequenceGeneratorTests(TestCase):
+    """Order numbers come from committed blocks of a database counter."""
+
+    def setUp(self):
+        reset_generator()
+        self.addCleanup(reset_generator)
+
+    def test_encoding_is_fixed_width_and_sortable(self):
+        values = [0, 1, 31, 32, 1000, 32 ** 7 - 1]
+        encoded = [encode(value) for value in values]
+        self.assertEqual(encoded[:4], ['0000000', '0000001', '000000Z', '0000010'])
+        self.assertEqual(encoded, sorted(encoded))
+        self.assertEqual({len(code) for code in encoded}, {7})
+
+    def test_numbers_increase_from_one_reserved_block(self):
+        generator = SequenceGenerator(block_size=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            first = generator()
+        with self.assertNumQueries(0):
+            rest = [generator() for _ in range(4)]
+        self.assertEqual([first] + rest, [f'ORD-000000{i}' for i in range(1, 6)])
+        # The next block continues where the counter stands
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(generator(), 'ORD-0000006')
+        self.assertEqual(OrderSequence.objects.get(name='order').last_value, 10)
+
+    def test_processes_never_share_a_block(self):
+        one, two = SequenceGenerator(block_size=3), SequenceGenerator(block_size=3)
+        numbers = []
+        for _ in range(4):
+            for generator in (one, two):
+                with self.captureOnCommitCallbacks(execute=True):
+                    numbers.append(generator())
+        self.assertEqual(len(set(numbers)), len(numbers))
+
+    def test_rolled_back_block_is_not_reused(self):
+        """A block reserved in a transaction that rolls back goes to the next caller, not back to us."""
+        generator, other = SequenceGenerator(block_size=5), SequenceGenerator(block_size=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.assertEqual(generator(), 'ORD-0000001')
+                    raise Rollback
+            except Rollback:
+                pass
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(other(), 'ORD-0000001')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(generator(), 'ORD-0000006')
+
+    def test_orders_use_the_configured_generator(self):
+        self.assertEqual(Order.objects.create(customer_name='A', phone='1', address='-').order_number, 'ORD-0000001')
+        with override_settings(ORDER_NUMBER_GENERATOR='orders.numbering.RandomGenerator'):
+            reset_generator()
+            number = Order.objects.create(customer_name='B', phone='2', address='-').order_number
+        self.assertRegex(number, r'^ORD-[0-9A-F]{8}$')
+        self.assertEqual(type(get_generator()).__name__, 'RandomGenerator')
+
+    def test_benchmark_command_leaves_no_orders(self):
+        out = StringIO()
+        call_command('benchmark_order_numbers', '--orders', '5', stdout=out)
+        self.assertIn('orders.numbering.SequenceGenerator', out.getvalue())
+        self.assertFalse(Order.objects.exists())
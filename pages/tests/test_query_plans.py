@@ -0,0 +1,125 @@
+"""
+Query-plan regression tests for the storefront pages.
+"""
+import re
+from datetime import timedelta
+from decimal import Decimal
+from django.db import connection
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.utils import timezone
+from catalog.models import Category, Product, Offer
+from catalog.offers import invalidate_offers
+
+
+# Tables that must always be reached through an index
+INDEXED_TABLES = ('catalog_product', 'catalog_offer', 'catalog_dailysales', 'catalog_productrecommendation')
+
+
+class QueryPlanTests(TestCase):
+    """Every catalog query behind the public pages uses an index instead of a full table scan."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.client = Client()
+        self.category = Category.objects.create(
+            name='Plan Category',
+            slug='plan-category',
+            is_active=True
+        )
+        for i in range(20):
+            Product.objects.create(
+                name=f'Plan Product {i}',
+                slug=f'plan-product-{i}',
+                category=self.category,
+                description='Plan',
+                price=Decimal(10 + i),
+                stock=i % 3,
+                sales_count=i,
+                is_featured=i % 2 == 0,
+                is_active=i % 5 != 0
+            )
+        now = timezone.now()
+        Offer.objects.create(
+            title='Category Offer', offer_type='percentage', value=Decimal('10'),
+            start_date=now - timedelta(days=1), end_date=now + timedelta(days=1),
+            category=self.category
+        )
+        self.addCleanup(invalidate_offers)
+
+    def capture(self, url, params=None, language='en'):
+        """Run a request and return the (sql, params) of every query it made."""
+        queries = []
+
+        def collect(execute, sql, sql_params, many, context):
+            queries.append((sql, sql_params))
+            return execute(sql, sql_params, many, context)
+
+        with connection.execute_wrapper(collect):
+            response = self.client.get(url, params or {}, HTTP_ACCEPT_LANGUAGE=language)
+        self.assertEqual(response.status_code, 200)
+        return response, queries
+
+    def full_scans(self, sql, params):
+        """
+        Return the plan lines that scan a catalog table without an index, or
+        walk all of the product table's index only to sort it again.
+        """
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # Tiny test tables make a sequential scan the cheapest plan
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute(f'EXPLAIN {sql}', params)
+                lines = [row[0] for row in cursor.fetchall()]
+                pattern = r'Seq Scan on ({})\b'
+            else:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                lines = [row[-1] for row in cursor.fetchall()]
+                pattern = r'^SCAN ({})(?: AS \w+)?$'
+        tables = '|'.join(INDEXED_TABLES)
+        scans = [line for line in lines if re.search(pattern.format(tables), line.strip())]
+        if connection.vendor == 'sqlite' and 'USE TEMP B-TREE FOR ORDER BY' in lines:
+            # Walking a whole product index only to sort the rows again reads every active product
+            scans += [line for line in lines if line.startswith('SCAN catalog_product USING ')]
+        return scans
+
+    def assert_no_full_scans(self, url, params=None, language='en'):
+        response, queries = self.capture(url, params, language)
+        checked = 0
+        for sql, sql_params in queries:
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            if not any(table in sql for table in INDEXED_TABLES):
+                continue
+            checked += 1
+            with self.subTest(sql=sql):
+                self.assertEqual(self.full_scans(sql, sql_params), [])
+        self.assertGreater(checked, 0)
+        return response
+
+    def test_home_page(self):
+        """Best sellers, featured products and current offers."""
+        self.assert_no_full_scans(reverse('home'))
+
+    def test_all_products_every_sort(self):
+        """Each sort order in each language, on the first and a later page."""
+        for language in ['en', 'ar']:
+            for sort in ['newest', 'price_low', 'price_high', 'name']:
+                with self.subTest(language=language, sort=sort):
+                    response = self.assert_no_full_scans(reverse('all_products'), {'sort': sort}, language)
+                    cursor = response.context['page_obj'].next_cursor
+                    self.assert_no_full_scans(reverse('all_products'), {'sort': sort, 'cursor': cursor}, language)
+
+    def test_all_products_filters(self):
+        """Category, price and stock filters."""
+        self.assert_no_full_scans(reverse('all_products'), {
+            'category': self.category.slug, 'min_price': '12', 'max_price': '25',
+            'in_stock': '1', 'sort': 'price_low'
+        })
+
+    def test_category_page(self):
+        self.assert_no_full_scans(reverse('category_products', args=[self.category.slug]))
+
+    def test_product_detail(self):
+        """The product, its offer and the related products."""
+        self.assert_no_full_scans(reverse('product_detail', args=['plan-product-1']))
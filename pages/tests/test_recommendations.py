@@ -0,0 +1,91 @@
+"""
+Tests for "frequently bought together" recommendations.
+"""
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from catalog.models import Category, Product, ProductRecommendation
+from catalog.recommendations import build_recommendations, recommended_ids
+from orders.models import Order, OrderItem
+
+
+class RecommendationTests(TestCase):
+    """Recommendations come from the products ordered together most often."""
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Desk', slug='desk', is_active=True)
+        self.other = Category.objects.create(name='Other', slug='other', is_active=True)
+        self.lamp, self.bulb, self.shade, self.chair = [
+            self.create_product(slug) for slug in ['lamp', 'bulb', 'shade', 'chair']
+        ]
+        self.rug = self.create_product('rug', category=self.other)
+
+    def create_product(self, slug, category=None, is_active=True):
+        return Product.objects.create(
+            name=slug.title(), slug=slug, category=category or self.category, description='Rec',
+            price=Decimal('10.00'), stock=10, is_active=is_active
+        )
+
+    def order(self, *products):
+        order = Order.objects.create(customer_name='A', phone='1', address='-')
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=1, unit_price=product.price, line_total=product.price)
+            for product in products
+        ])
+
+    def test_top_partners_ranked_by_shared_orders(self):
+        for _ in range(3):
+            self.order(self.lamp, self.bulb)
+        self.order(self.lamp, self.shade, self.rug)
+        self.order(self.lamp, self.rug)
+        self.assertEqual(build_recommendations(top_k=2, min_orders=1), 7)
+        self.assertEqual(
+            list(ProductRecommendation.objects.filter(product=self.lamp).values_list('recommended', 'score', 'rank')),
+            [(self.bulb.pk, 3, 1), (self.rug.pk, 2, 2)]
+        )
+        self.assertEqual(
+            list(ProductRecommendation.objects.filter(product=self.shade).values_list('recommended', 'rank')),
+            [(self.lamp.pk, 1), (self.rug.pk, 2)]
+        )
+
+    def test_min_orders_and_max_basket(self):
+        self.order(self.lamp, self.bulb)
+        self.order(self.lamp, self.bulb)
+        self.order(self.lamp, self.shade)
+        # A huge basket says nothing about what goes together
+        self.order(self.lamp, self.shade, self.chair, self.rug)
+        build_recommendations(min_orders=2, max_basket=3)
+        self.assertEqual(
+            sorted(ProductRecommendation.objects.values_list('product', 'recommended')),
+            sorted([(self.lamp.pk, self.bulb.pk), (self.bulb.pk, self.lamp.pk)])
+        )
+
+    def test_rebuild_replaces_previous_recommendations(self):
+        self.order(self.lamp, self.bulb)
+        build_recommendations(min_orders=1)
+        OrderItem.objects.all().delete()
+        self.order(self.lamp, self.shade)
+        out = StringIO()
+        call_command('build_recommendations', '--min-orders', '1', stdout=out)
+        self.assertIn('2 recommendation(s) stored.', out.getvalue())
+        self.assertEqual(recommended_ids(self.lamp), [self.shade.pk])
+
+    def test_inactive_products_are_not_recommended(self):
+        self.order(self.lamp, self.bulb, self.shade)
+        build_recommendations(min_orders=1)
+        Product.objects.filter(pk=self.bulb.pk).update(is_active=False)
+        self.assertEqual(recommended_ids(self.lamp), [self.shade.pk])
+
+    def test_detail_page_shows_recommendations(self):
+        self.order(self.lamp, self.rug)
+        build_recommendations(min_orders=1)
+        response = self.client.get(reverse('product_detail', args=['lamp']))
+        self.assertEqual([p.pk for p in response.context['related_products']], [self.rug.pk])
+
+    def test_detail_page_falls_back_to_category(self):
+        response = self.client.get(reverse('product_detail', args=['lamp']))
+        self.assertEqual(
+            {p.pk for p in response.context['related_products']}, {self.bulb.pk, self.shade.pk, self.chair.pk}
+        )
@@ -0,0 +1,139 @@
+"""
+Tests for checkout stock reservations.
+"""
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, Client
+from django.urls import reverse
+from django.utils import timezone
+from catalog.models import Category, Product
+from orders.models import Order, StockReservation
+from orders.reservations import available_stock, hold_stock, release_expired
+from orders.services import InsufficientStock, place_order
+
+
+CHECKOUT_DATA = {
+    'customer_name': 'Test Customer',
+    'phone': '01000000000',
+    'state': 'Cairo',
+    'city': 'Nasr City',
+    'address': '1 Test Street',
+}
+
+
+class StockReservationTests(TestCase):
+    """Holds reserve stock for a session until they expire or the order is placed."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.category = Category.objects.create(name='Hold Category', slug='hold-category', is_active=True)
+        self.products = [
+            Product.objects.create(
+                name=f'Hold Product {i}', slug=f'hold-product-{i}', category=self.category,
+                description='Hold', price=Decimal('10.00'), stock=3, is_active=True
+            )
+            for i in range(10)
+        ]
+        self.product = self.products[0]
+
+    def test_holds_are_capped_by_other_sessions(self):
+        """A session gets what the others have not held, and re-holding replaces its own holds."""
+        self.assertEqual(hold_stock('alice', {self.product.pk: 2}), {self.product.pk: 2})
+        self.assertEqual(hold_stock('bob', {self.product.pk: 2}), {self.product.pk: 1})
+        self.assertEqual(hold_stock('alice', {self.product.pk: 1}), {self.product.pk: 1})
+        self.assertEqual(available_stock([self.product.pk], 'carol'), {self.product.pk: 1})
+        self.assertEqual(StockReservation.objects.aggregate(total=Sum('quantity'))['total'], 2)
+
+    def test_expired_holds_are_ignored_and_swept(self):
+        """Expired holds free their stock at once and the sweeper deletes them in batches."""
+        hold_stock('alice', {product.pk: 3 for product in self.products})
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(available_stock([self.product.pk], 'bob'), {self.product.pk: 3})
+
+        with self.assertNumQueries(2 * 4 + 1):
+            self.assertEqual(release_expired(batch_size=3), 10)
+        out = StringIO()
+        call_command('release_expired_reservations', stdout=out)
+        self.assertIn('0 expired reservation(s) released.', out.getvalue())
+
+    def test_hold_cost_does_not_grow_with_cart_lines(self):
+        """Holding one line or ten runs the same statements."""
+        with self.assertNumQueries(6) as captured:
+            hold_stock('alice', {self.product.pk: 1})
+        with self.assertNumQueries(len(captured)):
+            hold_stock('alice', {product.pk: 1 for product in self.products})
+
+    def test_checkout_honours_holds(self):
+        """Another shopper's hold blocks the stock; the holder can still buy it and the hold is consumed."""
+        holder, other = Client(), Client()
+        for client, quantity in [(holder, 2), (other, 2)]:
+            client.post(reverse('cart_add', args=[self.product.id]), {'quantity': quantity})
+
+        response = holder.get(reverse('checkout'))
+        self.assertFalse(response.context['short_holds'])
+        response = other.get(reverse('checkout'))
+        self.assertEqual([(line['product'], line['held']) for line in response.context['short_holds']],
+                         [(self.product, 1)])
+        self.assertContains(response, 'Only 1 of Hold Product 0 could be reserved for you.')
+
+        response = other.post(reverse('checkout'), CHECKOUT_DATA)
+        self.assertEqual(response.context['form'].non_field_errors(), ['Only 1 left of Hold Product 0.'])
+        response = holder.post(reverse('checkout'), CHECKOUT_DATA)
+        self.assertRedirects(response, reverse('order_success'))
+        self.assertEqual(Product.objects.get(pk=self.product.pk).stock, 1)
+        self.assertEqual(list(StockReservation.objects.values_list('quantity', flat=True)), [1])
+
+    def test_orders_without_a_session_respect_every_hold(self):
+        """Only the holding session may buy held stock."""
+        hold_stock('alice', {self.product.pk: 3})
+        items = [{'product': self.product, 'quantity': 1, 'price': self.product.price}]
+        with self.assertRaises(InsufficientStock):
+            place_order(Order(**CHECKOUT_DATA), items)
+        place_order(Order(**CHECKOUT_DATA), items, session_key='alice')
+        self.assertFalse(StockReservation.objects.exists())
+
+
+class ConcurrentReservationTests(TransactionTestCase):
+    """Shoppers racing to hold the last units never hold more than is in stock."""
+
+    THREADS = 8
+    STOCK = 20
+
+    def test_concurrent_holds_never_exceed_stock(self):
+        """80 single-unit holds for 20 units: exactly 20 are granted."""
+        category = Category.objects.create(name='Race Holds', slug='race-holds', is_active=True)
+        product = Product.objects.create(
+            name='Race Hold', slug='race-hold', category=category,
+            description='Race', price=Decimal('1.00'), stock=self.STOCK, is_active=True
+        )
+        granted = []
+
+        def shopper(index):
+            try:
+                for attempt in range(10):
+                    while True:
+                        try:
+                            held = hold_stock(f'session-{index}-{attempt}', {product.pk: 1})
+                        except OperationalError:
+                            # SQLite reports a concurrent writer instead of waiting for it
+                            time.sleep(0.001)
+                            continue
+                        granted.append(held[product.pk])
+                        break
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=shopper, args=(i,)) for i in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sum(granted), self.STOCK)
+        self.assertEqual(StockReservation.objects.aggregate(total=Sum('quantity'))['total'], self.STOCK)
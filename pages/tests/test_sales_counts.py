@@ -0,0 +1,58 @@
+"""
+Tests for append-only sales counters.
+"""
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from catalog.models import Category, Product, SalesIncrement
+from catalog.sales import compact_sales, record_increments
+from orders.models import Order, OrderItem
+from orders.tasks import record_sales
+
+
+class SalesIncrementTests(TestCase):
+    """Sales are appended per order and folded into sales_count by compaction."""
+
+    def setUp(self):
+        category = Category.objects.create(name='Sales', slug='sales', is_active=True)
+        self.products = [
+            Product.objects.create(
+                name=f'Sales Product {i}', slug=f'sales-product-{i}', category=category,
+                description='Sales', price=Decimal('10.00'), stock=100, sales_count=5, is_active=True
+            )
+            for i in range(3)
+        ]
+
+    def counts(self):
+        return list(Product.objects.order_by('pk').values_list('sales_count', flat=True))
+
+    def test_recording_sales_only_inserts(self):
+        """An order's sales are one INSERT and leave the product rows alone."""
+        order = Order.objects.create(customer_name='A', phone='1', address='-')
+        for product, quantity in [(self.products[0], 2), (self.products[1], 1), (self.products[0], 3)]:
+            OrderItem.objects.create(order=order, product=product, quantity=quantity, unit_price=product.price)
+        with self.assertNumQueries(3):
+            record_sales(order.pk)
+        self.assertEqual(
+            sorted(SalesIncrement.objects.values_list('product_id', 'quantity')),
+            [(self.products[0].pk, 5), (self.products[1].pk, 1)]
+        )
+        self.assertEqual(self.counts(), [5, 5, 5])
+
+    def test_compaction_folds_and_deletes_increments(self):
+        for _ in range(3):
+            record_increments({self.products[0].pk: 2, self.products[2].pk: 1})
+        self.assertEqual(compact_sales(batch_size=4), (6, 2))
+        self.assertEqual(self.counts(), [11, 5, 8])
+        self.assertFalse(SalesIncrement.objects.exists())
+        # Nothing left to fold: running again changes nothing
+        self.assertEqual(compact_sales(), (0, 0))
+        self.assertEqual(self.counts(), [11, 5, 8])
+
+    def test_compact_command(self):
+        record_increments({self.products[1].pk: 4})
+        out = StringIO()
+        call_command('compact_sales_counts', stdout=out)
+        self.assertIn('1 increment(s) folded into 1 product(s).', out.getvalue())
+        self.assertEqual(self.counts(), [5, 9, 5])
@@ -0,0 +1,158 @@
+"""
+Tests for full-text product search.
+"""
+from decimal import Decimal
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client
+from django.urls import reverse
+from catalog.models import Category, Product
+from catalog.normalization import fold_text
+from catalog.search import SQLITE_TABLE, POSTGRES_TABLE
+
+
+class ProductSearchTests(TestCase):
+    """Search covers names and descriptions in both languages and ranks name matches first."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.client = Client()
+        self.category = Category.objects.create(
+            name='Lighting',
+            slug='lighting',
+            is_active=True
+        )
+        self.lamp = self.create_product(
+            'desk-lamp', 'Desk Lamp', 'مصباح مكتب', 'Adjustable arm.', 'ذراع قابلة للتعديل.'
+        )
+        self.bulb = self.create_product(
+            'smart-bulb', 'Smart Bulb', 'لمبة ذكية', 'Fits any lamp socket.', 'تناسب أي قاعدة.'
+        )
+        self.chair = self.create_product(
+            'office-chair', 'Office Chair', 'كرسي مكتب', 'Ergonomic seat.', 'مقعد مريح.'
+        )
+
+    def create_product(self, slug, name_en, name_ar, description_en, description_ar):
+        return Product.objects.create(
+            slug=slug,
+            category=self.category,
+            name_en=name_en,
+            name_ar=name_ar,
+            description_en=description_en,
+            description_ar=description_ar,
+            price=Decimal('20.00'),
+            stock=5,
+            is_active=True
+        )
+
+    def search(self, query, url=None, **params):
+        response = self.client.get(url or reverse('all_products'), {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [product.slug for product in response.context['products']]
+
+    def test_matches_description_and_ranks_name_matches_first(self):
+        """A name match outranks a description-only match."""
+        self.assertEqual(self.search('lamp'), ['desk-lamp', 'smart-bulb'])
+
+    def test_matches_arabic_text_regardless_of_active_language(self):
+        """Arabic names are searchable from the English site and vice versa."""
+        self.assertEqual(self.search('كرسي'), ['office-chair'])
+        response = self.client.get(reverse('all_products'), {'q': 'chair'}, HTTP_ACCEPT_LANGUAGE='ar')
+        self.assertEqual([p.slug for p in response.context['products']], ['office-chair'])
+
+    def test_prefix_and_multi_word_queries(self):
+        """Each word matches as a prefix and all words must match."""
+        self.assertEqual(self.search('off cha'), ['office-chair'])
+        self.assertEqual(self.search('desk chair'), [])
+
+    def test_query_syntax_is_not_interpreted(self):
+        """Quotes and operators in user input are treated as plain text."""
+        self.assertEqual(self.search('"lamp" (desk*'), ['desk-lamp'])
+        self.assertEqual(self.search('***'), [])
+
+    def test_category_page_search(self):
+        """The category listing uses the same index."""
+        url = reverse('category_products', args=[self.category.slug])
+        self.assertEqual(self.search('bulb', url=url), ['smart-bulb'])
+
+    def test_index_follows_saves_and_deletes(self):
+        """Saving a product reindexes it and deleting removes it."""
+        self.chair.name_en = 'Gaming Chair'
+        self.chair.save()
+        self.assertEqual(self.search('gaming'), ['office-chair'])
+        self.assertEqual(self.search('office'), [])
+        self.chair.delete()
+        self.assertEqual(self.search('gaming'), [])
+
+    def test_rebuild_command(self):
+        """The rebuild command repopulates an emptied index."""
+        table = SQLITE_TABLE if connection.vendor == 'sqlite' else POSTGRES_TABLE
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table}')
+        self.assertEqual(self.search('lamp'), [])
+        call_command('rebuild_search_index', stdout=open('/dev/null', 'w'))
+        self.assertEqual(self.search('lamp'), ['desk-lamp', 'smart-bulb'])
+
+    def test_relevance_order_pages_through_all_matches(self):
+        """Keyset pagination over search_rank visits every match once."""
+        for i in range(20):
+            self.create_product(f'lamp-{i}', f'Lamp {i}', f'مصباح {i}', 'Lamp ' * (i % 3 + 1), '')
+        seen = []
+        params = {'q': 'lamp'}
+        while True:
+            response = self.client.get(reverse('all_products'), params)
+            page = response.context['page_obj']
+            seen.extend(product.slug for product in page)
+            if not page.has_next():
+                break
+            params['cursor'] = page.next_cursor
+        self.assertEqual(len(seen), 22)
+        self.assertEqual(len(set(seen)), 22)
+        self.assertEqual(seen[-1], 'smart-bulb')
+
+
+class ArabicFoldingTests(TestCase):
+    """Spelling variants shoppers type interchangeably find the same products."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.client = Client()
+        self.category = Category.objects.create(
+            name_en='Library',
+            name_ar='مَكْتَبَة',
+            slug='library',
+            is_active=True
+        )
+        self.product = Product.objects.create(
+            slug='quran-stand',
+            category=self.category,
+            name_en='Reading Stand',
+            name_ar='حامل أَحْمَر للمكتبة',
+            description_en='Wooden stand.',
+            description_ar='مصنوع من خشب الزَّيْتُون',
+            price=Decimal('15.00'),
+            stock=3,
+            is_active=True
+        )
+
+    def test_fold_text(self):
+        """Diacritics, hamza forms, taa marbuta, alef maksura and case all fold away."""
+        self.assertEqual(fold_text('أَحْمَر'), 'احمر')
+        self.assertEqual(fold_text('إسلام آمن'), 'اسلام امن')
+        self.assertEqual(fold_text('مكتبة'), fold_text('مكتبه'))
+        self.assertEqual(fold_text('مستشفى'), 'مستشفي')
+        self.assertEqual(fold_text('  Café\tLAMP '), 'cafe lamp')
+
+    def test_folded_copies_are_stored(self):
+        """Saving fills the folded columns for both languages."""
+        self.assertEqual(self.product.folded_name_ar, 'حامل احمر للمكتبه')
+        self.assertEqual(self.product.folded_name_en, 'reading stand')
+        self.assertEqual(self.product.folded_description_ar, 'مصنوع من خشب الزيتون')
+        self.assertEqual(self.category.folded_name_ar, 'مكتبه')
+
+    def test_spelling_variants_match(self):
+        """Queries are folded like the index, so variant spellings match."""
+        for query in ['احمر', 'أحمر', 'للمكتبه', 'الزيتون', 'READING']:
+            with self.subTest(query=query):
+                response = self.client.get(reverse('all_products'), {'q': query})
+                self.assertEqual([p.slug for p in response.context['products']], ['quran-stand'])
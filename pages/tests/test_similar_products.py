@@ -0,0 +1,125 @@
+"""
+Tests for the content-based similar-product index.
+"""
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from catalog.models import Category, Product, ProductRecommendation, SimilarProduct
+from catalog.recommendations import recommended_ids
+from catalog.similarity import build_similar_products, nearest_neighbours, refresh_similar_products
+from jobs.models import Job
+from jobs.worker import Worker
+
+
+class SimilarProductTests(TestCase):
+    """Products are similar when their translated texts share distinctive words."""
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Home', slug='home', is_active=True)
+        self.oak_desk = self.create_product('oak-desk', 'Oak desk', 'Solid oak writing desk with drawers')
+        self.oak_table = self.create_product('oak-table', 'Oak table', 'Solid oak dining table')
+        self.pine_desk = self.create_product('pine-desk', 'Pine desk', 'Pine writing desk')
+        self.kettle = self.create_product('kettle', 'Kettle', 'Electric steel kettle')
+        self.toaster = self.create_product('toaster', 'Toaster', 'Electric steel toaster')
+        # Run the refreshes queued for the new products
+        Worker().run(burst=True)
+
+    def create_product(self, slug, name, description, is_active=True):
+        return Product.objects.create(
+            name=name, name_ar=name, slug=slug, category=self.category, description=description,
+            price=Decimal('10.00'), stock=10, is_active=is_active
+        )
+
+    def similar(self, product):
+        return list(SimilarProduct.objects.filter(product=product).values_list('similar', flat=True))
+
+    def test_build_ranks_products_by_shared_words(self):
+        products, stored = build_similar_products()
+        self.assertEqual(products, 5)
+        self.assertEqual(self.similar(self.oak_desk)[:2], [self.pine_desk.pk, self.oak_table.pk])
+        self.assertEqual(self.similar(self.kettle), [self.toaster.pk])
+        self.assertNotIn(self.kettle.pk, self.similar(self.oak_desk))
+        self.assertEqual(stored, SimilarProduct.objects.count())
+
+    def test_nearest_neighbours_is_symmetric(self):
+        vectors = {1: {'a': 0.6, 'b': 0.8}, 2: {'a': 1.0}, 3: {'c': 1.0}}
+        neighbours = nearest_neighbours(vectors, min_score=0)
+        self.assertEqual(neighbours[1], [(2, 0.6)])
+        self.assertEqual(neighbours[2], [(1, 0.6)])
+        self.assertEqual(neighbours[3], [])
+
+    def test_saving_a_product_refreshes_its_neighbours(self):
+        build_similar_products()
+        self.toaster.description = 'Solid oak bread board'
+        self.toaster.save()
+        self.assertEqual(
+            list(Job.objects.filter(status=Job.QUEUED).values_list('task', 'payload')),
+            [('catalog.similarity.refresh_similar_products', {'product_id': self.toaster.pk})]
+        )
+        Worker().run(burst=True)
+        self.assertNotIn(self.toaster.pk, self.similar(self.kettle))
+        self.assertIn(self.oak_table.pk, self.similar(self.toaster))
+        self.assertIn(self.toaster.pk, self.similar(self.oak_table))
+
+    def test_saves_not_changing_the_text_queue_nothing(self):
+        self.kettle.stock = 3
+        self.kettle.save(update_fields=['stock'])
+        self.kettle.save()
+        self.assertFalse(Job.objects.filter(status=Job.QUEUED).exists())
+
+    def test_new_product_gets_neighbours(self):
+        build_similar_products()
+        shelf = self.create_product('oak-shelf', 'Oak shelf', 'Solid oak wall shelf')
+        self.create_product('hidden', 'Hidden', 'Solid oak hidden shelf', is_active=False)
+        self.assertEqual(
+            list(Job.objects.filter(status=Job.QUEUED).values_list('payload', flat=True)),
+            [{'product_id': shelf.pk}]
+        )
+        Worker().run(burst=True)
+        self.assertEqual(set(self.similar(shelf)[:2]), {self.oak_desk.pk, self.oak_table.pk})
+        self.assertIn(shelf.pk, self.similar(self.oak_table))
+
+    def test_refreshes_of_one_product_are_queued_once(self):
+        for description in ['Steel kettle', 'Copper kettle', 'Glass kettle']:
+            self.kettle.description = description
+            self.kettle.save()
+        self.toaster.is_active = False
+        self.toaster.save()
+        self.assertEqual(
+            list(Job.objects.filter(status=Job.QUEUED).order_by('id').values_list('payload', flat=True)),
+            [{'product_id': self.kettle.pk}, {'product_id': self.toaster.pk}]
+        )
+        Worker().run(burst=True)
+        self.kettle.description = 'Steel kettle'
+        self.kettle.save()
+        self.assertEqual(Job.objects.filter(status=Job.QUEUED).count(), 1)
+
+    def test_deactivated_product_leaves_every_list(self):
+        build_similar_products()
+        Product.objects.filter(pk=self.kettle.pk).update(is_active=False)
+        self.assertEqual(refresh_similar_products(self.kettle.pk), [])
+        self.assertFalse(SimilarProduct.objects.filter(product=self.kettle).exists())
+        self.assertFalse(SimilarProduct.objects.filter(similar=self.kettle).exists())
+
+    def test_bought_together_comes_before_similar(self):
+        build_similar_products()
+        ProductRecommendation.objects.create(product=self.oak_desk, recommended=self.kettle, rank=1, score=3)
+        ids = recommended_ids(self.oak_desk)
+        self.assertEqual(ids[:3], [self.kettle.pk, self.pine_desk.pk, self.oak_table.pk])
+        self.assertEqual(len(ids), len(set(ids)))
+
+    def test_detail_page_shows_similar_products(self):
+        build_similar_products()
+        response = self.client.get(reverse('product_detail', args=['kettle']))
+        self.assertEqual([p.pk for p in response.context['related_products']], [self.toaster.pk])
+
+    def test_command(self):
+        out = StringIO()
+        call_command('build_similar_products', '--top-k', '1', stdout=out)
+        self.assertIn('5 product(s)', out.getvalue())
+        self.assertEqual(self.similar(self.kettle), [self.toaster.pk])
+        out = StringIO()
+        call_command('build_similar_products', '--benchmark', '200', stdout=out)
+        self.assertIn('neighbours', out.getvalue())
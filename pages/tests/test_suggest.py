@@ -0,0 +1,128 @@
+"""
+Tests for the search box typeahead.
+"""
+import threading
+from decimal import Decimal
+from unittest import mock
+from django.test import TestCase, Client
+from django.urls import reverse
+from catalog import suggest
+from catalog.models import Category, Product
+
+
+class SearchSuggestTests(TestCase):
+    """Suggestions come from the in-memory prefix index and follow catalog writes."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.client = Client()
+        suggest.reset_index()
+        self.addCleanup(suggest.reset_index)
+        self.category = Category.objects.create(
+            name_en='Lamps',
+            name_ar='مصابيح',
+            slug='lamps',
+            is_active=True
+        )
+        self.desk_lamp = self.create_product('desk-lamp', 'Desk Lamp', 'مصباح مكتب', sales_count=3)
+        self.floor_lamp = self.create_product('floor-lamp', 'Floor Lamp', 'مصباح أرضي', sales_count=9)
+        self.create_product('hidden-lamp', 'Hidden Lamp', 'مصباح مخفي', is_active=False)
+
+    def create_product(self, slug, name_en, name_ar, sales_count=0, is_active=True):
+        return Product.objects.create(
+            slug=slug,
+            category=self.category,
+            name_en=name_en,
+            name_ar=name_ar,
+            description='Light.',
+            price=Decimal('30.00'),
+            stock=4,
+            sales_count=sales_count,
+            is_active=is_active
+        )
+
+    def names(self, query, **headers):
+        response = self.client.get(reverse('search_suggest'), {'q': query}, **headers)
+        self.assertEqual(response.status_code, 200)
+        return [result['name'] for result in response.json()['results']]
+
+    def test_prefix_of_any_word_matches_with_categories_first(self):
+        """Word-start prefixes match; categories lead, then best sellers."""
+        self.assertEqual(self.names('lam'), ['Lamps', 'Floor Lamp', 'Desk Lamp'])
+        self.assertEqual(self.names('DESK'), ['Desk Lamp'])
+        self.assertEqual(self.names('amp'), [])
+        self.assertEqual(self.names(''), [])
+
+    def test_results_use_the_active_language_and_folded_matching(self):
+        """Arabic variants match and names come back in the active language."""
+        self.assertEqual(self.names('ارضي'), ['Floor Lamp'])
+        self.assertEqual(self.names('floor', HTTP_ACCEPT_LANGUAGE='ar'), ['مصباح أرضي'])
+
+    def test_results_link_to_the_matching_pages(self):
+        """Each result carries its type and page URL."""
+        response = self.client.get(reverse('search_suggest'), {'q': 'lamps'})
+        self.assertEqual(response.json()['results'], [{
+            'type': 'category', 'name': 'Lamps',
+            'url': reverse('category_products', args=['lamps'])
+        }])
+
+    def test_lookups_do_not_query_the_database(self):
+        """Once built, the index answers keystrokes from memory."""
+        self.names('lamp')
+        with self.assertNumQueries(0):
+            for query in ['f', 'fl', 'flo', 'floo']:
+                self.names(query)
+
+    def test_index_follows_saves_and_deletes(self):
+        """Signals patch the loaded index after commit."""
+        self.names('lamp')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.floor_lamp.name_en = 'Standing Light'
+            self.floor_lamp.save()
+            self.create_product('reading-lamp', 'Reading Lamp', 'مصباح قراءة')
+        self.assertEqual(self.names('stand'), ['Standing Light'])
+        self.assertEqual(self.names('floor'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.desk_lamp.delete()
+            self.floor_lamp.is_active = False
+            self.floor_lamp.save()
+        self.assertEqual(self.names('lamp'), ['Lamps', 'Reading Lamp'])
+
+    def test_index_size_is_capped(self):
+        """Past the entry cap the least popular products are left out."""
+        with self.settings(SUGGEST_INDEX_MAX_ENTRIES=4):
+            index = suggest.build_index()
+        # The category takes two keys; the best seller needs four more and is skipped
+        self.assertLessEqual(len(index), 4)
+        self.assertEqual([name for _, _, name in index.lookup('lamp', 'en')], ['Lamps'])
+
+    def test_best_sellers_win_among_many_matches(self):
+        """Every match is ranked, not just the first ones in key order."""
+        index = suggest.PrefixIndex(5000)
+        index.fill(
+            [(suggest.PRODUCT, i, {'en': f'Lamp {i:04}'}, f'lamp-{i}', 1) for i in range(1000)]
+            + [(suggest.PRODUCT, 1000, {'en': 'Lamp zz top'}, 'lamp-top', 50)]
+        )
+        self.assertEqual([name for _, _, name in index.lookup('l', 'en', limit=2)], ['Lamp zz top', 'Lamp 0000'])
+
+    def test_lookups_do_not_wait_for_a_rebuild(self):
+        """An expired index keeps answering while one request rebuilds it."""
+        self.names('lamp')
+        started, release = threading.Event(), threading.Event()
+        fresh = suggest.PrefixIndex(100)
+        fresh.fill([(suggest.PRODUCT, 0, {'en': 'Lantern'}, 'lantern', 0)])
+
+        def slow_build():
+            started.set()
+            release.wait(5)
+            return fresh
+
+        with self.settings(SUGGEST_INDEX_TTL=0), mock.patch.object(suggest, 'build_index', slow_build):
+            rebuild = threading.Thread(target=suggest.get_index)
+            rebuild.start()
+            self.assertTrue(started.wait(5))
+            self.assertEqual(self.names('lamp'), ['Lamps', 'Floor Lamp', 'Desk Lamp'])
+            release.set()
+            rebuild.join(5)
+        self.assertIs(suggest.loaded_index(), fresh)
+        self.assertEqual(self.names('lant'), ['Lantern'])
@@ -2,8 +2,8 @@ from django.urls import path
 from .views import (
     AdminDashboardView, UpdateOrderStatusView, HomePageView, 
     CategoryProductsView, ProductDetailView, CartDetailView,
-    cart_add, cart_update, cart_remove, CheckoutView, OrderSuccessView,
-    AdminOrderDetailView, AllProductsView
+    cart_add, cart_update, cart_remove, cart_api, cart_summary, CheckoutView, OrderSuccessView,
+    AdminOrderDetailView, AllProductsView, search_suggest
 )
 
 urlpatterns = [
@@ -11,12 +11,15 @@ urlpatterns = [
     path('products/', AllProductsView.as_view(), name='all_products'),
     path('category/<slug:slug>/', CategoryProductsView.as_view(), name='category_products'),
     path('product/<slug:slug>/', ProductDetailView.as_view(), name='product_detail'),
+    path('search/suggest/', search_suggest, name='search_suggest'),
     
     # Cart URLs
     path('cart/', CartDetailView.as_view(), name='cart'),
     path('cart/add/<int:product_id>/', cart_add, name='cart_add'),
     path('cart/update/<int:product_id>/', cart_update, name='cart_update'),
     path('cart/remove/<int:product_id>/', cart_remove, name='cart_remove'),
+    path('cart/api/', cart_api, name='cart_api'),
+    path('cart/summary/', cart_summary, name='cart_summary'),
     
     # Checkout URL
     path('checkout/', CheckoutView.as_view(), name='checkout'),
@@ -1,14 +1,60 @@
 from django.views.generic import TemplateView, View, DetailView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.shortcuts import redirect, get_object_or_404
+from django.conf import settings
+from django.db import transaction
 from django.db.models import Sum, Count, F
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.functional import cached_property
 from datetime import timedelta
+from decimal import Decimal, InvalidOperation
 from django.contrib import messages
-from orders.models import Order, OrderItem
-from catalog.models import Product, Category, Offer
+from django.http import JsonResponse
+from modeltranslation.utils import build_localized_fieldname, get_language
+from jobs.queue import enqueue
+from orders.models import Order
+from orders.reservations import hold_stock
+from orders.services import InsufficientStock, place_order
+from orders.tasks import order_status_changed
+from catalog.models import Product, Category, translated_field
+from catalog.facets import get_facets
+from catalog.offers import apply_offers, get_offer_resolver
+from catalog.recommendations import recommended_ids
+from catalog.sales import best_sellers as best_selling
+from catalog.search import match_products, search_products
+from catalog.suggest import suggest
 from pages.forms import CheckoutForm
+from pages.pagination import KeysetPaginator
+
+
+# Keyset sort keys per listing sort option; ``id`` breaks ties so the order is total
+PRODUCT_SORT_ORDERINGS = {
+    'newest': ('-created_at', '-id'),
+    'price_low': ('effective_price', 'id'),
+    'price_high': ('-effective_price', '-id'),
+    'name': ('sort_name', 'id'),
+    'relevance': ('search_rank', 'id'),
+}
+
+
+def localized_name(field):
+    """
+    The active-language column of a translated field, falling back to the
+    default language like modeltranslation does when reading the attribute.
+    """
+    return translated_field(field, get_language())
+
+
+def parse_price(value):
+    """
+    Parse a price filter from the query string; invalid input is ignored.
+    """
+    try:
+        price = Decimal(value)
+    except (InvalidOperation, TypeError):
+        return None
+    return price if price.is_finite() else None
 
 
 class HomePageView(TemplateView):
@@ -17,37 +63,50 @@ class HomePageView(TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        now = timezone.now()
+        resolver = get_offer_resolver()
         
         # Active categories (limit 8)
         context['categories'] = Category.objects.filter(is_active=True)[:8]
         
-        # Best-selling products (by sales_count, limit 5)
-        best_sellers = Product.objects.filter(
-            is_active=True, sales_count__gt=0
-        ).order_by('-sales_count')[:5]
-        context['best_sellers'] = best_sellers
-        context['best_seller_ids'] = list(best_sellers.values_list('id', flat=True))
+        # Best-selling products of the last BEST_SELLERS_DAYS days (limit 5)
+        best_sellers = best_selling(
+            Product.objects.filter(is_active=True).for_cards(),
+            getattr(settings, 'BEST_SELLERS_DAYS', 30)
+        )
+        context['best_sellers'] = resolver.apply(best_sellers)
+        context['best_seller_ids'] = [product.id for product in best_sellers]
         
         # Featured products
-        context['featured_products'] = Product.objects.filter(
+        context['featured_products'] = resolver.apply(list(Product.objects.filter(
             is_active=True, is_featured=True
-        ).order_by('-created_at')[:8]
+        ).order_by('-created_at').for_cards()[:8]))
         
         # Active offers (valid date range)
-        context['offers'] = Offer.objects.filter(
-            is_active=True,
-            start_date__lte=now,
-            end_date__gte=now
-        )[:4]
+        context['offers'] = resolver.offers[:4]
         
         return context
 
 
-class CategoryProductsView(TemplateView):
+class ProductListingMixin:
+    """Keyset pagination shared by the product listing pages."""
+    paginate_by = 12
+    # Stop counting matches here; the header then shows "1000+ products found"
+    count_limit = 1000
+
+    def paginate_products(self, context, products, ordering):
+        paginator = KeysetPaginator(products, ordering, self.paginate_by, count_limit=self.count_limit)
+        products_page = paginator.page(self.request.GET.get('cursor'))
+        apply_offers(products_page)
+        
+        context['products'] = products_page
+        context['page_obj'] = products_page
+        context['paginator'] = paginator
+        context['is_paginated'] = products_page.has_other_pages()
+
+
+class CategoryProductsView(ProductListingMixin, TemplateView):
     """Public page listing all active products for one category with search, filter, and pagination."""
     template_name = 'pages/category_products.html'
-    paginate_by = 12
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -55,51 +114,28 @@ class CategoryProductsView(TemplateView):
         context['category'] = category
         
         # Start with all active products in this category
-        products = Product.objects.filter(category=category, is_active=True)
+        products = Product.objects.filter(category=category, is_active=True).for_cards()
         
-        # Search by product name
+        # Full-text search over names and descriptions in both languages
         search_query = self.request.GET.get('q', '').strip()
         if search_query:
-            products = products.filter(name__icontains=search_query)
+            products = search_products(products, search_query)
         context['search_query'] = search_query
         
         # Filter by price range
         min_price = self.request.GET.get('min_price', '')
         max_price = self.request.GET.get('max_price', '')
-        
-        if min_price:
-            try:
-                products = products.filter(price__gte=float(min_price))
-            except ValueError:
-                pass
-        if max_price:
-            try:
-                products = products.filter(price__lte=float(max_price))
-            except ValueError:
-                pass
-        
         context['min_price'] = min_price
         context['max_price'] = max_price
+        min_price, max_price = parse_price(min_price), parse_price(max_price)
+        if min_price is not None:
+            products = products.filter(effective_price__gte=min_price)
+        if max_price is not None:
+            products = products.filter(effective_price__lte=max_price)
         
-        # Order by creation date (newest first)
-        products = products.order_by('-created_at')
-        
-        # Pagination
-        from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-        paginator = Paginator(products, self.paginate_by)
-        page = self.request.GET.get('page', 1)
-        
-        try:
-            products_page = paginator.page(page)
-        except PageNotAnInteger:
-            products_page = paginator.page(1)
-        except EmptyPage:
-            products_page = paginator.page(paginator.num_pages)
-        
-        context['products'] = products_page
-        context['page_obj'] = products_page
-        context['paginator'] = paginator
-        context['is_paginated'] = paginator.num_pages > 1
+        # Best matches first when searching, otherwise newest first
+        sort_by = 'relevance' if search_query else 'newest'
+        self.paginate_products(context, products, PRODUCT_SORT_ORDERINGS[sort_by])
         
         # Get all categories for sidebar filter
         context['all_categories'] = Category.objects.filter(is_active=True)
@@ -107,150 +143,129 @@ class CategoryProductsView(TemplateView):
         return context
 
 
-class AllProductsView(TemplateView):
+class AllProductsView(ProductListingMixin, TemplateView):
     """Public page listing all active products with search, filter, and pagination."""
     template_name = 'pages/all_products.html'
-    paginate_by = 12
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
         # Start with all active products
-        products = Product.objects.filter(is_active=True)
+        products = Product.objects.filter(is_active=True).for_cards()
+        facet_products = Product.objects.filter(is_active=True)
         
-        # Search by product name
+        # Full-text search over names and descriptions in both languages
         search_query = self.request.GET.get('q', '').strip()
         if search_query:
-            products = products.filter(name__icontains=search_query)
+            products = search_products(products, search_query)
+            facet_products = match_products(facet_products, search_query)
         context['search_query'] = search_query
         
+        # Get all categories for sidebar filter
+        all_categories = list(Category.objects.filter(is_active=True))
+        context['all_categories'] = all_categories
+        
         # Filter by category
         selected_category = self.request.GET.get('category', '')
-        if selected_category:
-            products = products.filter(category__slug=selected_category)
+        category_ids = {category.slug: category.id for category in all_categories}
+        selected_category_id = category_ids.get(selected_category)
         context['selected_category'] = selected_category
         
         # Filter by price range
         min_price = self.request.GET.get('min_price', '')
         max_price = self.request.GET.get('max_price', '')
-        
-        if min_price:
-            try:
-                products = products.filter(price__gte=float(min_price))
-            except ValueError:
-                pass
-        if max_price:
-            try:
-                products = products.filter(price__lte=float(max_price))
-            except ValueError:
-                pass
-        
         context['min_price'] = min_price
         context['max_price'] = max_price
+        min_price, max_price = parse_price(min_price), parse_price(max_price)
+        
+        # Filter by availability
+        in_stock = self.request.GET.get('in_stock') == '1'
+        context['in_stock'] = in_stock
+        
+        # Facet counts for the sidebar, before the facet filters are applied
+        facets = get_facets(
+            facet_products, search_query=search_query, category_id=selected_category_id,
+            min_price=min_price, max_price=max_price, in_stock=in_stock
+        )
+        for category in all_categories:
+            category.product_count = facets['categories'].get(category.id, 0)
+        context['facets'] = facets
+        
+        if selected_category_id is not None:
+            products = products.filter(category_id=selected_category_id)
+        elif selected_category:
+            products = products.filter(category__slug=selected_category)
+        if min_price is not None:
+            products = products.filter(effective_price__gte=min_price)
+        if max_price is not None:
+            products = products.filter(effective_price__lte=max_price)
+        if in_stock:
+            products = products.filter(stock__gt=0)
         
         # Sorting
-        sort_by = self.request.GET.get('sort', 'newest')
-        if sort_by == 'price_low':
-            products = products.order_by('price')
-        elif sort_by == 'price_high':
-            products = products.order_by('-price')
-        elif sort_by == 'name':
-            products = products.order_by('name')
-        else:
-            products = products.order_by('-created_at')
+        sort_by = self.request.GET.get('sort', 'relevance' if search_query else 'newest')
+        if sort_by not in PRODUCT_SORT_ORDERINGS or (sort_by == 'relevance' and not search_query):
+            sort_by = 'newest'
+        if sort_by == 'name':
+            products = products.annotate(sort_name=localized_name('name'))
         context['sort_by'] = sort_by
         
         # Pagination
-        from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-        paginator = Paginator(products, self.paginate_by)
-        page = self.request.GET.get('page', 1)
-        
-        try:
-            products_page = paginator.page(page)
-        except PageNotAnInteger:
-            products_page = paginator.page(1)
-        except EmptyPage:
-            products_page = paginator.page(paginator.num_pages)
-        
-        context['products'] = products_page
-        context['page_obj'] = products_page
-        context['paginator'] = paginator
-        context['is_paginated'] = paginator.num_pages > 1
-        
-        # Get all categories for sidebar filter
-        context['all_categories'] = Category.objects.filter(is_active=True)
+        self.paginate_products(context, products, PRODUCT_SORT_ORDERINGS[sort_by])
         
         return context
 
 
+def search_suggest(request):
+    """Typeahead for the search box, answered from the in-memory prefix index."""
+    query = request.GET.get('q', '').strip()
+    results = []
+    if query:
+        for kind, slug, name in suggest(query, get_language(), limit=8):
+            url_name = 'category_products' if kind == 'category' else 'product_detail'
+            results.append({'type': kind, 'name': name, 'url': reverse(url_name, args=[slug])})
+    return JsonResponse({'results': results})
+
+
 class ProductDetailView(TemplateView):
     """Product detail page with image gallery, pricing, and purchase options."""
     template_name = 'pages/product_detail.html'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        now = timezone.now()
         
         # Get the product
-        product = get_object_or_404(Product, slug=self.kwargs['slug'], is_active=True)
+        product = get_object_or_404(
+            Product.objects.select_related('category').prefetch_related('images', 'colors'),
+            slug=self.kwargs['slug'], is_active=True
+        )
         context['product'] = product
         
         # Get all product images for gallery
         context['images'] = product.images.all()
         
-        # Check for applicable offers
-        # Priority: product-specific offer > category offer
-        offer = None
-        discount_price = None
-        discount_percent = None
-        
-        # Check product-specific offer
-        product_offer = Offer.objects.filter(
-            product=product,
-            is_active=True,
-            start_date__lte=now,
-            end_date__gte=now
-        ).first()
-        
-        if product_offer:
-            offer = product_offer
-        else:
-            # Check category-wide offer
-            category_offer = Offer.objects.filter(
-                category=product.category,
-                is_active=True,
-                start_date__lte=now,
-                end_date__gte=now
-            ).first()
-            if category_offer:
-                offer = category_offer
-        
-        # Calculate discount if offer exists
-        if offer:
-            context['offer'] = offer
-            price = float(product.price)
-            value = float(offer.value)
-            
-            if offer.offer_type == 'percentage':
-                discount_percent = value
-                discount_price = price * (1 - value / 100)
-            else:  # fixed amount
-                discount_price = max(price - value, 0)
-                if price > 0:
-                    discount_percent = ((price - discount_price) / price) * 100
-            
-            context['discount_price'] = round(discount_price, 2)
-            context['discount_percent'] = round(discount_percent) if discount_percent else None
+        # Applicable offer: product-specific offer > category offer
+        discount = get_offer_resolver().resolve(product)
+        if discount:
+            context['offer'] = discount.offer
+            context['discount_price'] = discount.price
+            context['discount_percent'] = discount.percent
         
         # Stock status
         context['in_stock'] = product.stock > 0
         context['max_quantity'] = min(product.stock, 10)  # Limit max quantity to 10
         
-        # Related products from same category
-        context['related_products'] = Product.objects.filter(
-            category=product.category,
-            is_active=True
-        ).exclude(pk=product.pk)[:4]
+        # Frequently bought together, else more from the same category
+        related_ids = recommended_ids(product)
+        if related_ids:
+            related = Product.objects.for_cards().in_bulk(related_ids)
+            related = [related[pk] for pk in related_ids if pk in related]
+        else:
+            related = list(Product.objects.filter(
+                category=product.category,
+                is_active=True
+            ).exclude(pk=product.pk).for_cards()[:4])
+        context['related_products'] = apply_offers(related)
         
         return context
 
@@ -277,7 +292,9 @@ class AdminDashboardView(StaffRequiredMixin, TemplateView):
         
         # Lists
         context['recent_orders'] = Order.objects.all()[:10]
-        context['best_sellers'] = Product.objects.order_by('-sales_count')[:5]
+        window = 7 if self.request.GET.get('best_sellers') == '7' else 30
+        context['best_sellers_days'] = window
+        context['best_sellers'] = best_selling(Product.objects.select_related('category'), window, fill=False)
         
         # Choices for status update
         context['status_choices'] = Order.STATUS_CHOICES
@@ -293,6 +310,8 @@ class UpdateOrderStatusView(StaffRequiredMixin, View):
         if new_status in dict(Order.STATUS_CHOICES):
             order.status = new_status
             order.save()
+            # Queued once the new status is committed, so the job never sees the old one
+            transaction.on_commit(lambda: enqueue(order_status_changed, order_id=order.pk, status=order.status))
             messages.success(request, _("Order #%(order_number)s updated to %(status)s.") % {'order_number': order.order_number, 'status': new_status})
         else:
             messages.error(request, _("Invalid status."))
@@ -303,9 +322,11 @@ class UpdateOrderStatusView(StaffRequiredMixin, View):
 # Cart Views
 # ==========================================
 
+import json
 from cart.cart import Cart
+from cart.stores import get_summary
+from django.views.decorators.cache import never_cache
 from django.views.decorators.http import require_POST
-from django.http import JsonResponse
 
 
 class CartDetailView(TemplateView):
@@ -365,18 +386,114 @@ def cart_remove(request, product_id):
     return redirect('cart')
 
 
+CART_OPERATIONS = ('add', 'set', 'remove')
+MAX_CART_OPERATIONS = 100
+
+
+def parse_cart_operations(data):
+    """
+    ``[(op, product_id, quantity)]`` from a cart API request body; raises
+    ``ValueError`` for anything malformed.
+    """
+    operations = data['operations']
+    if not isinstance(operations, list) or len(operations) > MAX_CART_OPERATIONS:
+        raise ValueError('operations must be a list of at most %d' % MAX_CART_OPERATIONS)
+    parsed = []
+    for operation in operations:
+        op, product_id, quantity = operation['op'], operation['product'], operation.get('quantity', 1)
+        if op not in CART_OPERATIONS:
+            raise ValueError(f'unknown operation {op!r}')
+        for value in (product_id, quantity):
+            if not isinstance(value, int) or isinstance(value, bool):
+                raise ValueError('product and quantity must be integers')
+        if op == 'add' and quantity < 1:
+            raise ValueError('add needs a positive quantity')
+        parsed.append((op, product_id, quantity))
+    return parsed
+
+
+@require_POST
+def cart_api(request):
+    """
+    Apply a batch of cart operations posted as JSON, e.g.
+    ``{"operations": [{"op": "add", "product": 3, "quantity": 2},
+    {"op": "set", "product": 5, "quantity": 1}, {"op": "remove", "product": 7}]}``,
+    and answer with the updated lines, totals and item count.
+    """
+    try:
+        operations = parse_cart_operations(json.loads(request.body))
+    except (ValueError, TypeError, KeyError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    cart = Cart(request)
+    products, rejected = cart.apply(operations)
+    lines = []
+    for product_id, quantity in cart.quantities.items():
+        product = products.get(int(product_id))
+        if product is not None:
+            price = Decimal(cart.prices[product_id])
+            lines.append({
+                'product': product.id,
+                'name': product.name,
+                'url': reverse('product_detail', args=[product.slug]),
+                'quantity': quantity,
+                'stock': product.stock,
+                'price': str(price),
+                'total_price': str(price * quantity),
+            })
+    return JsonResponse({
+        'lines': lines,
+        'subtotal': str(cart.get_subtotal()),
+        'shipping': str(cart.get_shipping()),
+        'total': str(cart.get_total()),
+        'count': len(cart),
+        'rejected': rejected,
+    })
+
+
+@never_cache
+def cart_summary(request):
+    """The header badge's item count and subtotal, for pages served from a full-page cache."""
+    summary = get_summary(request)
+    return JsonResponse({'count': summary['count'], 'subtotal': str(summary['subtotal'])})
+
+
+def session_key(request):
+    """The request's session key, creating the session if it has none yet."""
+    if not request.session.session_key:
+        request.session.save()
+    return request.session.session_key
+
+
 class CheckoutView(TemplateView):
     """Checkout page with form handling."""
     template_name = 'pages/checkout.html'
+
+    @cached_property
+    def cart(self):
+        # One cart per request, so a re-rendered form reuses its hydrated lines
+        return Cart(self.request)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        cart = Cart(self.request)
+        cart = self.cart
         if cart.is_empty():
             context['redirect_to_home'] = True # Logic to handle empty cart in template
         
         context['cart'] = cart
-        context['cart_items'] = list(cart)
+        cart_items = list(cart)
+        context['cart_items'] = cart_items
+        
+        # Hold the cart's stock while the shopper fills in the form
+        if cart_items:
+            held = hold_stock(session_key(self.request), {
+                item['product'].id: item['quantity'] for item in cart_items
+            })
+            context['short_holds'] = [
+                {'product': item['product'], 'held': held[item['product'].id]}
+                for item in cart_items
+                if held[item['product'].id] < item['quantity']
+            ]
         context['subtotal'] = cart.get_subtotal()
         context['shipping'] = cart.get_shipping()
         context['total'] = cart.get_total()
@@ -384,49 +501,51 @@ class CheckoutView(TemplateView):
         return context
 
     def post(self, request, *args, **kwargs):
-        cart = Cart(request)
+        cart = self.cart
+        # A resubmitted form (double click, refresh, retry) lands on the order it placed
+        key = request.POST.get('idempotency_key')
+        placed = Order.objects.filter(idempotency_key=key).first() if key else None
+        if placed is not None:
+            return self.order_placed(request, cart, placed)
         if cart.is_empty():
             messages.error(request, _("Your cart is empty."))
             return redirect('cart')
 
         form = CheckoutForm(request.POST)
         if form.is_valid():
-            # Create Order
+            # Create the order and take its stock in one transaction
             order = form.save(commit=False)
             order.totals = cart.get_total()
-            order.save()
-
-            # Create Order Items
-            for item in cart:
-                OrderItem.objects.create(
-                    order=order,
-                    product=item['product'],
-                    quantity=item['quantity'],
-                    unit_price=item['price'],
-                    line_total=item['total_price']
-                )
-
-            # Update product stock and sales count
-            for item in cart:
-                product = item['product']
-                product.stock = F('stock') - item['quantity']
-                product.sales_count = F('sales_count') + item['quantity']
-                product.save()
-
-            # Clear Cart
-            cart.clear()
-
-            # Store order number in session for success page
-            request.session['last_order_number'] = order.order_number
-
-            # Redirect to success page
-            return redirect('order_success')
+            try:
+                order, _created = place_order(order, list(cart), session_key=session_key(request))
+            except InsufficientStock as e:
+                # Tell the shopper what is left and trim the cart to match
+                for product, requested, available in e.shortages:
+                    if available > 0:
+                        form.add_error(None, _("Only %(count)s left of %(product)s.") % {
+                            'count': available, 'product': product.name
+                        })
+                    else:
+                        form.add_error(None, _("%(product)s is out of stock.") % {'product': product.name})
+                cart.apply([('set', product.id, available) for product, requested, available in e.shortages])
+            else:
+                return self.order_placed(request, cart, order)
         
         # If form invalid, re-render logic
         context = self.get_context_data()
         context['form'] = form
         return self.render_to_response(context)
 
+    def order_placed(self, request, cart, order):
+        # Clear Cart
+        cart.clear()
+
+        # Store order number in session for success page
+        request.session['last_order_number'] = order.order_number
+
+        # Redirect to success page
+        return redirect('order_success')
+
 
 class OrderSuccessView(TemplateView):
     template_name = 'pages/order_success.html'